@@ -0,0 +1,136 @@
+"""On-host selection of export, intra-op threads and imgsz against a latency budget.
+
+Every export of one model name (pt / onnx / openvino, FP32 and INT8 variants) is
+benchmarked with benchmark.bench_case at each allowed imgsz and thread count.
+The winner is the largest input size whose p95 fits the budget, fastest first;
+when nothing fits, the fastest combination overall.
+"""
+import os
+import platform
+import time
+
+from benchmark import bench_case
+from model_registry import ModelRegistry
+
+
+def _report(progress, stage, fraction, detail=""):
+    if progress is None:
+        return
+    try:
+        progress(stage, fraction, detail)
+    except Exception as e:
+        print(f"Autotune progress callback failed: {e}")
+
+
+def _wait_idle(idle, progress, fraction, detail, poll_s: float = 1.0):
+    if idle is None or idle():
+        return
+    _report(progress, "waiting", fraction, detail)
+    while not idle():
+        time.sleep(poll_s)
+
+
+_TUNED_TYPES = ("pt", "onnx", "openvino")
+# Mono and fixed-rectangle exports only serve their own frames / ROIs, never as the primary model
+_TUNED_VARIANTS = (None, "int8")
+
+
+def tune_candidates(models_dir: str, model_name: str, formats=_TUNED_TYPES):
+    """Registry entries of the given formats to tune for model_name (all exports when none carry that name)."""
+    entries = [
+        e for e in ModelRegistry().entries(models_dir)
+        if e["type"] in formats and e.get("variant") in _TUNED_VARIANTS
+    ]
+    named = [e for e in entries if e["name"] == model_name]
+    return named or entries
+
+
+def pick_winner(rows, budget_ms: float):
+    """Largest input within budget (p95), then lowest p50; else the lowest p50 overall."""
+    ok = [r for r in rows if "error" not in r]
+    if not ok:
+        return None, False
+    fits = [r for r in ok if r["p95_ms"] <= budget_ms]
+    if fits:
+        return min(fits, key=lambda r: (-max(r["input_hw"]), r["p50_ms"])), True
+    return min(ok, key=lambda r: r["p50_ms"]), False
+
+
+def autotune(
+    models_dir: str,
+    model_name: str,
+    frames,
+    imgsz_options=(480, 640),
+    threads_options=(0,),
+    budget_ms: float = 100.0,
+    runs: int = 20,
+    warmup: int = 3,
+    conf: float = 0.25,
+    progress=None,
+    formats=_TUNED_TYPES,
+    idle=None,
+):
+    """Benchmark the candidates and return the winning configuration (None if nothing loads).
+
+    progress(stage, fraction, detail) is called from this thread after every case. When
+    idle is given, each case waits until idle() returns True, so the run only uses the
+    CPU while nothing else needs it.
+    """
+    entries = tune_candidates(models_dir, model_name, formats)
+    imgsz_options = sorted({int(v) for v in imgsz_options})
+    threads_options = sorted({int(v) for v in threads_options})
+    total = max(1, len(entries) * len(imgsz_options) * len(threads_options))
+    rows = []
+    done = 0
+    t0 = time.perf_counter()
+    for entry in entries:
+        static_hw = None
+        for imgsz in imgsz_options:
+            for threads in threads_options:
+                done += 1
+                if static_hw is not None:
+                    # Fixed-shape export: imgsz does not change the graph, one pass per thread count is enough
+                    continue
+                detail = f"{entry['file']} imgsz={imgsz} threads={threads}"
+                _wait_idle(idle, progress, done / total, detail)
+                try:
+                    row = bench_case(entry["path"], frames, imgsz, threads, 1, runs, warmup, conf)
+                    row["precision"] = entry.get("precision")
+                except Exception as e:
+                    row = {"model": entry["file"], "path": entry["path"], "imgsz": imgsz, "threads": threads, "error": str(e)}
+                rows.append(row)
+                _report(progress, "benchmark", done / total, detail)
+            if rows and rows[-1].get("static_input") and rows[-1].get("path") == entry["path"]:
+                static_hw = rows[-1]["input_hw"]
+        if static_hw is not None and max(static_hw) not in imgsz_options:
+            # Exported at a size the operator did not allow
+            for row in rows:
+                if row.get("path") == entry["path"] and "error" not in row:
+                    row["error"] = f"static input {static_hw[1]}x{static_hw[0]} not in imgsz options"
+
+    winner, within_budget = pick_winner(rows, budget_ms)
+    if winner is None:
+        _report(progress, "failed", 1.0, "no export could be benchmarked")
+        return None
+    result = {
+        "host": platform.node(),
+        "tuned_at": time.time(),
+        "duration_s": round(time.perf_counter() - t0, 1),
+        "model_name": model_name,
+        "model_type": winner["type"],
+        "file": os.path.basename(winner["path"].rstrip("/\\")),
+        "precision": winner.get("precision"),
+        "engine": winner["engine"],
+        "imgsz": max(winner["input_hw"]),
+        "intra_op_threads": winner["threads"],
+        "p50_ms": winner["p50_ms"],
+        "p95_ms": winner["p95_ms"],
+        "budget_ms": float(budget_ms),
+        "within_budget": within_budget,
+        "candidates": [
+            {k: r.get(k) for k in ("model", "type", "precision", "engine", "input_hw", "threads", "p50_ms", "p95_ms", "error")}
+            for r in rows
+        ],
+    }
+    _report(progress, "done", 1.0, f"{result['file']} imgsz={result['imgsz']} threads={result['intra_op_threads']}")
+    return result
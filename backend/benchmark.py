@@ -0,0 +1,498 @@
+"""Latency comparison between the Ultralytics wrapper and the native runtime engines,
+pool throughput per replica count, and a reproducible benchmark suite.
+
+Usage:
+    python benchmark.py --model models/best_openvino_model --runs 50
+    python benchmark.py --model models/best.onnx --images path/to/frames
+    python benchmark.py --model models/best.onnx --replicas 1,2,4 --clients 4
+    python benchmark.py suite --imgsz 480,640 --threads 0,2,4 --batches 1,4 --output bench.json
+    python benchmark.py suite --baseline bench.json
+    python benchmark.py cascade --model models/best.onnx --screen models/yolo26n.onnx --screen-conf 0.1
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import platform
+import threading
+import time
+from collections import Counter
+from importlib import metadata
+
+import cv2
+import numpy as np
+
+from detector import DefectDetector
+from model_registry import ModelRegistry
+
+
+def load_frames(images_dir: str | None, count: int = 8):
+    frames = []
+    if images_dir:
+        for path in sorted(glob.glob(os.path.join(images_dir, "*")))[:count]:
+            img = cv2.imread(path, cv2.IMREAD_COLOR)
+            if img is not None:
+                frames.append(img)
+    if not frames:
+        rng = np.random.default_rng(0)
+        frames = [rng.integers(0, 255, (1080, 1920, 3), dtype=np.uint8) for _ in range(count)]
+    return frames
+
+
+def time_predict(detector: DefectDetector, frames, runs: int, warmup: int = 5):
+    for i in range(warmup):
+        detector.predict(frames[i % len(frames)])
+    samples = []
+    for i in range(runs):
+        t0 = time.perf_counter()
+        detector.predict(frames[i % len(frames)])
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    arr = np.asarray(samples)
+    return {
+        "mean_ms": float(arr.mean()),
+        "p50_ms": float(np.percentile(arr, 50)),
+        "p95_ms": float(np.percentile(arr, 95)),
+        "fps": float(1000.0 / arr.mean()),
+    }
+
+
+def compare_engines(model_path: str, frames, runs: int, imgsz: int, conf: float):
+    rows = []
+    for engine in ("ultralytics", "native"):
+        det = DefectDetector(model_path, engine=engine)
+        det.update_settings(conf=conf, imgsz=imgsz)
+        stats = time_predict(det, frames, runs)
+        stats["engine"] = det.engine_name
+        rows.append(stats)
+    return rows
+
+
+def pool_throughput(model_path: str, frames, replicas: int, threads: int, clients: int, duration: float):
+    """Drive predict() from `clients` threads (one per camera) and report total frames/s."""
+    det = DefectDetector(model_path, replicas=replicas, intra_op_threads=threads)
+    for frame in frames[:len(det.replicas)]:
+        det.predict(frame)
+
+    counts = [0] * clients
+    stop = time.perf_counter() + duration
+
+    def _client(i):
+        n = 0
+        while time.perf_counter() < stop:
+            det.predict(frames[(i + n) % len(frames)])
+            n += 1
+        counts[i] = n
+
+    t0 = time.perf_counter()
+    workers = [threading.Thread(target=_client, args=(i,)) for i in range(clients)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    return {
+        "replicas": len(det.replicas),
+        "threads": threads,
+        "fps": sum(counts) / elapsed,
+        "per_replica": det.pool_stats(),
+    }
+
+
+def environment():
+    """Host and runtime versions a result depends on, stored with every suite report."""
+    versions = {}
+    for pkg in ("onnxruntime", "openvino", "ultralytics", "torch", "numpy", "opencv-python"):
+        try:
+            versions[pkg] = metadata.version(pkg)
+        except metadata.PackageNotFoundError:
+            versions[pkg] = None
+    return {
+        "host": platform.node(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "versions": versions,
+    }
+
+
+def frames_digest(frames) -> str:
+    """Short hash of the frame set, so a baseline is only compared on identical inputs."""
+    h = hashlib.sha1()
+    for frame in frames:
+        h.update(str(frame.shape).encode())
+        h.update(frame[::16, ::16].tobytes())
+    return h.hexdigest()[:12]
+
+
+def suite_models(models_dir: str, types=None):
+    """Every export in models_dir (via the registry), optionally limited to some types."""
+    entries = ModelRegistry().entries(models_dir)
+    return [e["path"] for e in entries if not types or e["type"] in types]
+
+
+def bench_case(model_path: str, frames, imgsz: int, threads: int, batch: int, runs: int, warmup: int, conf: float):
+    """Latency percentiles and throughput of one (model, imgsz, threads, batch) combination.
+
+    batch 1 drives predict(), larger batches drive predict_batch() with that many frames
+    per call; latency is per call, fps counts frames.
+    """
+    det = DefectDetector(model_path, intra_op_threads=threads)
+    try:
+        if os.path.abspath(det.model_path) != os.path.abspath(model_path):
+            raise RuntimeError(f"{model_path} failed to load (got {det.model_path})")
+        det.update_settings(conf=conf, imgsz=imgsz)
+        groups = [[frames[(i * batch + j) % len(frames)] for j in range(batch)] for i in range(max(runs, warmup))]
+
+        def _call(group):
+            if batch == 1:
+                det.predict(group[0])
+            else:
+                det.predict_batch(group)
+
+        for group in groups[:warmup]:
+            _call(group)
+        samples = []
+        t_start = time.perf_counter()
+        for group in groups[:runs]:
+            t0 = time.perf_counter()
+            _call(group)
+            samples.append((time.perf_counter() - t0) * 1000.0)
+        elapsed = time.perf_counter() - t_start
+        arr = np.asarray(samples)
+        # What the engine was actually fed: the static export shape, else the aspect-matched
+        # letterbox of each frame (not a square imgsz x imgsz)
+        fed = Counter(tuple(det.input_hw_for(f.shape, imgsz, mono=f.ndim == 2 or f.shape[2] == 1)) for f in frames)
+        input_hw = fed.most_common(1)[0][0]
+        row = {
+            "model": os.path.basename(model_path.rstrip("/\\")),
+            "path": os.path.abspath(model_path),
+            "type": det.current_model_type,
+            "engine": det.engine_name,
+            "imgsz": int(imgsz),
+            # Static-shape exports ignore imgsz; this is what the graph actually ran at
+            "input_hw": list(input_hw),
+            "static_input": det.input_size_fixed(),
+            "threads": int(threads),
+            "batch": int(batch),
+            "export_batch": det.max_batch,
+            "runs": len(samples),
+            "mean_ms": round(float(arr.mean()), 3),
+            "p50_ms": round(float(np.percentile(arr, 50)), 3),
+            "p95_ms": round(float(np.percentile(arr, 95)), 3),
+            "p99_ms": round(float(np.percentile(arr, 99)), 3),
+            "fps": round(len(samples) * batch / elapsed, 3),
+        }
+        if len(fed) > 1:
+            # Frames of several sizes: every input shape the run used
+            row["input_hws"] = [list(hw) for hw in sorted(fed)]
+        return row
+    finally:
+        det.close()
+
+
+def case_key(row) -> str:
+    return f"{row['model']}|imgsz={row['imgsz']}|threads={row['threads']}|batch={row['batch']}"
+
+
+def run_suite(models, frames, imgsz_list, threads_list, batches, runs=50, warmup=5, conf=0.25, frames_source=""):
+    """Benchmark every combination; failures are recorded instead of aborting the suite."""
+    results = []
+    for model_path in models:
+        for imgsz in imgsz_list:
+            for threads in threads_list:
+                for batch in batches:
+                    try:
+                        row = bench_case(model_path, frames, imgsz, threads, batch, runs, warmup, conf)
+                    except Exception as e:
+                        row = {
+                            "model": os.path.basename(model_path.rstrip("/\\")),
+                            "path": os.path.abspath(model_path),
+                            "imgsz": int(imgsz),
+                            "threads": int(threads),
+                            "batch": int(batch),
+                            "error": str(e),
+                        }
+                    print(_format_row(row))
+                    results.append(row)
+    return {
+        "created_at": time.time(),
+        "environment": environment(),
+        "frames": {
+            "count": len(frames),
+            "source": frames_source,
+            "shapes": sorted({str(f.shape) for f in frames}),
+            "digest": frames_digest(frames),
+        },
+        "config": {"runs": runs, "warmup": warmup, "conf": conf},
+        "results": results,
+    }
+
+
+def compare_baseline(report, baseline, tolerance: float = 0.1):
+    """Per-case p50 / p95 / fps change against a saved report; regressions beyond tolerance are flagged."""
+    base_rows = {case_key(r): r for r in baseline.get("results", []) if "error" not in r}
+    rows = []
+    for r in report["results"]:
+        b = base_rows.get(case_key(r))
+        if "error" in r or b is None:
+            continue
+        p50 = (r["p50_ms"] - b["p50_ms"]) / max(1e-9, b["p50_ms"])
+        p95 = (r["p95_ms"] - b["p95_ms"]) / max(1e-9, b["p95_ms"])
+        fps = (r["fps"] - b["fps"]) / max(1e-9, b["fps"])
+        rows.append(
+            {
+                "case": case_key(r),
+                "p50_ms": [b["p50_ms"], r["p50_ms"]],
+                "p95_ms": [b["p95_ms"], r["p95_ms"]],
+                "fps": [b["fps"], r["fps"]],
+                "p50_change": round(p50, 4),
+                "p95_change": round(p95, 4),
+                "fps_change": round(fps, 4),
+                "regression": p50 > tolerance or fps < -tolerance,
+            }
+        )
+    notes = []
+    if baseline.get("frames", {}).get("digest") != report["frames"]["digest"]:
+        notes.append("frame set differs from the baseline")
+    if baseline.get("environment", {}).get("host") != report["environment"]["host"]:
+        notes.append("baseline was recorded on another host")
+    if baseline.get("environment", {}).get("versions") != report["environment"]["versions"]:
+        notes.append("runtime versions differ from the baseline")
+    return {"tolerance": tolerance, "notes": notes, "cases": rows, "regressions": sum(r["regression"] for r in rows)}
+
+
+def _format_row(row):
+    if "error" in row:
+        return f"{row['model']:<34}{row['imgsz']:>6}{row['threads']:>5}{row['batch']:>4}  failed: {row['error']}"
+    return (
+        f"{row['model']:<34}{row['imgsz']:>6}{row['threads']:>5}{row['batch']:>4}"
+        f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}{row['fps']:>8.1f}  {row['engine']}"
+    )
+
+
+def _int_list(text):
+    return [int(x) for x in str(text).split(",") if x.strip()]
+
+
+def _bench_frames(images_dir, count):
+    """(frames, source): images_dir, else history captures, else synthetic frames."""
+    if images_dir:
+        return load_frames(images_dir, count), os.path.abspath(images_dir)
+    from calibration import default_history_dir, load_images, sample_history
+
+    source = default_history_dir()
+    frames = load_images(sample_history(source, count))
+    if not frames:
+        return load_frames(None, count), "synthetic"
+    return frames, source
+
+
+def cascade_throughput(model_path: str, screen_path: str, frames, runs: int, imgsz: int, conf: float, screen_conf: float, mode: str = "frame", warmup: int = 3):
+    """Real-time path (one frame per call) with the confirm model alone vs the screening cascade.
+
+    Both run the same frame sequence; fps counts frames. agreement / recall are the
+    cascade's confirmed detections against the confirm model alone (calibration's F1
+    matching), i.e. what screening lost. break_even_pass_rate is the share of frames the
+    screen may flag before the cascade is slower than the confirm model alone.
+    """
+    from calibration import detection_agreement
+    from cascade import CascadeDetector
+
+    confirm = DefectDetector(model_path)
+    screen = DefectDetector(screen_path)
+    try:
+        # DefectDetector falls back to other exports when one fails to load; a screen that
+        # silently became another model would make the comparison meaningless
+        for det, path in ((confirm, model_path), (screen, screen_path)):
+            if os.path.abspath(det.model_path) != os.path.abspath(path.rstrip("/\\")):
+                raise RuntimeError(f"{path} failed to load (got {det.model_path})")
+        confirm.update_settings(conf=conf, imgsz=imgsz)
+        screen.update_settings(imgsz=imgsz)
+        cascade = CascadeDetector(confirm, enabled=True, screen_conf=screen_conf, mode=mode)
+        cascade.set_screen(screen)
+        sequence = [frames[i % len(frames)] for i in range(runs)]
+
+        def _run(fn):
+            for frame in sequence[:warmup]:
+                fn([frame])
+            t0 = time.perf_counter()
+            outputs = [fn([frame])[0] for frame in sequence]
+            return time.perf_counter() - t0, outputs
+
+        single_s, reference = _run(confirm.predict_batch)
+        screen_s, _ = _run(screen.predict_batch)
+        cascade.reset_stats()
+        cascade_s, confirmed = _run(cascade.predict_batch)
+        stats = cascade.stats()
+        match = detection_agreement(reference, confirmed)
+        single_ms, screen_ms = single_s * 1000.0 / runs, screen_s * 1000.0 / runs
+        return {
+            "model": os.path.basename(confirm.model_path.rstrip("/\\")),
+            "screen": os.path.basename(screen.model_path.rstrip("/\\")),
+            "engine": confirm.engine_name,
+            "screen_engine": screen.engine_name,
+            "mode": mode,
+            "screen_conf": screen_conf,
+            "frames": runs,
+            "single_ms": round(single_ms, 2),
+            "screen_ms": round(screen_ms, 2),
+            "cascade_ms": round(cascade_s * 1000.0 / runs, 2),
+            "single_fps": round(runs / single_s, 2),
+            "cascade_fps": round(runs / cascade_s, 2),
+            "speedup": round(single_s / cascade_s, 3),
+            "pass_rate": stats["pass_rate"],
+            "regions": stats["regions"],
+            "break_even_pass_rate": round(max(0.0, 1.0 - screen_ms / single_ms), 3) if single_ms else None,
+            "agreement": round(match["agreement"], 4),
+            "recall": round(match["recall"], 4),
+            "boxes_single": match["boxes_ref"],
+            "boxes_cascade": match["boxes_test"],
+        }
+    finally:
+        screen.close()
+        confirm.close()
+
+
+def _cascade_main(args):
+    frames, source = _bench_frames(args.images, args.frames)
+    print(f"Cascade: {args.screen} screening for {args.model} on {len(frames)} frame(s) from {source}")
+    rows = [
+        cascade_throughput(args.model, args.screen, frames, args.runs, args.imgsz, args.conf, float(sc), args.mode)
+        for sc in str(args.screen_conf).split(",") if sc.strip()
+    ]
+    print(f"{'screen conf':>12}{'pass rate':>11}{'single fps':>12}{'cascade fps':>13}{'speedup':>9}{'recall':>8}{'agreement':>11}")
+    for r in rows:
+        print(f"{r['screen_conf']:>12.3f}{r['pass_rate']:>11.2f}{r['single_fps']:>12.2f}{r['cascade_fps']:>13.2f}{r['speedup']:>8.2f}x{r['recall']:>8.3f}{r['agreement']:>11.3f}")
+    if rows:
+        r = rows[0]
+        print(f"Screen alone {r['screen_ms']:.1f} ms vs {r['single_ms']:.1f} ms: the cascade is faster while under {r['break_even_pass_rate'] * 100:.0f}% of frames are flagged")
+    report = {"environment": environment(), "frames_source": source, "frames_digest": frames_digest(frames), "results": rows}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Report written: {args.output}")
+    return 0
+
+
+def _suite_main(args):
+    frames, source = _bench_frames(args.images, args.frames)
+    if args.models:
+        models = [m.strip() for m in args.models.split(",") if m.strip()]
+    else:
+        models_dir = args.models_dir or os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+        types = [t.strip() for t in args.types.split(",") if t.strip()] if args.types else None
+        models = suite_models(models_dir, types)
+    if not models:
+        print("No models to benchmark.")
+        return 1
+
+    print(f"Suite: {len(models)} model(s) on {len(frames)} frame(s) from {source}")
+    print(f"{'model':<34}{'imgsz':>6}{'thr':>5}{'bs':>4}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'fps':>8}  engine")
+    report = run_suite(
+        models,
+        frames,
+        _int_list(args.imgsz),
+        _int_list(args.threads),
+        _int_list(args.batches),
+        runs=args.runs,
+        warmup=args.warmup,
+        conf=args.conf,
+        frames_source=source,
+    )
+
+    # Per input size, since static-shape exports run at their export size whatever imgsz says
+    ok = [r for r in report["results"] if "error" not in r and r["batch"] == 1]
+    for hw in sorted({tuple(r["input_hw"]) for r in ok}):
+        best = min((r for r in ok if tuple(r["input_hw"]) == hw), key=lambda r: r["p50_ms"])
+        print(f"Fastest single-frame at {hw[1]}x{hw[0]}: {best['model']} ({best['type']}, threads={best['threads']}) p50 {best['p50_ms']:.1f} ms")
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            report["baseline"] = compare_baseline(report, json.load(f), args.tolerance)
+        cmp = report["baseline"]
+        for note in cmp["notes"]:
+            print(f"Note: {note}")
+        for row in cmp["cases"]:
+            flag = "REGRESSION" if row["regression"] else ""
+            print(f"{row['case']:<60} p50 {row['p50_change'] * 100:+6.1f}%  fps {row['fps_change'] * 100:+6.1f}%  {flag}")
+        print(f"{cmp['regressions']} regression(s) beyond {args.tolerance * 100:.0f}% in {len(cmp['cases'])} compared case(s)")
+        if cmp["regressions"] and args.fail_on_regression:
+            status = 1
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Report written: {args.output}")
+    else:
+        print(json.dumps(report, ensure_ascii=False))
+    return status
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default=None, help=".onnx file or *_openvino_model directory")
+    parser.add_argument("--images", default=None, help="directory of sample frames (default: synthetic 1080p)")
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--replicas", default=None, help="comma-separated replica counts, e.g. 1,2,4")
+    parser.add_argument("--threads", type=int, default=0, help="intra-op threads per replica (0 = cores / replicas)")
+    parser.add_argument("--clients", type=int, default=4, help="concurrent callers (one per camera)")
+    parser.add_argument("--duration", type=float, default=10.0)
+    sub = parser.add_subparsers(dest="command")
+    st = sub.add_parser("suite", help="predict / predict_batch matrix over models, imgsz, threads and batch sizes")
+    st.add_argument("--models", default=None, help="comma-separated exports (default: every export in --models-dir)")
+    st.add_argument("--models-dir", default=None)
+    st.add_argument("--types", default=None, help="limit discovered exports, e.g. onnx,openvino")
+    st.add_argument("--images", default=None, help="frame directory (default: history captures, else synthetic)")
+    st.add_argument("--frames", type=int, default=16)
+    st.add_argument("--imgsz", default="640")
+    st.add_argument("--threads", default="0")
+    st.add_argument("--batches", default="1,4")
+    st.add_argument("--runs", type=int, default=50)
+    st.add_argument("--warmup", type=int, default=5)
+    st.add_argument("--conf", type=float, default=0.25)
+    st.add_argument("--output", default=None, help="write the JSON report here (default: stdout)")
+    st.add_argument("--baseline", default=None, help="earlier --output report to compare with")
+    st.add_argument("--tolerance", type=float, default=0.1, help="relative p50 / fps change counted as a regression")
+    st.add_argument("--fail-on-regression", action="store_true")
+    cs = sub.add_parser("cascade", help="throughput of the nano-screen cascade vs the confirm model alone")
+    cs.add_argument("--model", default="models/best.onnx", help="confirm model (the active yolo26s export)")
+    cs.add_argument("--screen", required=True, help="screening model, e.g. models/yolo26n.onnx")
+    cs.add_argument("--screen-conf", default="0.1", help="comma-separated screen thresholds to compare")
+    cs.add_argument("--mode", default="frame", choices=["frame", "region"])
+    cs.add_argument("--images", default=None, help="frame directory (default: history captures, else synthetic)")
+    cs.add_argument("--frames", type=int, default=32)
+    cs.add_argument("--runs", type=int, default=64)
+    cs.add_argument("--imgsz", type=int, default=640)
+    cs.add_argument("--conf", type=float, default=0.25)
+    cs.add_argument("--output", default=None, help="also write the JSON report here")
+    args = parser.parse_args()
+
+    if args.command == "suite":
+        raise SystemExit(_suite_main(args))
+    if args.command == "cascade":
+        raise SystemExit(_cascade_main(args))
+    if not args.model:
+        parser.error("--model is required")
+
+    frames = load_frames(args.images)
+
+    if args.replicas:
+        cores = os.cpu_count() or 1
+        print(f"{'replicas':>9}{'threads':>9}{'total fps':>11}")
+        for n in [int(x) for x in args.replicas.split(",") if x.strip()]:
+            threads = args.threads or max(1, cores // n)
+            r = pool_throughput(args.model, frames, n, threads, args.clients, args.duration)
+            print(f"{r['replicas']:>9}{r['threads']:>9}{r['fps']:>11.1f}")
+        raise SystemExit(0)
+    rows = compare_engines(args.model, frames, args.runs, args.imgsz, args.conf)
+
+    print(f"{'engine':<14}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'fps':>8}")
+    for r in rows:
+        print(f"{r['engine']:<14}{r['mean_ms']:>10.2f}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['fps']:>8.1f}")
+    if len(rows) == 2 and rows[1]["mean_ms"] > 0:
+        print(f"native speedup: {rows[0]['mean_ms'] / rows[1]['mean_ms']:.2f}x")
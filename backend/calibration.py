@@ -0,0 +1,222 @@
+"""INT8 calibration from our own captures, and FP32 vs INT8 comparison.
+
+Frames come from the backend's history directory (manual trigger snapshots,
+real-time alert snapshots and uploaded images), so the activation ranges match
+the cameras and lighting the models actually see instead of coco8.
+"""
+import glob
+import os
+import time
+
+import cv2
+import numpy as np
+
+from detections import box_iou
+from detector import DefectDetector, _letterbox_batch
+
+# History captures usable for calibration; detected_* are annotated copies of raw_* uploads
+HISTORY_PATTERNS = ("manual_trigger_slot*.jpg", "auto_detect_slot*.jpg", "raw_*.jpg")
+
+
+def default_history_dir() -> str:
+    """The history dir main.py writes to (same data dir resolution, without importing main)."""
+    base_dir = os.environ.get("HK_TAURI_DATA_DIR") or os.environ.get("HK_TAURI_CONFIG_DIR")
+    if not base_dir:
+        appdata = os.environ.get("APPDATA") or os.environ.get("LOCALAPPDATA")
+        base_dir = os.path.join(appdata or os.getcwd(), "HK_Tauri_Data")
+    return os.path.join(base_dir, "history")
+
+
+def sample_history(history_dir: str, count: int = 200):
+    """Up to count capture paths, spread evenly over time within each source (slot / upload)."""
+    groups = {}
+    for pattern in HISTORY_PATTERNS:
+        for path in glob.glob(os.path.join(history_dir, pattern)):
+            source = os.path.basename(path).rsplit("_", 1)[0]
+            groups.setdefault(source, []).append(path)
+    if not groups:
+        return []
+    for paths in groups.values():
+        paths.sort(key=os.path.getmtime)
+    # Equal share per source so one busy camera does not dominate the activation ranges
+    share = max(1, count // len(groups))
+    picked = []
+    for paths in groups.values():
+        if len(paths) > share:
+            idx = np.linspace(0, len(paths) - 1, share).round().astype(int)
+            paths = [paths[i] for i in sorted(set(idx.tolist()))]
+        picked.extend(paths)
+    return sorted(picked, key=os.path.getmtime)[-count:]
+
+
+def load_images(paths):
+    frames = []
+    for path in paths:
+        img = cv2.imread(path, cv2.IMREAD_COLOR)
+        if img is not None:
+            frames.append(img)
+    return frames
+
+
+class _FrameReader:
+    """onnxruntime CalibrationDataReader over frames, letterboxed exactly like the native engines."""
+
+    def __init__(self, frames, input_name, input_hw):
+        self._frames = iter(frames)
+        self._input_name = input_name
+        self._input_hw = input_hw
+
+    def get_next(self):
+        frame = next(self._frames, None)
+        if frame is None:
+            return None
+        blob, _, _ = _letterbox_batch([frame], self._input_hw)
+        return {self._input_name: blob}
+
+    def rewind(self):
+        pass
+
+
+def quantize_onnx(fp32_path: str, int8_path: str, frames, imgsz: int = 640, method: str = "minmax") -> str:
+    """Static INT8 (QDQ) quantization of an FP32 ONNX export, calibrated on frames.
+
+    Only Conv / MatMul are quantized; the detection head's box decode stays in float.
+    Ultralytics metadata (names, stride, end2end) is carried over for the native engines.
+    """
+    import onnx
+    import onnxruntime as ort
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+
+    session = ort.InferenceSession(fp32_path, providers=["CPUExecutionProvider"])
+    inp = session.get_inputs()[0]
+    _, _, h, w = inp.shape
+    input_hw = (h, w) if isinstance(h, int) and isinstance(w, int) else (int(imgsz), int(imgsz))
+    del session
+
+    methods = {
+        "minmax": CalibrationMethod.MinMax,
+        "entropy": CalibrationMethod.Entropy,
+        "percentile": CalibrationMethod.Percentile,
+    }
+    quantize_static(
+        fp32_path,
+        int8_path,
+        _FrameReader(frames, inp.name, input_hw),
+        quant_format=QuantFormat.QDQ,
+        op_types_to_quantize=["Conv", "MatMul"],
+        per_channel=True,
+        # Unsigned activations: OpenVINO's CPU plugin fails to compile the s8-activation graph
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        calibrate_method=methods.get(method, CalibrationMethod.MinMax),
+    )
+
+    fp32 = onnx.load(fp32_path, load_external_data=False)
+    int8 = onnx.load(int8_path)
+    del int8.metadata_props[:]
+    int8.metadata_props.extend(fp32.metadata_props)
+    onnx.save(int8, int8_path)
+    return int8_path
+
+
+def onnx_to_openvino(onnx_path: str, out_dir: str) -> str:
+    """Convert an ONNX export (FP32 or QDQ INT8) to an OpenVINO IR directory the detector can load.
+
+    OpenVINO turns QDQ pairs into FakeQuantize and runs those layers in INT8.
+    """
+    import onnx
+    import openvino as ov
+    import yaml
+
+    os.makedirs(out_dir, exist_ok=True)
+    # Core.read_model keeps the QDQ layout the CPU plugin compiles; convert_model's rewrite of it does not compile
+    model = ov.Core().read_model(onnx_path)
+    ov.save_model(model, os.path.join(out_dir, "best.xml"), compress_to_fp16=False)
+    meta = {p.key: p.value for p in onnx.load(onnx_path, load_external_data=False).metadata_props}
+    with open(os.path.join(out_dir, "metadata.yaml"), "w", encoding="utf-8") as f:
+        yaml.safe_dump(meta, f, allow_unicode=True, sort_keys=False)
+    return out_dir
+
+
+def match_detections(ref, test, iou_thres: float = 0.5):
+    """Greedy same-class matching of test against ref Detections; returns matched IoUs."""
+    if not len(ref) or not len(test):
+        return []
+    iou = box_iou(test.xyxy, ref.xyxy)
+    iou[test.cls[:, None] != ref.cls[None, :]] = 0.0
+    matched = []
+    for i in np.argsort(-test.conf):
+        j = int(iou[i].argmax())
+        if iou[i, j] >= iou_thres:
+            matched.append(float(iou[i, j]))
+            iou[:, j] = 0.0
+    return matched
+
+
+def detection_agreement(ref_results, test_results, iou_thres: float = 0.5):
+    """How closely test reproduces ref on the same frames (ref, e.g. FP32 or the model
+    without a screening cascade, is treated as truth).
+
+    agreement is the F1 of matched boxes; frames where both models see nothing count as
+    agreeing. boxes_ref / boxes_test are the box counts of each side.
+    """
+    n_ref = n_test = n_match = 0
+    ious = []
+    frames_equal = 0
+    for ref, test in zip(ref_results, test_results):
+        matched = match_detections(ref, test, iou_thres)
+        n_ref += len(ref)
+        n_test += len(test)
+        n_match += len(matched)
+        ious.extend(matched)
+        if len(matched) == len(ref) == len(test):
+            frames_equal += 1
+    total = n_ref + n_test
+    return {
+        "agreement": (2.0 * n_match / total) if total else 1.0,
+        "recall": (n_match / n_ref) if n_ref else 1.0,
+        "precision": (n_match / n_test) if n_test else 1.0,
+        "mean_iou": float(np.mean(ious)) if ious else None,
+        "frames_identical": frames_equal / max(1, len(ref_results)),
+        "boxes_ref": n_ref,
+        "boxes_test": n_test,
+    }
+
+
+def run_model(model_path: str, frames, imgsz: int, conf: float, warmup: int = 3):
+    """Detections and per-frame latency (ms) of one export over frames."""
+    det = DefectDetector(model_path)
+    try:
+        # DefectDetector falls back to other exports when one fails to load; that must not pass as this one
+        if os.path.abspath(det.model_path) != os.path.abspath(model_path):
+            raise RuntimeError(f"{model_path} failed to load (got {det.model_path})")
+        det.update_settings(conf=conf, imgsz=imgsz)
+        for i in range(min(warmup, len(frames))):
+            det.predict(frames[i])
+        results, times = [], []
+        for frame in frames:
+            t0 = time.perf_counter()
+            results.append(det.predict(frame))
+            times.append((time.perf_counter() - t0) * 1000.0)
+        arr = np.asarray(times)
+        stats = {
+            "engine": det.engine_name,
+            "mean": round(float(arr.mean()), 2),
+            "p50": round(float(np.percentile(arr, 50)), 2),
+            "p95": round(float(np.percentile(arr, 95)), 2),
+        }
+        return results, stats
+    finally:
+        det.close()
+
+
+def compare(fp32_path: str, int8_path: str, frames, imgsz: int, conf: float, iou_thres: float = 0.5):
+    """Latency gain and detection agreement of int8_path against fp32_path on the same frames."""
+    ref, ref_lat = run_model(fp32_path, frames, imgsz, conf)
+    test, test_lat = run_model(int8_path, frames, imgsz, conf)
+    report = detection_agreement(ref, test, iou_thres)
+    report["agreement_loss"] = round(1.0 - report["agreement"], 4)
+    report["latency_fp32_ms"] = ref_lat
+    report["latency_int8_ms"] = test_lat
+    report["speedup"] = round(ref_lat["mean"] / max(1e-6, test_lat["mean"]), 3)
+    return report
@@ -0,0 +1,175 @@
+import threading
+import time
+
+import numpy as np
+
+from detections import Detections
+from detector import _TILE_MERGE_IOS
+
+MODES = ("frame", "region")
+_EMA_ALPHA = 0.2
+_REGION_CONTEXT = 0.5  # context around a flagged box, as a fraction of its size per side
+_MAX_REGIONS = 4  # more crops than this cost more than confirming the whole frame
+
+
+def region_windows(boxes, shape, size, context=_REGION_CONTEXT, max_regions=_MAX_REGIONS):
+    """Crop windows (x0, y0, x1, y1) around flagged boxes for confirmation, or None to
+    confirm the whole frame.
+
+    Each window holds its box plus context and is at least size pixels per side (clamped
+    to the frame), so the confirm model sees the region at up to native resolution like a
+    tile; overlapping windows are merged into their union.
+    """
+    h, w = shape[:2]
+    windows = []
+    for x1, y1, x2, y2 in np.asarray(boxes, dtype=np.float64):
+        ww = min(w, max(size, (x2 - x1) * (1.0 + 2.0 * context)))
+        wh = min(h, max(size, (y2 - y1) * (1.0 + 2.0 * context)))
+        x0 = min(max((x1 + x2 - ww) / 2, 0.0), w - ww)
+        y0 = min(max((y1 + y2 - wh) / 2, 0.0), h - wh)
+        windows.append([int(x0), int(y0), int(round(x0 + ww)), int(round(y0 + wh))])
+    merged = True
+    while merged and len(windows) > 1:
+        merged = False
+        for i in range(len(windows)):
+            for j in range(i + 1, len(windows)):
+                a, b = windows[i], windows[j]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    windows[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                    del windows[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    if len(windows) > max_regions:
+        return None
+    return [tuple(win) for win in windows]
+
+
+class CascadeDetector:
+    """Two-stage real-time inference: a small screening model (yolo26n) on every frame,
+    the active model (yolo26s) only where the screen found something.
+
+    The screen runs at screen_conf, below the detector's conf, so it errs towards
+    flagging. Frames it leaves empty return no detections without touching the confirm
+    model. Flagged frames go through the confirm model whole ("frame"), or as crops
+    around the flagged boxes ("region", see region_windows); crop detections are shifted
+    back and merged across crops like tiles. Only confirmed detections are returned, so
+    tracks and alerts follow the confirm model.
+    """
+
+    def __init__(self, confirm, enabled: bool = False, screen_model: str = "yolo26n", screen_conf: float = 0.1, mode: str = "frame"):
+        self.confirm = confirm
+        self.screen = None
+        self.mode = MODES[0]
+        self._lock = threading.Lock()
+        self.configure(enabled, screen_model, screen_conf, mode)
+        self.reset_stats()
+
+    def configure(self, enabled=None, screen_model=None, screen_conf=None, mode=None):
+        with self._lock:
+            if enabled is not None:
+                self.enabled = bool(enabled)
+            if screen_model is not None:
+                self.screen_model = str(screen_model)
+            if screen_conf is not None:
+                self.screen_conf = min(1.0, max(0.001, float(screen_conf)))
+            if mode is not None and mode in MODES:
+                self.mode = mode
+            screen = self.screen
+        if screen is not None:
+            screen.update_settings(conf=self.screen_conf)
+
+    def set_screen(self, screen):
+        """Install the loaded screening detector (None to detach); returns the previous one."""
+        if screen is not None:
+            screen.update_settings(conf=self.screen_conf)
+        with self._lock:
+            old, self.screen = self.screen, screen
+        return old
+
+    def reset_stats(self):
+        with self._lock:
+            self._frames = 0
+            self._flagged = 0
+            self._regions = 0
+            self._screen_ms = 0.0
+            self._confirm_ms = 0.0
+
+    def active(self) -> bool:
+        screen, confirm = self.screen, self.confirm
+        if not (self.enabled and screen is not None and screen.is_loaded() and confirm.is_loaded()):
+            return False
+        # After a model switch the active model may be the screen itself: run it once, not twice
+        return screen.model_path != confirm.model_path
+
+    @staticmethod
+    def _ema(old, new):
+        return new if old <= 0 else old * (1.0 - _EMA_ALPHA) + new * _EMA_ALPHA
+
+    def predict_batch(self, frames, imgsz=None):
+        """Confirmed Detections per frame, in input order (same contract as DefectDetector.predict_batch)."""
+        if not frames:
+            return []
+        screen = self.screen
+        if screen is None:
+            # Detached between the scheduler's check and this call
+            return self.confirm.predict_batch(frames, imgsz)
+        t0 = time.perf_counter()
+        screened = screen.predict_batch(frames, imgsz)
+        t1 = time.perf_counter()
+
+        units, owners, origins = [], [], []
+        tiled = set()
+        size = int(imgsz or self.confirm.imgsz)
+        for i, (frame, dets) in enumerate(zip(frames, screened)):
+            if not len(dets):
+                continue
+            windows = region_windows(dets.xyxy, frame.shape, size) if self.mode == "region" else None
+            if windows is None:
+                units.append(frame)
+                owners.append(i)
+                origins.append((0, 0))
+                continue
+            tiled.add(i)
+            for x0, y0, x1, y1 in windows:
+                units.append(frame[y0:y1, x0:x1])
+                owners.append(i)
+                origins.append((x0, y0))
+
+        results = [Detections() for _ in frames]
+        if units:
+            outputs = self.confirm.predict_batch(units, imgsz)
+            parts = {}
+            for owner, (x0, y0), dets in zip(owners, origins, outputs):
+                parts.setdefault(owner, []).append(dets.offset(x0, y0) if (x0 or y0) else dets)
+            for owner, found in parts.items():
+                results[owner] = Detections.concat(found).nms(_TILE_MERGE_IOS, metric="ios") if owner in tiled else found[0]
+        t2 = time.perf_counter()
+
+        with self._lock:
+            self._frames += len(frames)
+            self._flagged += len(set(owners))
+            self._regions += sum(1 for owner in owners if owner in tiled)
+            self._screen_ms = self._ema(self._screen_ms, (t1 - t0) * 1000.0 / len(frames))
+            if units:
+                self._confirm_ms = self._ema(self._confirm_ms, (t2 - t1) * 1000.0 / len(units))
+        return results
+
+    def stats(self):
+        with self._lock:
+            screen = self.screen
+            return {
+                "enabled": self.enabled,
+                "active": self.active(),
+                "mode": self.mode,
+                "screen_model": self.screen_model,
+                "screen_engine": screen.engine_name if screen is not None and screen.is_loaded() else None,
+                "screen_conf": self.screen_conf,
+                "frames": self._frames,
+                "flagged": self._flagged,
+                "pass_rate": round(self._flagged / self._frames, 4) if self._frames else 0.0,
+                "regions": self._regions,
+                "screen_ms": round(self._screen_ms, 2),
+                "confirm_ms": round(self._confirm_ms, 2),
+            }
@@ -0,0 +1,85 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+_THUMB = 64  # thumbnail edge (px); 8x8 blocks of 8x8 px
+_BLOCKS = 8
+
+
+class ChangeGate:
+    """Skips real-time inference while a slot's scene is static.
+
+    Each candidate frame is shrunk to a 64x64 grey thumbnail and compared with the
+    thumbnail of the last frame that was actually inferred. The per-block mean
+    absolute difference catches small local changes that a whole-frame mean would
+    average away. A forced refresh bounds how stale reused detections can get.
+    """
+
+    def __init__(self, enabled: bool = True, threshold: float = 4.0, refresh_s: float = 1.0):
+        self._lock = threading.Lock()
+        self.configure(enabled, threshold, refresh_s)
+        self.checked = 0
+        self.skipped = 0
+        self.last_diff = 0.0
+        self.reset()
+
+    def configure(self, enabled=None, threshold=None, refresh_s=None):
+        with self._lock:
+            if enabled is not None:
+                self.enabled = bool(enabled)
+            if threshold is not None:
+                self.threshold = max(0.0, float(threshold))
+            if refresh_s is not None:
+                self.refresh_s = max(0.0, float(refresh_s))
+
+    def reset(self):
+        """Forget the reference frame (camera reconnect, model or ROI change)."""
+        with self._lock:
+            self._ref = None
+            self._ref_time = 0.0
+
+    @staticmethod
+    def thumbnail(frame):
+        # Raw captures can be tens of megapixels: stride down to a few x the thumbnail first
+        step = max(1, min(frame.shape[:2]) // (_THUMB * 4))
+        if step > 1:
+            frame = frame[::step, ::step]
+        if frame.ndim == 3 and frame.shape[2] == 3:
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        elif frame.ndim == 3:
+            frame = frame[:, :, 0]
+        return cv2.resize(frame, (_THUMB, _THUMB), interpolation=cv2.INTER_AREA).astype(np.int16)
+
+    def should_infer(self, frame, now: float | None = None) -> bool:
+        """True when frame differs enough from the last inferred one (or the refresh is due).
+
+        A True result makes frame the new reference, so call it only when the caller
+        is about to run inference on it.
+        """
+        now = time.perf_counter() if now is None else now
+        thumb = self.thumbnail(frame)
+        with self._lock:
+            self.checked += 1
+            if self.enabled and self._ref is not None and (now - self._ref_time) < self.refresh_s:
+                diff = np.abs(thumb - self._ref)
+                block = _THUMB // _BLOCKS
+                block_mad = diff.reshape(_BLOCKS, block, _BLOCKS, block).mean(axis=(1, 3))
+                self.last_diff = float(block_mad.max())
+                if self.last_diff < self.threshold:
+                    self.skipped += 1
+                    return False
+            self._ref = thumb
+            self._ref_time = now
+            return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "checked": self.checked,
+                "skipped": self.skipped,
+                "saved_ratio": (self.skipped / self.checked) if self.checked else 0.0,
+                "last_diff": self.last_diff,
+            }
@@ -32,6 +32,34 @@ def default_settings() -> Dict[str, Any]:
         "log_interval": 10,
         "model_type": "auto",
         "model_name": "yolo26s",
+        "inference_engine": "auto",
+        "replicas": 1,
+        "intra_op_threads": 0,
+        "replica_dispatch": "least_loaded",
+        "replica_mode": "thread",
+        "openvino_async": False,
+        "async_requests": 0,
+        "model_cache_mb": 1024,
+        # On-host tuning of export / threads / imgsz; result makes model_type "auto" pick the winner
+        "autotune": {
+            "on_first_start": True,
+            "budget_ms": 100.0,
+            "imgsz_options": [480, 640],
+            "threads_options": [0],
+            "runs": 20,
+            "formats": ["pt", "onnx", "openvino"],
+            "result": None,
+        },
+        # Real-time mode: reuse the last detections while the scene is static
+        "change_gate": {"enabled": True, "threshold": 4.0, "refresh_s": 1.0},
+        # Real-time mode: degrade inference rate / imgsz / stream quality to hold the latency target
+        "governor": {"enabled": True, "target_ms": 150.0, "down_after_s": 2.0, "up_after_s": 10.0},
+        # Real-time mode: track detections between detector runs; one alert per new track
+        "tracker": {"enabled": True, "detect_every": 3, "high_conf": 0.5, "match_iou": 0.3, "min_hits": 2, "max_misses": 3},
+        # Inference scheduling: real-time frame deadline, slower sampling of slots without recent defects
+        "scheduler": {"auto_deadline_s": 1.0, "idle_factor": 2.0, "active_window_s": 10.0, "active_weight": 2.0, "max_wait_ms": 5.0},
+        # Real-time mode: screen every frame with a nano model, confirm flagged frames / regions with the active one
+        "cascade": {"enabled": False, "screen_model": "yolo26n", "screen_conf": 0.1, "mode": "frame"},
         "manual_mode": True,
         "scene_mode": "day",
         "camera_params": {
@@ -40,9 +68,141 @@ def default_settings() -> Dict[str, Any]:
             "2": {"exposure_time_us": 50000.0, "gain_db": 0.0},
             "3": {"exposure_time_us": 50000.0, "gain_db": 0.0},
         },
+        # Manual-trigger tiling of the full-resolution frame, per slot
+        "tiling": {
+            "0": {"enabled": False, "tile_size": 640, "overlap": 0.2},
+            "1": {"enabled": False, "tile_size": 640, "overlap": 0.2},
+            "2": {"enabled": False, "tile_size": 640, "overlap": 0.2},
+            "3": {"enabled": False, "tile_size": 640, "overlap": 0.2},
+        },
+        # Regions of interest per slot, points normalised to [0, 1] of the frame
+        "roi": {
+            "0": {"enabled": False, "mode": "bbox", "regions": []},
+            "1": {"enabled": False, "mode": "bbox", "regions": []},
+            "2": {"enabled": False, "mode": "bbox", "regions": []},
+            "3": {"enabled": False, "mode": "bbox", "regions": []},
+        },
     }
 
 
+def normalize_tiling(current: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge a per-slot tiling update into current, clamping values to sane ranges."""
+    merged = dict(current)
+    if "enabled" in update:
+        merged["enabled"] = bool(update["enabled"])
+    if "tile_size" in update:
+        merged["tile_size"] = min(4096, max(128, int(update["tile_size"])))
+    if "overlap" in update:
+        merged["overlap"] = min(0.5, max(0.0, float(update["overlap"])))
+    return merged
+
+
+def normalize_roi(current: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge a per-slot ROI update; keeps only well-formed rect (2 points) / polygon (3+) regions."""
+    merged = dict(current)
+    if "enabled" in update:
+        merged["enabled"] = bool(update["enabled"])
+    if update.get("mode") in ("bbox", "packed"):
+        merged["mode"] = update["mode"]
+    if isinstance(update.get("regions"), list):
+        regions = []
+        for region in update["regions"]:
+            if not isinstance(region, dict):
+                continue
+            kind = "rect" if region.get("type") == "rect" else "polygon"
+            try:
+                points = [[min(1.0, max(0.0, float(x))), min(1.0, max(0.0, float(y)))] for x, y in region.get("points") or []]
+            except (TypeError, ValueError):
+                continue
+            if len(points) >= (2 if kind == "rect" else 3):
+                regions.append({"type": kind, "points": points})
+        merged["regions"] = regions
+    return merged
+
+
+def normalize_autotune(current: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge an autotune settings update; the result itself is only written by the tuner."""
+    merged = dict(current)
+    if "on_first_start" in update:
+        merged["on_first_start"] = bool(update["on_first_start"])
+    if "budget_ms" in update:
+        merged["budget_ms"] = max(1.0, float(update["budget_ms"]))
+    if "runs" in update:
+        merged["runs"] = min(500, max(3, int(update["runs"])))
+    if isinstance(update.get("imgsz_options"), list):
+        sizes = sorted({min(2048, max(64, int(v) // 32 * 32)) for v in update["imgsz_options"]})
+        merged["imgsz_options"] = sizes or merged["imgsz_options"]
+    if isinstance(update.get("threads_options"), list):
+        threads = sorted({max(0, int(v)) for v in update["threads_options"]})
+        merged["threads_options"] = threads or merged["threads_options"]
+    if isinstance(update.get("formats"), list):
+        formats = [f for f in ("pt", "onnx", "openvino") if f in {str(v).lower() for v in update["formats"]}]
+        merged["formats"] = formats or merged["formats"]
+    return merged
+
+
+def normalize_governor(current: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge a latency governor settings update."""
+    merged = dict(current)
+    if "enabled" in update:
+        merged["enabled"] = bool(update["enabled"])
+    if "target_ms" in update:
+        merged["target_ms"] = max(1.0, float(update["target_ms"]))
+    if "down_after_s" in update:
+        merged["down_after_s"] = max(0.0, float(update["down_after_s"]))
+    if "up_after_s" in update:
+        merged["up_after_s"] = max(0.0, float(update["up_after_s"]))
+    return merged
+
+
+def normalize_tracker(current: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge a real-time tracker settings update."""
+    merged = dict(current)
+    if "enabled" in update:
+        merged["enabled"] = bool(update["enabled"])
+    if "detect_every" in update:
+        merged["detect_every"] = min(30, max(1, int(update["detect_every"])))
+    if "high_conf" in update:
+        merged["high_conf"] = min(1.0, max(0.0, float(update["high_conf"])))
+    if "match_iou" in update:
+        merged["match_iou"] = min(1.0, max(0.01, float(update["match_iou"])))
+    if "min_hits" in update:
+        merged["min_hits"] = min(10, max(1, int(update["min_hits"])))
+    if "max_misses" in update:
+        merged["max_misses"] = min(100, max(0, int(update["max_misses"])))
+    return merged
+
+
+def normalize_scheduler(current: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge an inference scheduler settings update."""
+    merged = dict(current)
+    if "auto_deadline_s" in update:
+        merged["auto_deadline_s"] = max(0.0, float(update["auto_deadline_s"]))
+    if "idle_factor" in update:
+        merged["idle_factor"] = min(10.0, max(1.0, float(update["idle_factor"])))
+    if "active_window_s" in update:
+        merged["active_window_s"] = max(0.0, float(update["active_window_s"]))
+    if "active_weight" in update:
+        merged["active_weight"] = min(10.0, max(1.0, float(update["active_weight"])))
+    if "max_wait_ms" in update:
+        merged["max_wait_ms"] = min(100.0, max(0.0, float(update["max_wait_ms"])))
+    return merged
+
+
+def normalize_cascade(current: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge a screening cascade settings update."""
+    merged = dict(current)
+    if "enabled" in update:
+        merged["enabled"] = bool(update["enabled"])
+    if "screen_model" in update and str(update["screen_model"]).strip():
+        merged["screen_model"] = str(update["screen_model"]).strip()
+    if "screen_conf" in update:
+        merged["screen_conf"] = min(1.0, max(0.001, float(update["screen_conf"])))
+    if update.get("mode") in ("frame", "region"):
+        merged["mode"] = update["mode"]
+    return merged
+
+
 def load_settings() -> Dict[str, Any]:
     path = _config_path()
     data = default_settings()
@@ -68,6 +228,47 @@ def load_settings() -> Dict[str, Any]:
                         "gain_db": float(v.get("gain_db", merged[k]["gain_db"])),
                     }
                 data["camera_params"] = merged
+            if isinstance(on_disk.get("tiling"), dict):
+                tiling = default_settings()["tiling"]
+                for k, v in on_disk["tiling"].items():
+                    if k in tiling and isinstance(v, dict):
+                        tiling[k] = normalize_tiling(tiling[k], v)
+                data["tiling"] = tiling
+            if isinstance(on_disk.get("autotune"), dict):
+                autotune = default_settings()["autotune"]
+                try:
+                    autotune = normalize_autotune(autotune, on_disk["autotune"])
+                except (TypeError, ValueError):
+                    pass
+                if isinstance(on_disk["autotune"].get("result"), dict):
+                    autotune["result"] = on_disk["autotune"]["result"]
+                data["autotune"] = autotune
+            if isinstance(on_disk.get("governor"), dict):
+                try:
+                    data["governor"] = normalize_governor(default_settings()["governor"], on_disk["governor"])
+                except (TypeError, ValueError):
+                    data["governor"] = default_settings()["governor"]
+            if isinstance(on_disk.get("tracker"), dict):
+                try:
+                    data["tracker"] = normalize_tracker(default_settings()["tracker"], on_disk["tracker"])
+                except (TypeError, ValueError):
+                    data["tracker"] = default_settings()["tracker"]
+            if isinstance(on_disk.get("scheduler"), dict):
+                try:
+                    data["scheduler"] = normalize_scheduler(default_settings()["scheduler"], on_disk["scheduler"])
+                except (TypeError, ValueError):
+                    data["scheduler"] = default_settings()["scheduler"]
+            if isinstance(on_disk.get("cascade"), dict):
+                try:
+                    data["cascade"] = normalize_cascade(default_settings()["cascade"], on_disk["cascade"])
+                except (TypeError, ValueError):
+                    data["cascade"] = default_settings()["cascade"]
+            if isinstance(on_disk.get("roi"), dict):
+                roi = default_settings()["roi"]
+                for k, v in on_disk["roi"].items():
+                    if k in roi and isinstance(v, dict):
+                        roi[k] = normalize_roi(roi[k], v)
+                data["roi"] = roi
     except Exception:
         return data
 
@@ -77,6 +278,39 @@ def load_settings() -> Dict[str, Any]:
     if not data.get("model_name"):
         data["model_name"] = "yolo26s"
 
+    if data.get("inference_engine") not in ("auto", "native", "ultralytics"):
+        data["inference_engine"] = "auto"
+
+    try:
+        data["replicas"] = max(1, int(data.get("replicas", 1)))
+        data["intra_op_threads"] = max(0, int(data.get("intra_op_threads", 0)))
+        data["async_requests"] = max(0, int(data.get("async_requests", 0)))
+        data["model_cache_mb"] = max(0, int(data.get("model_cache_mb", 1024)))
+    except Exception:
+        data["replicas"] = 1
+        data["intra_op_threads"] = 0
+        data["async_requests"] = 0
+        data["model_cache_mb"] = 1024
+    data["openvino_async"] = bool(data.get("openvino_async", False))
+
+    if data.get("replica_dispatch") not in ("least_loaded", "round_robin"):
+        data["replica_dispatch"] = "least_loaded"
+
+    if data.get("replica_mode") not in ("thread", "process"):
+        data["replica_mode"] = "thread"
+
+    gate = default_settings()["change_gate"]
+    if isinstance(data.get("change_gate"), dict):
+        try:
+            gate = {
+                "enabled": bool(data["change_gate"].get("enabled", gate["enabled"])),
+                "threshold": max(0.0, float(data["change_gate"].get("threshold", gate["threshold"]))),
+                "refresh_s": max(0.0, float(data["change_gate"].get("refresh_s", gate["refresh_s"]))),
+            }
+        except (TypeError, ValueError):
+            pass
+    data["change_gate"] = gate
+
     if data.get("scene_mode") not in ("day", "night"):
         data["scene_mode"] = "day"
 
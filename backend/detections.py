@@ -0,0 +1,133 @@
+import numpy as np
+
+
+def nms(boxes, scores, iou_thres, metric="iou"):
+    """Greedy NMS over xyxy boxes; each step suppresses all remaining overlaps at once.
+
+    Returns kept indices, highest score first. For class-aware NMS offset boxes by
+    class first (boxes + cls[:, None] * max_wh). metric="ios" divides the overlap by
+    the smaller box instead of the union, so a box cut off at a tile edge is still
+    matched to the whole box found in the neighbouring tile.
+    """
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x2 - x1).clip(0) * (y2 - y1).clip(0)
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        iw = (np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest])).clip(0)
+        ih = (np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest])).clip(0)
+        inter = iw * ih
+        if metric == "ios":
+            iou = inter / (np.minimum(areas[i], areas[rest]) + 1e-9)
+        else:
+            iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_thres]
+    return np.asarray(keep, dtype=np.int64)
+
+
+def box_iou(a, b):
+    """(n, m) IoU between xyxy box arrays."""
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = (rb - lt).clip(0).prod(axis=2)
+    area_a = (a[:, 2:] - a[:, :2]).clip(0).prod(axis=1)
+    area_b = (b[:, 2:] - b[:, :2]).clip(0).prod(axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+class Detections:
+    """Columnar detection set for one frame.
+
+    xyxy: (n, 4) float32 in frame pixels, conf: (n,) float32, cls: (n,) int32.
+    ids: (n,) int64 track IDs when the set comes from a tracker, else None.
+    names maps class id -> label and is shared, not copied, between derived sets.
+    """
+
+    __slots__ = ("xyxy", "conf", "cls", "names", "ids")
+
+    def __init__(self, xyxy=None, conf=None, cls=None, names=None, ids=None):
+        self.xyxy = np.zeros((0, 4), dtype=np.float32) if xyxy is None else np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+        self.conf = np.zeros(0, dtype=np.float32) if conf is None else np.asarray(conf, dtype=np.float32).reshape(-1)
+        self.cls = np.zeros(0, dtype=np.int32) if cls is None else np.asarray(cls, dtype=np.int32).reshape(-1)
+        self.names = names or {}
+        self.ids = None if ids is None else np.asarray(ids, dtype=np.int64).reshape(-1)
+
+    @classmethod
+    def from_array(cls, det, names=None):
+        """Build from an (n, 6) [x1, y1, x2, y2, conf, cls] array (runtime / Ultralytics boxes.data layout)."""
+        det = np.asarray(det, dtype=np.float32).reshape(-1, 6)
+        return cls(det[:, :4], det[:, 4], det[:, 5], names)
+
+    @classmethod
+    def concat(cls, items, names=None):
+        items = [d for d in items if len(d)]
+        if not items:
+            return cls(names=names)
+        return cls(
+            np.concatenate([d.xyxy for d in items]),
+            np.concatenate([d.conf for d in items]),
+            np.concatenate([d.cls for d in items]),
+            names if names is not None else items[0].names,
+            np.concatenate([d.ids for d in items]) if all(d.ids is not None for d in items) else None,
+        )
+
+    def __len__(self):
+        return len(self.conf)
+
+    def __getitem__(self, index):
+        """Index or boolean-mask selection, returning a new Detections."""
+        return Detections(self.xyxy[index], self.conf[index], self.cls[index], self.names, None if self.ids is None else self.ids[index])
+
+    @property
+    def xywh(self):
+        """Center x, center y, width, height."""
+        out = np.empty_like(self.xyxy)
+        out[:, :2] = (self.xyxy[:, :2] + self.xyxy[:, 2:]) / 2
+        out[:, 2:] = self.xyxy[:, 2:] - self.xyxy[:, :2]
+        return out
+
+    def labels(self):
+        return [self.names.get(c, str(c)) for c in self.cls.tolist()]
+
+    def scaled(self, sx: float, sy: float):
+        if sx == 1.0 and sy == 1.0:
+            return self
+        return Detections(self.xyxy * np.array([sx, sy, sx, sy], dtype=np.float32), self.conf, self.cls, self.names, self.ids)
+
+    def offset(self, dx: float, dy: float):
+        if dx == 0 and dy == 0:
+            return self
+        return Detections(self.xyxy + np.array([dx, dy, dx, dy], dtype=np.float32), self.conf, self.cls, self.names, self.ids)
+
+    def filter(self, min_conf: float | None = None, classes=None):
+        mask = np.ones(len(self), dtype=bool)
+        if min_conf is not None:
+            mask &= self.conf >= min_conf
+        if classes is not None:
+            mask &= np.isin(self.cls, list(classes))
+        return self if mask.all() else self[mask]
+
+    def nms(self, iou_thres: float, metric: str = "iou"):
+        """Class-aware NMS over this set (e.g. to merge detections from overlapping tiles)."""
+        if len(self) < 2:
+            return self
+        # Offset each class past the largest coordinate so classes never overlap
+        offset = float(self.xyxy.max()) + 1.0
+        boxes = self.xyxy + (self.cls.astype(np.float32) * offset)[:, None]
+        return self[nms(boxes, self.conf, iou_thres, metric)]
+
+    def to_list(self):
+        """JSON-ready list of dicts in the legacy per-box layout."""
+        xyxy = self.xyxy.tolist()
+        xywh = self.xywh.tolist()
+        out = [
+            {"class": c, "label": label, "conf": conf, "bbox": [b], "xyxy": [x]}
+            for c, label, conf, b, x in zip(self.cls.tolist(), self.labels(), self.conf.tolist(), xywh, xyxy)
+        ]
+        if self.ids is not None:
+            for item, track_id in zip(out, self.ids.tolist()):
+                item["track_id"] = track_id
+        return out
@@ -1,16 +1,721 @@
+import ast
+import math
 import os
+import platform
 import sys
 import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import cv2
+import numpy as np
 
 os.environ.setdefault("ULTRALYTICS_AUTOINSTALL", "0")
 os.environ.setdefault("YOLO_AUTOINSTALL", "0")
 
-from ultralytics import YOLO
+from detections import Detections, nms
+from model_registry import ModelRegistry, openvino_xml
+
+
+# --- Native inference engines (no Ultralytics wrapper) ---
+
+_LETTERBOX_FILL = 114
+_NMS_IOU = 0.7
+_MAX_DET = 300
+_MAX_WH = 7680  # class offset for batched (class-aware) NMS
+_STRIDE = 32  # YOLO input sides must be multiples of the largest feature stride
+
+
+def _rect_hw(shape, imgsz):
+    """Smallest stride-aligned (h, w) input that holds a frame of shape letterboxed to imgsz
+    on its long side, e.g. 1280x960 -> 480x640 and 1920x1080 -> 384x640 at imgsz 640."""
+    h, w = shape[:2]
+    r = int(imgsz) / max(h, w)
+    return (
+        max(_STRIDE, int(math.ceil(h * r / _STRIDE)) * _STRIDE),
+        max(_STRIDE, int(math.ceil(w * r / _STRIDE)) * _STRIDE),
+    )
+
+
+class _LetterboxBuffers:
+    """Reusable uint8 canvas + float32 blob for one (batch, h, w, channels) input shape.
+
+    placed remembers where each image went, so padding is only refilled when the
+    frame geometry changes between calls.
+    """
+
+    __slots__ = ("canvas", "blob", "placed")
+
+    def __init__(self, n, h, w, channels=3):
+        self.canvas = np.full((n, h, w, channels), _LETTERBOX_FILL, dtype=np.uint8)
+        self.blob = np.empty((n, channels, h, w), dtype=np.float32)
+        self.placed = [None] * n
+
+
+def _letterbox_batch(frames, new_hw, buffers: _LetterboxBuffers | None = None, channels=3):
+    """Letterbox BGR (or single-channel) frames into one NCHW float32 blob (centered
+    padding, like Ultralytics), one resize per frame straight into the canvas.
+
+    The blob is RGB for 3-channel inputs and grey for single-channel ones. With buffers
+    the canvas and blob are reused (and give the channel count); the returned blob is
+    then only valid until the next call with the same buffers. Returns (blob, ratios,
+    pads) where pads are (left, top) per frame: box_in_frame = (box_in_input - pad) / ratio.
+    """
+    h_new, w_new = new_hw
+    if buffers is None:
+        buffers = _LetterboxBuffers(len(frames), h_new, w_new, channels)
+    canvas = buffers.canvas
+    grey_input = canvas.shape[3] == 1
+    ratios = np.empty(len(frames), dtype=np.float32)
+    pads = np.empty((len(frames), 2), dtype=np.float32)
+    for i, frame in enumerate(frames):
+        h, w = frame.shape[:2]
+        r = min(h_new / h, w_new / w)
+        w_unpad, h_unpad = int(round(w * r)), int(round(h * r))
+        left = int(round((w_new - w_unpad) / 2 - 0.1))
+        top = int(round((h_new - h_unpad) / 2 - 0.1))
+        place = (top, left, h_unpad, w_unpad)
+        if buffers.placed[i] != place:
+            canvas[i].fill(_LETTERBOX_FILL)
+            buffers.placed[i] = place
+        region = canvas[i, top:top + h_unpad, left:left + w_unpad]
+        mono = frame.ndim == 2 or frame.shape[2] == 1
+        resized = (w_unpad, h_unpad) != (w, h)
+        if grey_input:
+            plane = region[..., 0]
+            if not mono:
+                # Colour frame on a grey model: convert only the small resized image
+                small = cv2.resize(frame, (w_unpad, h_unpad), interpolation=cv2.INTER_LINEAR) if resized else frame
+                cv2.cvtColor(small, cv2.COLOR_BGR2GRAY, dst=plane)
+            elif resized:
+                cv2.resize(frame.reshape(h, w), (w_unpad, h_unpad), dst=plane, interpolation=cv2.INTER_LINEAR)
+            else:
+                plane[...] = frame.reshape(h, w)
+        elif mono:
+            # Mono: resize the single plane, then expand only the small result to 3 channels
+            small = cv2.resize(frame, (w_unpad, h_unpad), interpolation=cv2.INTER_LINEAR) if resized else frame
+            cv2.cvtColor(small.reshape(h_unpad, w_unpad), cv2.COLOR_GRAY2BGR, dst=region)
+        elif resized:
+            cv2.resize(frame, (w_unpad, h_unpad), dst=region, interpolation=cv2.INTER_LINEAR)
+        else:
+            region[...] = frame
+        ratios[i] = r
+        pads[i] = (left, top)
+    # HWC uint8 -> CHW float (BGR -> RGB for colour) in one vectorized pass over the whole batch
+    blob = buffers.blob
+    np.copyto(blob, (canvas if grey_input else canvas[..., ::-1]).transpose(0, 3, 1, 2))
+    blob *= 1.0 / 255.0
+    return blob, ratios, pads
+
+
+def _decode_output(pred, conf, end2end):
+    """Decode one image's raw output into an (n, 6) [x1, y1, x2, y2, conf, cls] array in input space."""
+    if end2end:
+        # NMS-free head: (max_det, 6) already in xyxy/conf/cls layout
+        det = pred[pred[:, 4] >= conf]
+        return det[:, :6].astype(np.float32, copy=False)
+
+    # Classic head: (4 + nc, anchors) with cxcywh + per-class scores
+    pred = pred.T
+    scores_all = pred[:, 4:]
+    cls = scores_all.argmax(axis=1)
+    scores = scores_all[np.arange(len(cls)), cls]
+    mask = scores >= conf
+    if not mask.any():
+        return np.zeros((0, 6), dtype=np.float32)
+    cxcywh, scores, cls = pred[mask, :4], scores[mask], cls[mask]
+    xyxy = np.empty_like(cxcywh)
+    xyxy[:, :2] = cxcywh[:, :2] - cxcywh[:, 2:] / 2
+    xyxy[:, 2:] = cxcywh[:, :2] + cxcywh[:, 2:] / 2
+    keep = nms(xyxy + cls[:, None] * _MAX_WH, scores, _NMS_IOU)[:_MAX_DET]
+    return np.concatenate([xyxy[keep], scores[keep, None], cls[keep, None]], axis=1).astype(np.float32)
+
+
+def _parse_names(raw):
+    if isinstance(raw, str):
+        try:
+            raw = ast.literal_eval(raw)
+        except Exception:
+            return {}
+    if isinstance(raw, dict):
+        return {int(k): str(v) for k, v in raw.items()}
+    if isinstance(raw, (list, tuple)):
+        return {i: str(v) for i, v in enumerate(raw)}
+    return {}
+
+
+class _NativeEngine:
+    """Runs an exported YOLO graph directly: NumPy letterbox in, NumPy decode out."""
+
+    name = "native"
+
+    def __init__(self, path, threads=0, async_requests=None, cache_dir=None):
+        self.path = path
+        self.threads = int(threads or 0)  # intra-op threads, 0 = runtime default
+        # Where the runtime may persist compiled graphs between process starts (None = off)
+        self.cache_dir = cache_dir
+        # In-flight request depth for runtimes with an async queue: None = sync only, 0 = runtime optimum
+        self.async_requests = async_requests
+        self.infer_queue = None
+        self.names = {}
+        self.end2end = None
+        self.input_hw = None  # static (h, w) or None when the export has dynamic spatial axes
+        self.channels = 3  # 1 for single-channel (Mono8) exports
+        self.max_batch = 1  # 0 = dynamic batch
+        self.input_dtype = np.float32
+        # Letterbox canvases by (batch, h, w), reused by the synchronous infer() path
+        self._buffers = {}
+        self._load()
+
+    def _load(self):
+        raise NotImplementedError
+
+    def _forward(self, blob):
+        raise NotImplementedError
+
+    def _apply_metadata(self, metadata):
+        self.names = _parse_names(metadata.get("names"))
+        end2end = metadata.get("end2end")
+        if isinstance(end2end, str):
+            end2end = end2end.strip().lower() == "true"
+        self.end2end = end2end
+
+    def _apply_input_shape(self, shape):
+        batch, channels, h, w = shape
+        self.max_batch = batch if isinstance(batch, int) and batch > 0 else 0
+        if channels == 1:
+            self.channels = 1
+        if isinstance(h, int) and isinstance(w, int) and h > 0 and w > 0:
+            self.input_hw = (h, w)
+
+    def input_hw_for(self, shape, imgsz):
+        """(h, w) input a frame of shape runs at: the export's static shape, else the
+        aspect-matched rectangle, so 4:3 and 16:9 frames are not padded to a square."""
+        return self.input_hw or _rect_hw(shape, imgsz)
+
+    def _preprocess(self, frames, imgsz, reuse=False):
+        if self.input_hw is not None:
+            hw = self.input_hw
+        else:
+            # One blob per batch: the rectangle that fits every frame in it
+            sizes = [_rect_hw(f.shape, imgsz) for f in frames]
+            hw = (max(h for h, _ in sizes), max(w for _, w in sizes))
+        buffers = None
+        if reuse:
+            key = (len(frames),) + tuple(hw) + (self.channels,)
+            buffers = self._buffers.get(key)
+            if buffers is None:
+                if len(self._buffers) >= 4:
+                    self._buffers.clear()
+                buffers = self._buffers[key] = _LetterboxBuffers(*key)
+        blob, ratios, pads = _letterbox_batch(frames, hw, buffers, self.channels)
+        if self.input_dtype != np.float32:
+            blob = blob.astype(self.input_dtype)
+        return blob, ratios, pads
+
+    def _postprocess(self, out, shapes, ratios, pads, conf):
+        out = np.asarray(out, dtype=np.float32)
+        end2end = self.end2end
+        if end2end is None:
+            end2end = out.ndim == 3 and out.shape[2] == 6
+
+        results = []
+        for i, (h, w) in enumerate(shapes):
+            det = _decode_output(out[i], conf, end2end)
+            if len(det):
+                det[:, [0, 2]] -= pads[i, 0]
+                det[:, [1, 3]] -= pads[i, 1]
+                det[:, :4] /= ratios[i]
+                det[:, [0, 2]] = det[:, [0, 2]].clip(0, w)
+                det[:, [1, 3]] = det[:, [1, 3]].clip(0, h)
+            results.append(det)
+        return results
+
+    def infer(self, frames, conf, imgsz):
+        """Returns one (n, 6) [x1, y1, x2, y2, conf, cls] array per frame, in frame coordinates.
+
+        Frames may be BGR or single-channel at any resolution; callers hold the replica
+        lock, so the letterbox buffers are reused across calls.
+        """
+        blob, ratios, pads = self._preprocess(frames, imgsz, reuse=True)
+        out = self._forward(blob)
+        return self._postprocess(out, [f.shape[:2] for f in frames], ratios, pads, conf)
+
+    def close(self):
+        """Release runtime resources held outside this object (worker processes)."""
+
+
+class _OnnxRuntimeEngine(_NativeEngine):
+    name = "onnxruntime"
+
+    def _load(self):
+        import onnxruntime as ort
+
+        opts = ort.SessionOptions()
+        if self.threads > 0:
+            opts.intra_op_num_threads = self.threads
+            opts.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(self.path, sess_options=opts, providers=["CPUExecutionProvider"])
+        inp = self.session.get_inputs()[0]
+        self._input_name = inp.name
+        self._apply_input_shape(inp.shape)
+        if inp.type == "tensor(float16)":
+            self.input_dtype = np.float16
+        self._apply_metadata(self.session.get_modelmeta().custom_metadata_map or {})
+
+    def _forward(self, blob):
+        return self.session.run(None, {self._input_name: blob})[0]
+
+
+class _OpenVINOEngine(_NativeEngine):
+    name = "openvino"
+
+    def _load(self):
+        import openvino as ov
+
+        xml = self.path
+        if os.path.isdir(xml):
+            xml = openvino_xml(xml)
+            if xml is None:
+                raise FileNotFoundError(f"no OpenVINO .xml in {self.path}")
+        core = ov.Core()
+        model = core.read_model(xml)
+        shape = model.inputs[0].get_partial_shape()
+        self._apply_input_shape([d.get_length() if d.is_static else -1 for d in shape])
+        # The async queue wants several CPU streams busy at once; sync use wants one fast stream
+        config = {"PERFORMANCE_HINT": "LATENCY" if self.async_requests is None else "THROUGHPUT"}
+        if self.threads > 0:
+            config["INFERENCE_NUM_THREADS"] = self.threads
+        if self.cache_dir:
+            # Compiled blobs are reused on the next start instead of recompiling the graph
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                config["CACHE_DIR"] = self.cache_dir
+            except OSError as e:
+                print(f"OpenVINO cache dir unavailable ({e}), compiling without cache.")
+        self.compiled = core.compile_model(model, "CPU", config)
+        self.request = self.compiled.create_infer_request()
+        if self.async_requests is not None:
+            jobs = int(self.async_requests) or int(self.compiled.get_property("OPTIMAL_NUMBER_OF_INFER_REQUESTS"))
+            self.infer_queue = ov.AsyncInferQueue(self.compiled, max(1, jobs))
+            self.infer_queue.set_callback(self._on_done)
+
+        meta_path = os.path.join(os.path.dirname(xml), "metadata.yaml")
+        if os.path.exists(meta_path):
+            import yaml
+
+            with open(meta_path, "r", encoding="utf-8") as f:
+                self._apply_metadata(yaml.safe_load(f) or {})
+
+    def _forward(self, blob):
+        self.request.infer({0: blob})
+        return self.request.get_output_tensor(0).data.copy()
+
+    def submit(self, frames, conf, imgsz) -> Future:
+        """Preprocess on the caller's thread, then queue the request without waiting for compute.
+
+        Blocks only while every queued request is busy. The Future resolves (on an
+        OpenVINO callback thread, after postprocessing) to the same list infer() returns.
+        """
+        blob, ratios, pads = self._preprocess(frames, imgsz)
+        fut = Future()
+        self.infer_queue.start_async({0: blob}, (fut, [f.shape[:2] for f in frames], ratios, pads, conf))
+        return fut
+
+    def _on_done(self, request, userdata):
+        fut, shapes, ratios, pads, conf = userdata
+        try:
+            _resolve(fut, self._postprocess(request.get_output_tensor(0).data, shapes, ratios, pads, conf))
+        except Exception as e:
+            _resolve(fut, error=e)
+
+
+_NATIVE_ENGINES = {"onnx": _OnnxRuntimeEngine, "openvino": _OpenVINOEngine}
+
+
+def _fixed_batches(frames, max_batch):
+    """Split frames into forward passes, yielding (batch, n).
+
+    max_batch is the export's batch (0 = dynamic: one pass). Fixed-batch exports reject
+    short batches, so the last one is padded with copies of its last frame; only the
+    first n results of each pass belong to real frames.
+    """
+    step = max_batch or len(frames)
+    for start in range(0, len(frames), step):
+        batch = list(frames[start:start + step])
+        n = len(batch)
+        if max_batch > 1 and n < max_batch:
+            batch += [batch[-1]] * (max_batch - n)
+        yield batch, n
+
+
+def _resolve(fut: Future, result=None, error: Exception | None = None):
+    """Complete fut unless the waiter already cancelled it (e.g. asyncio shutdown)."""
+    if fut.done():
+        return
+    try:
+        if error is not None:
+            fut.set_exception(error)
+        else:
+            fut.set_result(result)
+    except Exception:
+        pass
+
+
+# --- Process replicas: a native engine in a worker process, frames through shared memory ---
+
+_WORKER_START_TIMEOUT_S = 300.0  # model load + OpenVINO compile in the child
+
+
+def _process_worker(conn, engine_type, path, threads, cache_dir):
+    """Worker process main: load the engine, then serve (shm name, layout, conf, imgsz) requests until None."""
+    from multiprocessing import shared_memory
+
+    try:
+        engine = _NATIVE_ENGINES[engine_type](path, threads=threads, cache_dir=cache_dir)
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+        return
+    conn.send((
+        "ok",
+        {
+            "names": engine.names,
+            "end2end": engine.end2end,
+            "input_hw": engine.input_hw,
+            "channels": engine.channels,
+            "max_batch": engine.max_batch,
+            "input_dtype": np.dtype(engine.input_dtype).str,
+        },
+    ))
+    shm = None
+    try:
+        while True:
+            try:
+                msg = conn.recv()
+            except EOFError:
+                break
+            if msg is None:
+                break
+            name, layout, conf, imgsz = msg
+            try:
+                if shm is None or shm.name != name:
+                    if shm is not None:
+                        shm.close()
+                    shm = shared_memory.SharedMemory(name=name)
+                frames = [np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=offset) for shape, offset in layout]
+                result = ("ok", engine.infer(frames, conf, imgsz))
+                del frames
+            except Exception as e:
+                result = ("error", f"{type(e).__name__}: {e}")
+            conn.send(result)
+    finally:
+        if shm is not None:
+            shm.close()
+
+
+class _ProcessEngine(_NativeEngine):
+    """A native engine running in its own process, so letterbox, forward pass and decode
+    do not hold this process's GIL.
+
+    Frames are copied once into a shared-memory buffer owned by this side (grown when a
+    batch does not fit) and read in place by the worker; only the small (n, 6) result
+    arrays come back through the pipe. Calls are serialized by the replica lock. A worker
+    that died is restarted on the next call.
+    """
+
+    def __init__(self, path, engine_type, threads=0, cache_dir=None):
+        self.engine_type = engine_type
+        self.name = f"{_NATIVE_ENGINES[engine_type].name}-process"
+        self._proc = None
+        self._conn = None
+        self._shm = None
+        self._closed = False
+        super().__init__(path, threads=threads, cache_dir=cache_dir)
+
+    def _load(self):
+        import multiprocessing as mp
+
+        # spawn everywhere: forking a process that already runs threads and runtimes is unsafe
+        ctx = mp.get_context("spawn")
+        conn, child_conn = ctx.Pipe()
+        proc = ctx.Process(
+            target=_process_worker,
+            args=(child_conn, self.engine_type, self.path, self.threads, self.cache_dir),
+            name=f"InferWorker-{self.engine_type}",
+            daemon=True,
+        )
+        proc.start()
+        child_conn.close()
+        try:
+            if not conn.poll(_WORKER_START_TIMEOUT_S):
+                raise RuntimeError(f"inference worker did not start within {_WORKER_START_TIMEOUT_S:.0f}s")
+            status, info = conn.recv()
+        except Exception:
+            proc.terminate()
+            conn.close()
+            raise
+        if status != "ok":
+            proc.join(5)
+            conn.close()
+            raise RuntimeError(f"inference worker failed to load: {info}")
+        self._proc, self._conn = proc, conn
+        self.names = info["names"]
+        self.end2end = info["end2end"]
+        self.input_hw = tuple(info["input_hw"]) if info["input_hw"] else None
+        self.channels = info["channels"]
+        self.max_batch = info["max_batch"]
+        self.input_dtype = np.dtype(info["input_dtype"]).type
+
+    def _buffer(self, nbytes):
+        from multiprocessing import shared_memory
+
+        if self._shm is None or self._shm.size < nbytes:
+            if self._shm is not None:
+                self._shm.close()
+                self._shm.unlink()
+            self._shm = shared_memory.SharedMemory(create=True, size=max(1, nbytes))
+        return self._shm
+
+    def infer(self, frames, conf, imgsz):
+        if self._closed:
+            raise RuntimeError("inference worker closed")
+        if self._proc is None or not self._proc.is_alive():
+            print(f"Inference worker ({self.name}) is not running, restarting it.")
+            self._stop_worker()
+            self._load()
+        frames = [np.ascontiguousarray(f, dtype=np.uint8) for f in frames]
+        layout, offset = [], 0
+        for frame in frames:
+            layout.append((frame.shape, offset))
+            offset += frame.nbytes
+        shm = self._buffer(offset)
+        for frame, (shape, start) in zip(frames, layout):
+            np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=start)[...] = frame
+        try:
+            self._conn.send((shm.name, layout, float(conf), imgsz))
+            status, payload = self._conn.recv()
+        except (EOFError, OSError) as e:
+            raise RuntimeError(f"inference worker ({self.name}) exited: {e}")
+        if status != "ok":
+            raise RuntimeError(payload)
+        return payload
+
+    def _stop_worker(self):
+        proc, conn = self._proc, self._conn
+        self._proc = self._conn = None
+        if conn is not None:
+            try:
+                conn.send(None)
+            except Exception:
+                pass
+            conn.close()
+        if proc is not None:
+            proc.join(5)
+            if proc.is_alive():
+                proc.terminate()
+
+    def close(self):
+        """Stop the worker and free the shared buffer."""
+        self._closed = True
+        self._stop_worker()
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+
+def _describe_input(engine):
+    hw = f"{engine.input_hw[1]}x{engine.input_hw[0]}" if engine.input_hw else "dynamic"
+    return f"{hw} mono" if engine.channels == 1 else hw
+
+
+class _VariantSetEngine(_NativeEngine):
+    """Exports of one model at several static input shapes (e.g. 640x640, 640x480,
+    640x384) and / or channel counts (RGB and single-channel mono), one engine each.
+
+    A frame runs on the engines matching its channels (mono frames on a mono export
+    when there is one), and among those on the one that keeps the most resolution, then
+    the one with the smallest input, so a 4:3 camera uses the 640x480 export instead of
+    computing on the grey bars of a square one. Frames of one batch are split by engine.
+    """
+
+    def __init__(self, engines):
+        self.engines = engines
+        super().__init__(engines[0].path, threads=engines[0].threads, cache_dir=engines[0].cache_dir)
+
+    def _load(self):
+        primary = self.engines[0]
+        self.name = primary.name
+        self.paths = [engine.path for engine in self.engines]
+        self.names = primary.names
+        self.end2end = primary.end2end
+        # Static only when every variant is; a dynamic one still follows imgsz
+        self.input_hw = primary.input_hw if all(e.input_hw is not None for e in self.engines) else None
+        self.channels = primary.channels
+        self.max_batch = primary.max_batch
+        self.input_dtype = primary.input_dtype
+
+    def _pick(self, shape, imgsz):
+        h, w = shape[:2]
+        channels = 1 if len(shape) == 2 or shape[2] == 1 else 3
+        candidates = [e for e in self.engines if e.channels == channels] or [e for e in self.engines if e.channels == 3] or self.engines
+
+        def _key(engine):
+            eh, ew = engine.input_hw_for(shape, imgsz)
+            return (-round(min(eh / h, ew / w), 4), eh * ew)
+
+        return min(candidates, key=_key)
+
+    def input_hw_for(self, shape, imgsz):
+        return self._pick(shape, imgsz).input_hw_for(shape, imgsz)
+
+    def infer(self, frames, conf, imgsz):
+        groups = {}
+        for i, frame in enumerate(frames):
+            groups.setdefault(self.engines.index(self._pick(frame.shape, imgsz)), []).append(i)
+        results = [None] * len(frames)
+        for index, members in groups.items():
+            engine = self.engines[index]
+            dets = []
+            for batch, n in _fixed_batches([frames[i] for i in members], engine.max_batch):
+                dets.extend(engine.infer(batch, conf, imgsz)[:n])
+            for i, det in zip(members, dets):
+                results[i] = det
+        return results
+
+    def close(self):
+        for engine in self.engines:
+            engine.close()
+
+
+# --- Tiled inference for full-resolution frames ---
+
+_TILE_MERGE_IOS = 0.6  # cross-tile duplicates: overlap / smaller-box area
+
+
+def _tile_starts(length, tile, stride):
+    if length <= tile:
+        return [0]
+    starts = list(range(0, length - tile, stride))
+    starts.append(length - tile)  # last tile flush with the edge, never padded
+    return starts
+
+
+def tile_grid(height, width, tile_size=640, overlap=0.2):
+    """Overlapping tile windows (x0, y0, x1, y1) covering a height x width frame.
+
+    overlap is the fraction of tile_size shared by neighbouring tiles; tiles are
+    clamped to the frame so small frames give a single window.
+    """
+    tile_size = max(32, int(tile_size))
+    overlap = min(max(float(overlap), 0.0), 0.9)
+    stride = max(1, int(round(tile_size * (1.0 - overlap))))
+    th, tw = min(tile_size, height), min(tile_size, width)
+    return [
+        (x0, y0, x0 + tw, y0 + th)
+        for y0 in _tile_starts(height, th, stride)
+        for x0 in _tile_starts(width, tw, stride)
+    ]
+
+
+class _Replica:
+    """One loaded model instance with its own lock; the pool runs replicas in parallel."""
+
+    __slots__ = ("index", "model", "engine_name", "max_batch", "lock", "inflight", "served", "busy_s")
+
+    def __init__(self, index, model, engine_name, max_batch=1):
+        self.index = index
+        self.model = model
+        self.engine_name = engine_name
+        self.max_batch = max_batch  # export batch of this replica's model (0 = dynamic)
+        self.lock = threading.Lock()
+        self.inflight = 0
+        self.served = 0
+        self.busy_s = 0.0
+
+
+def _ultralytics_yolo():
+    """Import Ultralytics on first use: it pulls in torch (seconds of startup) and the
+    native onnx / openvino engines never need it."""
+    from ultralytics import YOLO
+
+    return YOLO
+
+
+def _report(progress, stage, fraction, detail=""):
+    """Forward a model-load progress update; a broken listener must not fail the load."""
+    if progress is None:
+        return
+    try:
+        progress(stage, fraction, detail)
+    except Exception as e:
+        print(f"Model load progress callback failed: {e}")
+
+
+def _weights_bytes(path):
+    """On-disk size of a model file or export directory, used as its cache footprint."""
+    try:
+        if os.path.isdir(path):
+            return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+class _LoadedModel:
+    """A warmed replica set for one model, ready to be made active with a pointer swap."""
+
+    __slots__ = ("key", "path", "model_type", "name", "engine_name", "device", "max_batch", "replicas", "nbytes")
+
+    def __init__(self, key, path, model_type, name, engine_name, device, max_batch, replicas):
+        self.key = key
+        self.path = path
+        self.model_type = model_type
+        self.name = name
+        self.engine_name = engine_name
+        self.device = device
+        self.max_batch = max_batch
+        self.replicas = replicas
+        paths = getattr(replicas[0].model, "paths", None) or [path]
+        self.nbytes = sum(_weights_bytes(p) for p in paths) * len(replicas)
+
+    def close(self):
+        for replica in self.replicas:
+            infer_queue = getattr(replica.model, "infer_queue", None)
+            if infer_queue is not None:
+                try:
+                    infer_queue.wait_all()
+                except Exception:
+                    pass
+            if isinstance(replica.model, _NativeEngine):
+                # Let a request already on this replica finish before its workers stop
+                with replica.lock:
+                    replica.model.close()
 
 
 class DefectDetector:
-    def __init__(self, model_path=None):
+    def __init__(
+        self,
+        model_path=None,
+        engine="auto",
+        replicas=1,
+        intra_op_threads=0,
+        dispatch="least_loaded",
+        replica_mode="thread",
+        async_requests=None,
+        cache_mb=1024,
+        compile_cache_dir=None,
+        autoload=True,
+    ):
+        """autoload=False only resolves the model path; the caller loads it later
+        (e.g. reload_model() on a background thread so startup is not blocked)."""
+        # Guards model (re)loading and settings; inference runs under per-replica locks
         self.lock = threading.Lock()
+        # "auto": native runtime for onnx/openvino when importable, else Ultralytics
+        # "native": native runtime only; "ultralytics": always wrap in YOLO()
+        self.engine_preference = engine if engine in ("auto", "native", "ultralytics") else "auto"
+        self.engine_name = "ultralytics"
         self.current_model_type = "unknown"
         self.model_name = "yolo26s"
         self._backend_dir = os.path.dirname(os.path.abspath(__file__))
@@ -18,6 +723,9 @@ class DefectDetector:
             os.path.join(self._backend_dir, "models"),
             os.path.join(os.path.dirname(self._backend_dir), "models"),
         ]
+        self.registry = ModelRegistry()
+        # Winner of the on-host autotune (autotune.py); "auto" prefers it over the type priority
+        self.autotuned: dict | None = None
         
         if model_path is None:
             selected = self._select_best_available_model(self.model_name)
@@ -36,23 +744,51 @@ class DefectDetector:
 
         self.model = None
         self.device = "cpu"
+        # Replica pool: each replica is a full model copy with its own intra-op thread budget
+        self.num_replicas = max(1, int(replicas))
+        self.intra_op_threads = max(0, int(intra_op_threads or 0))
+        self.dispatch = dispatch if dispatch in ("least_loaded", "round_robin") else "least_loaded"
+        # "process": native replicas run in worker processes, outside this process's GIL
+        self.replica_mode = replica_mode if replica_mode in ("thread", "process") else "thread"
+        self.replicas: list[_Replica] = []
+        self._pool_lock = threading.Lock()
+        self._rr_next = 0
+        # OpenVINO AsyncInferQueue depth: None = synchronous only, 0 = runtime-optimal
+        self.async_requests = async_requests
+        # Largest batch one forward pass accepts: 0 = dynamic/unbounded, n = fixed export batch
+        self.max_batch = 1
+        # Warmed models keyed by _cache_key (path, type, engine / pool settings), least recently
+        # used first; switching back to a cached model is a pointer swap instead of a reload
+        self._cache: "OrderedDict[tuple, _LoadedModel]" = OrderedDict()
+        self.cache_mb = max(0, int(cache_mb))
+        self._active: _LoadedModel | None = None
+        # Persistent runtime compile cache (OpenVINO CACHE_DIR), e.g. under the app data dir
+        self.compile_cache_dir = compile_cache_dir
+        # Recently inferred frame shapes (h, w), most recent last; re-warmed on imgsz / model changes
+        self._recent_shapes: "OrderedDict[tuple, None]" = OrderedDict()
+        self._prewarm_thread: threading.Thread | None = None
         
         # Settings
         self.conf = 0.25
         self.imgsz = 640
 
-        self.load_model()
+        if autoload:
+            self.load_model()
 
     def _infer_type_from_path(self, path: str) -> str:
         if path.endswith(".onnx"):
             return "onnx"
         if path.endswith(".pt"):
             return "pt"
-        if os.path.isdir(path) and os.path.exists(os.path.join(path, "best.xml")):
+        if os.path.isdir(path) and openvino_xml(path):
             return "openvino"
         return "unknown"
 
     def _infer_name_from_path(self, path: str) -> str | None:
+        # The manifest name: a variant export (yolo26n_mono.onnx) belongs to its model (yolo26n)
+        entry = self._entry_for(path)
+        if entry is not None:
+            return entry["name"]
         if os.path.isdir(path):
             return None
         base = os.path.basename(path.rstrip(os.sep))
@@ -68,48 +804,57 @@ class DefectDetector:
                 return d
         return None
 
-    def _find_prefixed_model(self, models_dir: str, prefix: str):
-        onnx_candidates = []
-        pt_candidates = []
-        try:
-            for name in os.listdir(models_dir):
-                if not name.startswith(f"{prefix}_"):
-                    continue
-                full = os.path.join(models_dir, name)
-                if not os.path.isfile(full):
-                    continue
-                if name.endswith(".onnx"):
-                    onnx_candidates.append(full)
-                elif name.endswith(".pt"):
-                    pt_candidates.append(full)
-        except Exception:
-            return []
+    def _entries(self, models_dir: str):
+        """Registry view of models_dir (cached until the directory changes)."""
+        return self.registry.entries(models_dir)
 
-        def _pick_latest(paths):
-            if not paths:
-                return None
-            paths.sort(key=lambda p: os.path.getmtime(p), reverse=True)
-            return paths[0]
+    def _entry_for(self, path: str):
+        """Registry entry of the export at path, None when it is not in a scanned directory."""
+        path = os.path.abspath(path.rstrip("/\\"))
+        for entry in self._entries(os.path.dirname(path)):
+            if entry["path"] == path:
+                return entry
+        return None
+
+    def _find_prefixed_model(self, models_dir: str, prefix: str):
+        """Latest {prefix}_*.onnx and {prefix}_*.pt exports (entries are newest first).
 
+        Variant exports ({prefix}_640x480, ...) are loaded next to their primary export,
+        never as the model itself.
+        """
         result = []
-        latest_onnx = _pick_latest(onnx_candidates)
-        latest_pt = _pick_latest(pt_candidates)
-        if latest_onnx:
-            result.append((latest_onnx, "onnx"))
-        if latest_pt:
-            result.append((latest_pt, "pt"))
+        for model_type in ("onnx", "pt"):
+            for entry in self._entries(models_dir):
+                if entry["type"] == model_type and entry["base"].startswith(f"{prefix}_") and not entry["variant"]:
+                    result.append((entry["path"], model_type))
+                    break
         return result
 
     def _find_openvino_model(self, models_dir: str, model_name: str):
         """Find OpenVINO model directory for the given model name."""
-        # Check for {name}_openvino_model/ directory
-        ov_dir = os.path.join(models_dir, f"{model_name}_openvino_model")
-        if os.path.isdir(ov_dir) and os.path.exists(os.path.join(ov_dir, "best.xml")):
-            return ov_dir
-        # Check for best_openvino_model/ directory
-        ov_dir = os.path.join(models_dir, "best_openvino_model")
-        if os.path.isdir(ov_dir) and os.path.exists(os.path.join(ov_dir, "best.xml")):
-            return ov_dir
+        # {name}_openvino_model/ first, then best_openvino_model/
+        for base in (model_name, "best"):
+            for entry in self._entries(models_dir):
+                if entry["type"] == "openvino" and entry["base"] == base:
+                    return entry["path"]
+        return None
+
+    def set_autotune(self, result: dict | None):
+        """Use an autotune result for "auto" selection; results from another host are ignored."""
+        if result and result.get("host") not in (None, platform.node()):
+            print(f"Ignoring autotune result from host {result.get('host')}")
+            result = None
+        self.autotuned = result
+
+    def _autotuned_model(self, models_dir: str, model_name: str):
+        tuned = self.autotuned
+        if not tuned or tuned.get("model_name") != model_name or not tuned.get("file"):
+            return None
+        path = os.path.abspath(os.path.join(models_dir, tuned["file"]))
+        for entry in self._entries(models_dir):
+            # Results saved before mono / rect variants were excluded from tuning
+            if entry["path"] == path and entry.get("variant") in (None, "int8"):
+                return path, entry["type"]
         return None
 
     def _select_best_available_model(self, model_name: str):
@@ -117,7 +862,12 @@ class DefectDetector:
         if not models_dir:
             return None
 
-        # Priority: openvino > onnx > pt
+        # The export measured fastest on this host, when it still exists
+        tuned = self._autotuned_model(models_dir, model_name)
+        if tuned is not None:
+            return tuned
+
+        # Otherwise priority: openvino > onnx > pt
         candidates = []
 
         # 1. OpenVINO (highest priority — 1.6x faster on CPU)
@@ -145,8 +895,9 @@ class DefectDetector:
             ]
         )
 
+        available = {entry["path"] for entry in self._entries(models_dir)}
         for path, t in candidates:
-            if os.path.exists(path):
+            if os.path.abspath(path) in available:
                 return os.path.abspath(path), t
 
         return None
@@ -157,46 +908,42 @@ class DefectDetector:
             return []
 
         found = {}
-        for name in os.listdir(models_dir):
-            full = os.path.join(models_dir, name)
-            if os.path.isfile(full):
-                if name.endswith(".pt") or name.endswith(".onnx"):
-                    base = name.rsplit(".", 1)[0]
-                    if base == "best":
-                        base = "yolo26s"
-                    info = found.setdefault(base, {"name": base, "pt": False, "onnx": False, "openvino": False})
-                    if name.endswith(".pt"):
-                        info["pt"] = True
-                    if name.endswith(".onnx"):
-                        info["onnx"] = True
-            elif os.path.isdir(full) and name.endswith("_openvino_model"):
-                base = name.replace("_openvino_model", "")
-                if base == "best":
-                    base = "yolo26s"
-                if os.path.exists(os.path.join(full, "best.xml")):
-                    info = found.setdefault(base, {"name": base, "pt": False, "onnx": False, "openvino": False})
-                    info["openvino"] = True
+        for entry in self._entries(models_dir):
+            info = found.setdefault(
+                entry["name"], {"name": entry["name"], "pt": False, "onnx": False, "openvino": False, "variants": []}
+            )
+            info[entry["type"]] = True
+            info["variants"].append(
+                {
+                    key: entry[key]
+                    for key in ("file", "type", "imgsz", "input_hw", "channels", "batch", "dynamic", "precision", "variant", "latency_ms")
+                }
+            )
 
         result = list(found.values())
         result.sort(key=lambda x: x["name"])
         return result
 
-    def reload_model(self, model_type, model_name: str | None = None):
+    def reload_model(self, model_type, model_name: str | None = None, force: bool = False, progress=None):
+        """Switch to another model; progress(stage, fraction, detail) is called from this thread.
+
+        Loading and warm-up happen while the current model keeps serving predict();
+        the new replica set is swapped in only once it is ready.
+        """
         new_path = None
         resolved_type = model_type
-        if model_name:
-            self.model_name = str(model_name)
+        name = str(model_name) if model_name else self.model_name
         selected_best = None
 
         if model_type == "auto":
-            selected_best = self._select_best_available_model(self.model_name)
+            selected_best = self._select_best_available_model(name)
             if selected_best is not None:
                 new_path, resolved_type = selected_best
         else:
             models_dir = self._get_models_dir()
             if models_dir:
                 if model_type == "openvino":
-                    ov_path = self._find_openvino_model(models_dir, self.model_name)
+                    ov_path = self._find_openvino_model(models_dir, name)
                     if ov_path and os.path.isdir(ov_path):
                         new_path = ov_path
                     if not new_path:
@@ -204,13 +951,13 @@ class DefectDetector:
                         if ov_path and os.path.isdir(ov_path):
                             new_path = ov_path
                 elif model_type == "onnx":
-                    if self.model_name in ("yolo26s", "yolo26n"):
-                        for path, t in self._find_prefixed_model(models_dir, self.model_name):
+                    if name in ("yolo26s", "yolo26n"):
+                        for path, t in self._find_prefixed_model(models_dir, name):
                             if t == "onnx" and os.path.exists(path):
                                 new_path = os.path.abspath(path)
                                 break
                     if not new_path:
-                        candidate = os.path.join(models_dir, f"{self.model_name}.onnx")
+                        candidate = os.path.join(models_dir, f"{name}.onnx")
                         if os.path.exists(candidate):
                             new_path = os.path.abspath(candidate)
                     if not new_path:
@@ -218,13 +965,13 @@ class DefectDetector:
                         if os.path.exists(candidate):
                             new_path = os.path.abspath(candidate)
                 elif model_type == "pt":
-                    if self.model_name in ("yolo26s", "yolo26n"):
-                        for path, t in self._find_prefixed_model(models_dir, self.model_name):
+                    if name in ("yolo26s", "yolo26n"):
+                        for path, t in self._find_prefixed_model(models_dir, name):
                             if t == "pt" and os.path.exists(path):
                                 new_path = os.path.abspath(path)
                                 break
                     if not new_path:
-                        candidate = os.path.join(models_dir, f"{self.model_name}.pt")
+                        candidate = os.path.join(models_dir, f"{name}.pt")
                         if os.path.exists(candidate):
                             new_path = os.path.abspath(candidate)
                     if not new_path:
@@ -234,43 +981,69 @@ class DefectDetector:
         
         if new_path:
             try:
-                if os.path.abspath(new_path) == os.path.abspath(self.model_path) and resolved_type == self.current_model_type:
-                    return True, f"no-op: {self.model_name}/{resolved_type} @ {new_path}"
+                if (
+                    not force
+                    and self.is_loaded()
+                    and os.path.abspath(new_path) == os.path.abspath(self.model_path)
+                    and resolved_type == self.current_model_type
+                ):
+                    return True, f"no-op: {name}/{resolved_type} @ {new_path}"
             except Exception:
                 pass
             with self.lock:
+                key = self._cache_key(new_path, resolved_type)
+                replaced = None
+                if force:
+                    # Engine / pool settings changed: every cached replica set is stale,
+                    # including the active one, which serves until its replacement is ready
+                    self.clear_cache()
+                    replaced = self._active
+                cached = None if force else self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    self._activate(cached)
+                    print(f"Switched to cached model: {cached.path}")
+                    _report(progress, "ready", 1.0, f"cached {cached.path}")
+                    return True, f"cached: {name}/{resolved_type} @ {cached.path}"
                 print(f"Switching model to: {new_path}")
-                self.model_path = new_path
-                self.current_model_type = resolved_type
-                self.model = None
-                self.load_model()
+                # The active model keeps serving; attributes change only on the final swap
+                self.load_model(key, new_path, resolved_type, name, progress)
+                if replaced is not None and replaced is not self._active:
+                    self._cache_drop(replaced)
             if model_type == "auto":
-                return True, f"auto resolved to {self.model_name}/{resolved_type} @ {new_path}"
-            return True, f"set to {self.model_name}/{resolved_type} @ {new_path}"
+                return True, f"auto resolved to {name}/{resolved_type} @ {new_path}"
+            return True, f"set to {name}/{resolved_type} @ {new_path}"
         else:
             print(f"Model type {model_type} not found.")
+            _report(progress, "failed", 1.0, f"model file for {name}/{model_type} not found")
             return False, f"Model file for {model_type} not found"
 
-    def load_model(self):
-        print(f"Loading YOLO model: {self.model_path}...")
+    def load_model(self, cache_key=None, model_path=None, model_type=None, model_name=None, progress=None):
+        """Load, warm up and activate a model (default: self.model_path), with fallbacks.
+
+        The current model keeps serving until the new replica set is ready; the
+        result is kept in the LRU cache under cache_key (default: _cache_key of the loaded path).
+        """
+        model_path = model_path or self.model_path
+        model_name = model_name or self.model_name
+        print(f"Loading YOLO model: {model_path}...")
 
-        self.model = None
         load_errors = []
 
         models_dir = self._get_models_dir()
 
         raw_attempts = []
-        if self.model_path:
-            raw_attempts.append((self.model_path, self._infer_type_from_path(self.model_path)))
+        if model_path:
+            raw_attempts.append((model_path, model_type or self._infer_type_from_path(model_path)))
 
         if models_dir:
-            if self.model_name in ("yolo26s", "yolo26n"):
-                raw_attempts.extend(self._find_prefixed_model(models_dir, self.model_name))
-            if self.model_name:
+            if model_name in ("yolo26s", "yolo26n"):
+                raw_attempts.extend(self._find_prefixed_model(models_dir, model_name))
+            if model_name:
                 raw_attempts.extend(
                     [
-                        (os.path.join(models_dir, f"{self.model_name}.onnx"), "onnx"),
-                        (os.path.join(models_dir, f"{self.model_name}.pt"), "pt"),
+                        (os.path.join(models_dir, f"{model_name}.onnx"), "onnx"),
+                        (os.path.join(models_dir, f"{model_name}.pt"), "pt"),
                     ]
                 )
             raw_attempts.extend(
@@ -292,106 +1065,554 @@ class DefectDetector:
             attempts.append((path, model_type))
 
         for path, model_type in attempts:
+            _report(progress, "loading", 0.1, path)
             try:
-                if model_type == "openvino" or (os.path.isdir(path) and os.path.exists(os.path.join(path, "best.xml"))):
+                if model_type == "openvino" or (os.path.isdir(path) and openvino_xml(path)):
                     print(f"Loading OpenVINO model: {path}...")
-                    model = YOLO(path, task="detect")
+                    model, engine_name = self._load_engine(path, "openvino")
                     device = "cpu"
                     resolved_type = "openvino"
                 elif model_type == "onnx" or path.endswith(".onnx"):
                     print(f"Loading ONNX model: {path}...")
-                    model = YOLO(path, task="detect")
+                    model, engine_name = self._load_engine(path, "onnx")
                     device = "cpu"
                     resolved_type = "onnx"
                 elif model_type == "pt" or path.endswith(".pt"):
                     print(f"Loading PyTorch model: {path}...")
-                    model = YOLO(path, task="detect")
+                    model, engine_name = self._load_engine(path, "pt")
                     device = "cpu"
                     resolved_type = "pt"
                 else:
                     raise RuntimeError(f"Unsupported model type: {model_type}")
 
-                self.model = model
-                self.device = device
-                self.current_model_type = resolved_type
-                self.model_path = path
-                inferred = self._infer_name_from_path(path)
-                if inferred:
-                    self.model_name = inferred
-
-                self._warmup_or_raise()
+                _report(progress, "warmup", 0.4, path)
+                self._warmup_or_raise(model)
+                max_batch = self._resolve_batch_capacity(model, resolved_type)
+                replicas = self._build_replicas(model, path, resolved_type, engine_name, max_batch, progress)
+                # Compile the shapes live traffic uses before the swap, not on the first frames after it
+                self._warm_shapes(replicas, self._recent_shape_list())
+                name = self._infer_name_from_path(path) or model_name
+                loaded = _LoadedModel(
+                    cache_key or self._cache_key(path, resolved_type),
+                    path, resolved_type, name, engine_name, device, max_batch, replicas,
+                )
+                self._activate(loaded)
+                self._cache_put(loaded)
+                _report(progress, "ready", 1.0, path)
+                print(
+                    f"Model engine: {self.engine_name}, batch capacity: {self.max_batch or 'dynamic'}, "
+                    f"replicas: {len(self.replicas)} x {self.intra_op_threads or 'default'} threads ({self.dispatch}), "
+                    f"async: {'on' if self.supports_async() else 'off'}"
+                )
                 return
             except Exception as e:
                 load_errors.append((path, str(e)))
-                self.model = None
 
         print("Error loading model. Attempts:")
         for p, err in load_errors:
             print(f" - {p}: {err}")
+        _report(progress, "failed", 1.0, "; ".join(f"{p}: {err}" for p, err in load_errors))
         raise RuntimeError("All model load attempts failed.")
 
-    def _warmup_or_raise(self):
+    def _native_engine(self, path, model_type):
+        if self.replica_mode == "process":
+            try:
+                return _ProcessEngine(path, model_type, threads=self.intra_op_threads, cache_dir=self.compile_cache_dir)
+            except Exception as e:
+                print(f"Process replica unavailable ({e}), running the model in this process.")
+        return _NATIVE_ENGINES[model_type](
+            path,
+            threads=self.intra_op_threads,
+            async_requests=self.async_requests,
+            cache_dir=self.compile_cache_dir,
+        )
+
+    def _input_variants(self, path, model_type):
+        """Exports of the same model, type and precision at other static input shapes
+        (manifest input_hw) or with a single-channel input (manifest channels), e.g.
+        yolo26s_640x480.onnx and yolo26s_mono.onnx next to yolo26s.onnx."""
+        models_dir = self._get_models_dir()
+        if not models_dir:
+            return []
+        path = os.path.abspath(path)
+        entries = self._entries(models_dir)
+        primary = next((e for e in entries if e["path"] == path), None)
+        if primary is None:
+            return []
+        channels = primary.get("channels") or 3
+
+        def _adds_input(e):
+            if (e.get("channels") or 3) != channels:
+                return True
+            # Other shapes with the same channels only help a static primary
+            return bool(e.get("input_hw")) and not e.get("dynamic") and not primary.get("dynamic")
+
+        return [
+            e["path"]
+            for e in entries
+            if e["path"] != path
+            and e["type"] == model_type
+            and e["name"] == primary["name"]
+            and e["precision"] == primary["precision"]
+            and _adds_input(e)
+        ]
+
+    def _with_input_variants(self, engine, path, model_type):
+        """engine, or a _VariantSetEngine over it and its other input shapes / channel counts."""
+        engines = [engine]
+        for variant in self._input_variants(path, model_type):
+            try:
+                other = self._native_engine(variant, model_type)
+            except Exception as e:
+                print(f"Input variant {variant} failed to load: {e}")
+                continue
+            # Redundant when an engine with the same channels already takes that shape (or any shape)
+            covered = any(
+                e.channels == other.channels and (e.input_hw is None or e.input_hw == other.input_hw)
+                for e in engines
+            )
+            if covered or other.names != engine.names:
+                other.close()
+                continue
+            engines.append(other)
+        if len(engines) == 1:
+            return engine
+        print(f"Input variants for {os.path.basename(path)}: {', '.join(_describe_input(e) for e in engines)}")
+        return _VariantSetEngine(engines)
+
+    def _load_engine(self, path, model_type):
+        engine_cls = _NATIVE_ENGINES.get(model_type)
+        if engine_cls is not None and self.engine_preference != "ultralytics":
+            try:
+                engine = self._native_engine(path, model_type)
+                return self._with_input_variants(engine, path, model_type), engine.name
+            except Exception as e:
+                if self.engine_preference == "native":
+                    raise
+                print(f"Native {engine_cls.name} engine unavailable ({e}), falling back to Ultralytics.")
+        if model_type == "pt" and self.intra_op_threads > 0:
+            # torch has one process-wide intra-op pool, so this is shared by all pt replicas
+            import torch
+            torch.set_num_threads(self.intra_op_threads)
+        return _ultralytics_yolo()(path, task="detect"), "ultralytics"
+
+    def _build_replicas(self, primary, path, model_type, engine_name, max_batch, progress=None):
+        replicas = [_Replica(0, primary, engine_name, max_batch)]
+        for i in range(1, self.num_replicas):
+            _report(progress, "replicas", 0.5 + 0.5 * i / self.num_replicas, f"{i + 1}/{self.num_replicas}")
+            try:
+                model, replica_engine = self._load_engine(path, model_type)
+                self._warmup_or_raise(model)
+                replicas.append(_Replica(i, model, replica_engine, max_batch))
+            except Exception as e:
+                print(f"Replica {i} failed to load, pool limited to {len(replicas)}: {e}")
+                break
+        return replicas
+
+    def _activate(self, loaded: _LoadedModel):
+        """Make loaded the serving model. Requests already holding an old replica finish on it."""
+        with self._pool_lock:
+            self._active = loaded
+            self.replicas = loaded.replicas
+            self._rr_next = 0
+        self.model = loaded.replicas[0].model
+        self.engine_name = loaded.engine_name
+        self.device = loaded.device
+        self.max_batch = loaded.max_batch
+        self.current_model_type = loaded.model_type
+        self.model_path = loaded.path
+        self.model_name = loaded.name
+
+    def _cache_key(self, path, model_type):
+        """What a loaded export is reused for: the file (FP32 and INT8 exports of one name are
+        different models) and the settings its replicas were built with. imgsz is not part of
+        it: static exports ignore it and dynamic ones take it per call."""
+        return (
+            os.path.abspath(path), model_type, self.engine_preference, self.replica_mode,
+            self.num_replicas, self.intra_op_threads, self.async_requests,
+        )
+
+    def _cache_put(self, loaded: _LoadedModel):
+        stale = self._cache.pop(loaded.key, None)
+        if stale is not None and stale is not loaded:
+            stale.close()
+        self._cache[loaded.key] = loaded
+        self._trim_cache()
+
+    def _trim_cache(self):
+        """Evict least recently used models (never the active one) until under cache_mb."""
+        cap = self.cache_mb * 1024 * 1024
+        for key in list(self._cache):
+            if sum(m.nbytes for m in self._cache.values()) <= cap:
+                break
+            if self._cache[key] is self._active:
+                continue
+            evicted = self._cache.pop(key)
+            evicted.close()
+            print(f"Model cache: evicted {evicted.name}/{evicted.model_type} ({evicted.nbytes / 1e6:.1f} MB)")
+
+    def _cache_drop(self, loaded: _LoadedModel):
+        """Evict loaded (no longer active); requests still running on it finish first."""
+        for key, cached in list(self._cache.items()):
+            if cached is loaded:
+                del self._cache[key]
+        loaded.close()
+
+    def clear_cache(self):
+        """Drop every cached model except the active one."""
+        for key, loaded in list(self._cache.items()):
+            if loaded is not self._active:
+                self._cache.pop(key).close()
+
+    def configure_cache(self, cache_mb=None):
+        if cache_mb is not None:
+            with self.lock:
+                self.cache_mb = max(0, int(cache_mb))
+                self._trim_cache()
+
+    def cache_stats(self):
+        return {
+            "cap_mb": self.cache_mb,
+            "used_mb": round(sum(m.nbytes for m in self._cache.values()) / 1e6, 1),
+            "models": [
+                {
+                    "name": m.name,
+                    "type": m.model_type,
+                    "file": os.path.basename(m.path.rstrip("/\\")),
+                    "engine": m.engine_name,
+                    "mb": round(m.nbytes / 1e6, 1),
+                    "active": m is self._active,
+                }
+                for m in reversed(self._cache.values())
+            ],
+        }
+
+    def configure_pool(self, replicas=None, intra_op_threads=None, dispatch=None, mode=None) -> bool:
+        """Update pool settings; returns True when the replicas must be reloaded to apply them."""
+        needs_reload = False
+        if dispatch in ("least_loaded", "round_robin"):
+            self.dispatch = dispatch
+        if mode in ("thread", "process") and mode != self.replica_mode:
+            self.replica_mode = mode
+            needs_reload = True
+        if replicas is not None and max(1, int(replicas)) != self.num_replicas:
+            self.num_replicas = max(1, int(replicas))
+            needs_reload = True
+        if intra_op_threads is not None and max(0, int(intra_op_threads)) != self.intra_op_threads:
+            self.intra_op_threads = max(0, int(intra_op_threads))
+            needs_reload = True
+        return needs_reload
+
+    def configure_async(self, enabled: bool, requests: int = 0) -> bool:
+        """Enable/disable the OpenVINO async pipeline; returns True when a reload is needed to apply it."""
+        wanted = max(0, int(requests or 0)) if enabled else None
+        if wanted == self.async_requests:
+            return False
+        self.async_requests = wanted
+        return self.current_model_type == "openvino"
+
+    def close(self):
+        """Drain in-flight async requests so runtime callback threads finish before exit."""
+        for loaded in list(self._cache.values()):
+            loaded.close()
+
+    def supports_async(self) -> bool:
+        replicas = self.replicas
+        return bool(replicas) and getattr(replicas[0].model, "infer_queue", None) is not None
+
+    def submit(self, frame, imgsz=None) -> Future | None:
+        """Queue one frame on the async pipeline; the Future resolves to its Detections.
+
+        Returns None when the loaded engine has no async queue (callers fall back to predict).
+        imgsz overrides the detector's input size for this frame only.
+        """
+        replicas = self.replicas
+        engine = replicas[0].model if replicas else None
+        if getattr(engine, "infer_queue", None) is None:
+            return None
+        names = engine.names
+        batch, _ = next(_fixed_batches([frame], engine.max_batch))
+        inner = engine.submit(batch, self.conf, imgsz or self.imgsz)
+        outer = Future()
+
+        def _done(f):
+            try:
+                _resolve(outer, Detections.from_array(f.result()[0], names))
+            except Exception as e:
+                _resolve(outer, error=e)
+
+        inner.add_done_callback(_done)
+        return outer
+
+    def _acquire_replica(self):
+        with self._pool_lock:
+            replicas = self.replicas
+            if not replicas:
+                return None
+            if self.dispatch == "round_robin":
+                replica = replicas[self._rr_next % len(replicas)]
+                self._rr_next += 1
+            else:
+                replica = min(replicas, key=lambda r: r.inflight)
+            replica.inflight += 1
+        replica.lock.acquire()
+        return replica
+
+    def _release_replica(self, replica, busy_s):
+        replica.lock.release()
+        with self._pool_lock:
+            replica.inflight -= 1
+            replica.served += 1
+            replica.busy_s += busy_s
+
+    def pool_stats(self):
+        with self._pool_lock:
+            return [
+                {
+                    "replica": r.index,
+                    "engine": r.engine_name,
+                    "inflight": r.inflight,
+                    "served": r.served,
+                    "avg_ms": (r.busy_s / r.served * 1000.0) if r.served else 0.0,
+                }
+                for r in self.replicas
+            ]
+
+    def _warmup_or_raise(self, model):
         try:
-            import numpy as np
-            dummy = np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8)
-            _ = self.model(dummy, verbose=False, conf=self.conf, imgsz=self.imgsz)
+            n = model.max_batch if isinstance(model, _NativeEngine) else 1
+            # A variant set warms every engine with a frame that is routed to it
+            engines = model.engines if isinstance(model, _VariantSetEngine) else [model]
+            for engine in engines:
+                h, w = getattr(engine, "input_hw", None) or (self.imgsz, self.imgsz)
+                shape = (h, w) if getattr(engine, "channels", 3) == 1 else (h, w, 3)
+                _ = self._infer(model, [np.zeros(shape, dtype=np.uint8)] * max(1, n))
             print("Model warmup completed.")
         except Exception as e:
             raise RuntimeError(f"Model warmup failed: {e}")
 
     def update_settings(self, conf=None, imgsz=None):
-        with self.lock:
+        # Not self.lock: that is held for the whole of a background model load
+        with self._pool_lock:
+            imgsz_changed = imgsz is not None and int(imgsz) != self.imgsz
             if conf is not None:
                 self.conf = float(conf)
             if imgsz is not None:
                 self.imgsz = int(imgsz)
             print(f"Detector settings updated: conf={self.conf}, imgsz={self.imgsz}")
+        if imgsz_changed:
+            self.prewarm()
 
-    def predict(self, frame, return_annotated=True):
-        with self.lock:
-            if self.model is None:
-                return [], frame
+    def _note_shapes(self, frames):
+        shapes = self._recent_shapes
+        with self._pool_lock:
+            for frame in frames:
+                key = tuple(frame.shape[:2])
+                if key in shapes:
+                    shapes.move_to_end(key)
+                else:
+                    shapes[key] = None
+                    while len(shapes) > 8:
+                        shapes.popitem(last=False)
 
-            # Run inference with dynamic settings
-            # Ultralytics handles resizing internally via 'imgsz' argument
-            # It will resize input 'frame' to 'imgsz' (e.g. 640) for inference,
-            # and then automatically scale bounding boxes back to original 'frame' size.
-            try:
-                if frame is not None and hasattr(frame, "ndim") and frame.ndim == 2:
-                    import cv2
-                    frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
-                elif frame is not None and hasattr(frame, "shape") and len(frame.shape) == 3 and frame.shape[2] == 1:
-                    import cv2
-                    frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
-
-                results = self.model(frame, verbose=False, conf=self.conf, imgsz=self.imgsz)
-            except Exception as e:
-                print(
-                    f"Inference error with settings conf={self.conf}, imgsz={self.imgsz}: {e}"
-                )
-                # Fallback
-                results = self.model(frame, verbose=False)
-
-            detections = []
-            # Extract raw data
-            for box in results[0].boxes:
-                detections.append(
-                    {
-                        "class": int(box.cls),
-                        "label": results[0].names[int(box.cls)],
-                        "conf": float(box.conf),
-                        "bbox": box.xywh.tolist(), # xywh in original frame coordinates
-                        "xyxy": box.xyxy.tolist(), # xyxy for drawing
-                    }
-                )
-                
-            annotated_frame = None
-            if return_annotated:
-                # Plot results on original frame
-                # Ultralytics results[0].plot() returns BGR numpy array of same size as input
-                annotated_frame = results[0].plot()
-
-            return detections, annotated_frame
+    def _recent_shape_list(self):
+        with self._pool_lock:
+            return list(self._recent_shapes)
+
+    def _shape_sensitive(self, model) -> bool:
+        """False when the input size is baked into the export, so imgsz / aspect changes cost nothing."""
+        return not (isinstance(model, _NativeEngine) and model.input_hw is not None)
+
+    def _warm_shapes(self, replicas, shapes, imgsz=None):
+        """One dummy pass per frame shape on each replica, so the runtime compiles its kernels now."""
+        shapes = [tuple(s) for s in shapes if s]
+        if not shapes:
+            return 0
+        warmed = 0
+        for replica in replicas:
+            if not self._shape_sensitive(replica.model):
+                continue
+            model = replica.model
+            # Mono frames may run on a single-channel variant with its own compiled shapes
+            planes = sorted({e.channels for e in model.engines}) if isinstance(model, _VariantSetEngine) else [3]
+            for h, w in shapes:
+                for c in planes:
+                    with replica.lock:
+                        try:
+                            self._infer(model, [np.full((h, w) if c == 1 else (h, w, 3), _LETTERBOX_FILL, dtype=np.uint8)], imgsz)
+                            warmed += 1
+                        except Exception as e:
+                            print(f"Pre-warm of shape {h}x{w} failed on replica {replica.index}: {e}")
+        return warmed
+
+    def prewarm(self, shapes=None, imgsz=None):
+        """Warm the active replicas for the given frame shapes (default: recently seen ones)
+        at imgsz (default: the current one) on a background thread; returns the thread, or None if no-op."""
+        shapes = list(shapes) if shapes else self._recent_shape_list()
+        replicas = list(self.replicas)
+        if not shapes or not replicas or not any(self._shape_sensitive(r.model) for r in replicas):
+            return None
+
+        def _run():
+            t0 = time.perf_counter()
+            warmed = self._warm_shapes(replicas, shapes, imgsz)
+            if warmed:
+                print(f"Pre-warmed {len(shapes)} shape(s) at imgsz={imgsz or self.imgsz} on {len(replicas)} replica(s) in {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+        thread = threading.Thread(target=_run, name="DetectorPrewarm", daemon=True)
+        self._prewarm_thread = thread
+        thread.start()
+        return thread
+
+    def _resolve_batch_capacity(self, model, model_type) -> int:
+        """Read the export batch from the loaded backend (0 = dynamic/unbounded)."""
+        if model_type == "pt":
+            return 0
+        if isinstance(model, _NativeEngine):
+            return model.max_batch
+        try:
+            backend = model.predictor.model
+            metadata = getattr(backend, "metadata", None) or {}
+            args = metadata.get("args") if isinstance(metadata.get("args"), dict) else {}
+            if metadata.get("dynamic") or args.get("dynamic"):
+                return 0
+            return max(1, int(metadata.get("batch", getattr(backend, "batch", 1)) or 1))
+        except Exception:
+            return 1
+
+    def _ensure_bgr(self, frame):
+        if frame is not None and hasattr(frame, "ndim") and frame.ndim == 2:
+            return cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+        if frame is not None and hasattr(frame, "shape") and len(frame.shape) == 3 and frame.shape[2] == 1:
+            return cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+        return frame
+
+    def _prepare(self, model, frame):
+        """Native engines letterbox single-channel frames themselves, after the resize,
+        so a mono frame is never expanded to BGR at full resolution."""
+        return frame if isinstance(model, _NativeEngine) else self._ensure_bgr(frame)
+
+    def _run_model(self, model, source, imgsz=None):
+        # Ultralytics handles resizing internally via 'imgsz' argument
+        # It will resize input 'frame' to 'imgsz' (e.g. 640) for inference,
+        # and then automatically scale bounding boxes back to original 'frame' size.
+        imgsz = imgsz or self.imgsz
+        try:
+            return model(source, verbose=False, conf=self.conf, imgsz=imgsz)
+        except Exception as e:
+            print(
+                f"Inference error with settings conf={self.conf}, imgsz={imgsz}: {e}"
+            )
+            # Fallback
+            return model(source, verbose=False)
+
+    def _infer(self, model, frames, imgsz=None):
+        """One forward pass over prepared BGR frames -> [Detections, ...]."""
+        if isinstance(model, _NativeEngine):
+            return [Detections.from_array(det, model.names) for det in model.infer(frames, self.conf, imgsz or self.imgsz)]
+        # boxes.data is the same (n, 6) xyxy/conf/cls layout; one device->host copy per frame
+        return [Detections.from_array(r.boxes.data.cpu().numpy(), r.names) for r in self._run_model(model, frames, imgsz)]
+
+    def _engine_for(self, model, shape, imgsz, mono):
+        """The native engine (variant) a frame of shape, mono or colour, is routed to."""
+        frame_shape = tuple(shape[:2]) if mono else tuple(shape[:2]) + (3,)
+        return model._pick(frame_shape, imgsz) if isinstance(model, _VariantSetEngine) else model
+
+    def input_hw_for(self, shape, imgsz=None, mono=False):
+        """(h, w) model input a frame of shape (single-channel when mono) runs at with the active model."""
+        imgsz = imgsz or self.imgsz
+        model = self.model
+        if isinstance(model, _NativeEngine):
+            return tuple(self._engine_for(model, shape, imgsz, mono).input_hw_for(shape, imgsz))
+        # Ultralytics letterboxes .pt inputs to the same stride-aligned rectangle
+        return _rect_hw(shape, imgsz)
+
+    def input_channels_for(self, mono=False):
+        """Input channels the active model runs mono (Mono8) or colour frames with: 1 when
+        a single-channel export of the model is loaded, else 3."""
+        model = self.model
+        if isinstance(model, _NativeEngine):
+            return self._engine_for(model, (self.imgsz, self.imgsz), self.imgsz, mono).channels
+        return 3
+
+    def input_size_fixed(self) -> bool:
+        """True when every active replica has its input size baked in, so imgsz changes nothing."""
+        replicas = self.replicas
+        return bool(replicas) and not any(self._shape_sensitive(r.model) for r in replicas)
+
+    def predict(self, frame, imgsz=None):
+        """Detections for one frame. Drawing is left to the caller so the replica lock
+        only covers the forward pass (main.save_annotated draws on its own pool).
+        imgsz overrides the detector's input size for this call only."""
+        replica = self._acquire_replica()
+        if replica is None:
+            return Detections()
+        t0 = time.perf_counter()
+        try:
+            frame = self._prepare(replica.model, frame)
+            self._note_shapes((frame,))
+            # The replica's own batch: a background swap may change self.max_batch meanwhile
+            batch, _ = next(_fixed_batches([frame], replica.max_batch))
+            return self._infer(replica.model, batch, imgsz)[0]
+        finally:
+            self._release_replica(replica, time.perf_counter() - t0)
+
+    def predict_batch(self, frames, imgsz=None):
+        """Run frames from several slots through the model as batched forward passes.
+
+        Frames may differ in size; each result is scaled back to its own frame.
+        Returns a list of Detections in input order.
+        """
+        if not frames:
+            return []
+        replica = self._acquire_replica()
+        if replica is None:
+            return [Detections() for _ in frames]
+        t0 = time.perf_counter()
+        try:
+            prepared = [self._prepare(replica.model, frame) for frame in frames]
+            self._note_shapes(prepared)
+            outputs = []
+            for batch, n in _fixed_batches(prepared, replica.max_batch):
+                outputs.extend(self._infer(replica.model, batch, imgsz)[:n])
+            return outputs
+        finally:
+            self._release_replica(replica, time.perf_counter() - t0)
+
+    def predict_tiled(self, frames, tiling):
+        """Batched inference where some frames are cut into overlapping tiles first.
+
+        tiling holds one (tile_size, overlap) per frame, or None to run that frame whole.
+        Every tile and whole frame goes through a single predict_batch call; tile
+        detections are shifted back to frame coordinates and merged with class-aware
+        NMS across tiles. Returns (list of Detections, number of tiles run).
+        """
+        units, owners, origins = [], [], []
+        for i, (frame, spec) in enumerate(zip(frames, tiling)):
+            if spec is None:
+                units.append(frame)
+                owners.append(i)
+                origins.append((0, 0))
+                continue
+            h, w = frame.shape[:2]
+            for x0, y0, x1, y1 in tile_grid(h, w, spec[0], spec[1]):
+                units.append(frame[y0:y1, x0:x1])
+                owners.append(i)
+                origins.append((x0, y0))
+
+        outputs = self.predict_batch(units)
+        per_frame = [[] for _ in frames]
+        for owner, (x0, y0), dets in zip(owners, origins, outputs):
+            per_frame[owner].append(dets.offset(x0, y0))
+
+        results = []
+        for parts, spec in zip(per_frame, tiling):
+            if spec is None:
+                results.append(parts[0] if parts else Detections())
+            else:
+                results.append(Detections.concat(parts).nms(_TILE_MERGE_IOS, metric="ios"))
+        tiles = sum(1 for owner in owners if tiling[owner] is not None)
+        return results, tiles
 
     def is_loaded(self):
         return self.model is not None
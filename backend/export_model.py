@@ -1,15 +1,140 @@
 import os
+import json
+import shutil
+import tempfile
 from ultralytics import YOLO
 import argparse
 
+from model_registry import write_manifest
+
+
+def parse_imgsz(value, camera: str | None = None):
+    """(h, w) export input from "640" (square) or "WxH" ("640x480"); with camera ("2448x2048"),
+    the camera's aspect at the long side of value, rounded up to multiples of 32."""
+    text = str(value).lower().strip()
+    if "x" in text:
+        w, h = (int(v) for v in text.split("x", 1))
+    else:
+        w = h = int(text)
+    if camera:
+        from detector import _rect_hw
+
+        cam_w, cam_h = (int(v) for v in str(camera).lower().split("x", 1))
+        h, w = _rect_hw((cam_h, cam_w), max(h, w))
+    if h % 32 or w % 32:
+        raise ValueError(f"input sides must be multiples of 32, got {w}x{h}")
+    return h, w
+
+
+def _to_single_channel(model):
+    """Turn a YOLO model's RGB input into one grey channel: the first convolution's weights
+    are summed over R, G and B, so a grey frame gives exactly the activations of that frame
+    replicated to three channels, from a third of the input data."""
+    import torch
+
+    net = model.model
+    name, first = next((n, m) for n, m in net.named_modules() if isinstance(m, torch.nn.Conv2d))
+    if first.in_channels != 3 or first.groups != 1:
+        raise ValueError(f"first convolution takes {first.in_channels} channels, expected RGB")
+    conv = torch.nn.Conv2d(
+        1, first.out_channels, first.kernel_size, first.stride, first.padding, first.dilation,
+        bias=first.bias is not None, padding_mode=first.padding_mode,
+    )
+    with torch.no_grad():
+        conv.weight.copy_(first.weight.sum(dim=1, keepdim=True))
+        if first.bias is not None:
+            conv.bias.copy_(first.bias)
+    parent, _, attr = name.rpartition(".")
+    setattr(net.get_submodule(parent) if parent else net, attr, conv)
+    # The exporter sizes its dummy input (and the channels metadata) from the model yaml
+    net.yaml["channels"] = 1
+
+
+def _install_suffixed(exported_path: str, model_path: str, tag: str) -> str:
+    """Move an export next to model_path as <stem>_<tag> (tag "640x480", "mono",
+    "mono_640x480"), so variants of one model (including the plain <stem>.onnx) are kept
+    side by side."""
+    path = exported_path.rstrip("/\\")
+    name = os.path.basename(path)
+    suffix = "_openvino_model" if name.endswith("_openvino_model") else os.path.splitext(name)[1]
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    target = os.path.join(os.path.dirname(os.path.abspath(model_path)), f"{stem}_{tag}{suffix}")
+    if os.path.isdir(target):
+        shutil.rmtree(target)
+    elif os.path.exists(target):
+        os.remove(target)
+    shutil.move(path, target)
+    return target
+
+
+def detect_precision(export_path: str) -> str | None:
+    """Precision the exported graph actually computes in ("int8", "fp16" or "fp32"), read
+    from its weights; None for formats it cannot inspect. Export flags are only requests:
+    Ultralytics ignores half for some targets."""
+    path = export_path.rstrip("/\\")
+    try:
+        if os.path.isdir(path):
+            import xml.etree.ElementTree as ET
+            from model_registry import openvino_xml
+
+            xml = openvino_xml(path)
+            if xml is None:
+                return None
+            layers = ET.parse(xml).getroot().iter("layer")
+            types, consts = set(), set()
+            for layer in layers:
+                types.add(layer.get("type"))
+                data = layer.find("data")
+                if layer.get("type") == "Const" and data is not None:
+                    consts.add(data.get("element_type"))
+            if "FakeQuantize" in types or consts & {"i8", "u8"}:
+                return "int8"
+            return "fp16" if "f16" in consts else "fp32"
+        if path.endswith(".onnx"):
+            import onnx
+
+            model = onnx.load(path, load_external_data=False)
+            if any(n.op_type in ("DequantizeLinear", "QLinearConv", "ConvInteger", "MatMulInteger") for n in model.graph.node):
+                return "int8"
+            dtypes = {t.data_type for t in model.graph.initializer}
+            dtypes.update(i.type.tensor_type.elem_type for i in model.graph.input)
+            return "fp16" if onnx.TensorProto.FLOAT16 in dtypes else "fp32"
+    except Exception as e:
+        print(f"Warning: cannot read the precision of {export_path}: {e}")
+    return None
+
+
+def measure_latency(export_path: str, imgsz: int, runs: int = 30):
+    """Time single-frame predict() of the export on this host; None if it cannot be loaded."""
+    try:
+        from benchmark import load_frames, time_predict
+        from detector import DefectDetector
+
+        det = DefectDetector(export_path)
+        # load_model falls back to other exports in the models dir; those are not this one
+        if os.path.abspath(det.model_path) != os.path.abspath(export_path.rstrip("/\\")):
+            raise RuntimeError(f"loaded {det.model_path} instead")
+        det.update_settings(imgsz=imgsz)
+        stats = time_predict(det, load_frames(None, 4), runs)
+        det.close()
+        return {"mean": round(stats["mean_ms"], 2), "p50": round(stats["p50_ms"], 2), "p95": round(stats["p95_ms"], 2), "engine": det.engine_name}
+    except Exception as e:
+        print(f"Error: latency measurement of {export_path} failed: {e}")
+        return None
+
+
 def export_model(
     model_path: str = "models/best.pt",
     format: str = "onnx",
-    imgsz: int = 640,
+    imgsz: int | str = 640,
     batch: int = 1,
+    dynamic: bool = False,
     int8: bool = False,
     half: bool = True,
     data: str | None = None,
+    runs: int = 30,
+    camera: str | None = None,
+    mono: bool = False,
 ):
     """
     Exports the YOLO model to the specified format.
@@ -17,49 +142,282 @@ def export_model(
     Args:
         model_path (str): Path to the .pt model file.
         format (str): Export format (e.g., 'onnx').
-        imgsz (int): Input image size.
-        batch (int): Export batch size. Prefer 1 for low-latency multi-camera pipelines.
+        imgsz (int|str): Input size, square ("640") or rectangular "WxH" ("640x480", "640x384")
+            to match the camera aspect instead of padding it to a square.
+        batch (int): Export batch size. Use 1 for single-frame inference, or the number of
+            cameras (e.g. 4) so DefectDetector.predict_batch can run all slots in one pass.
+        dynamic (bool): Export a dynamic batch (and input) axis instead of a fixed one.
         int8 (bool): Enable INT8 quantization (recommend providing representative 'data').
         half (bool): Enable FP16 quantization.
         data (str|None): Dataset yaml for INT8 calibration.
+        runs (int): predict() runs used to measure latency for the manifest (0 = skip).
+        camera (str|None): Camera resolution "WxH"; the input becomes its aspect at the long
+            side of imgsz (e.g. 2448x2048 at 640 -> 640x544).
+        mono (bool): Export a single-channel (grey) input for Mono8 cameras; the first
+            layer's weights are summed over RGB, so results match the RGB model on grey frames.
+
+    Writes <export>.manifest.json next to the export (format, imgsz, input_hw, channels,
+    batch, precision and latency on this host), which DefectDetector's model registry reads.
+    Rectangular exports are named <stem>_<W>x<H> and single-channel ones <stem>_mono
+    (<stem>_mono_<W>x<H>); the detector runs each frame on the export of the same model
+    whose shape and channel count fit it best.
     """
     if not os.path.exists(model_path):
         print(f"Error: Model file '{model_path}' not found.")
         return
 
+    try:
+        h, w = parse_imgsz(imgsz, camera)
+    except ValueError as e:
+        print(f"Error: invalid imgsz: {e}")
+        return
+
+    rect = h != w and not dynamic
+    tag = "_".join(t for t in ("mono" if mono else "", f"{w}x{h}" if rect else "") if t)
+    work_dir = None
+    source = model_path
+    if tag:
+        # Ultralytics always writes <stem>.<ext> next to the weights: export from a copy
+        work_dir = tempfile.mkdtemp(prefix="export_", dir=os.path.dirname(os.path.abspath(model_path)))
+        source = shutil.copy2(model_path, work_dir)
+
     print(f"Loading model: {model_path}...")
-    model = YOLO(model_path)
+    model = YOLO(source)
+    if mono:
+        try:
+            _to_single_channel(model)
+        except Exception as e:
+            print(f"Error: cannot build a single-channel model: {e}")
+            shutil.rmtree(work_dir, ignore_errors=True)
+            return
     
-    print(f"Starting export to {format} (imgsz={imgsz}, batch={batch}, INT8={int8}, FP16={half})...")
+    print(f"Starting export to {format} (imgsz={w}x{h}, channels={1 if mono else 3}, batch={batch}, dynamic={dynamic}, INT8={int8}, FP16={half})...")
     
-    # Export args
-    kwargs = {"format": format, "imgsz": int(imgsz), "batch": int(batch)}
+    # Export args; Ultralytics takes a rectangular size as [h, w]
+    kwargs = {"format": format, "imgsz": int(h) if h == w else [int(h), int(w)], "batch": int(batch)}
+    if dynamic:
+        kwargs["dynamic"] = True
     if int8:
         kwargs["int8"] = True
         if data:
             kwargs["data"] = data
         else:
+            print("Warning: INT8 without --data calibrates on coco8; use the 'calibrate' subcommand to calibrate on captured history.")
             kwargs["data"] = "coco8.yaml"
     if half and not int8:
         kwargs["half"] = True
         
     try:
         exported_path = model.export(**kwargs)
+        if tag:
+            exported_path = _install_suffixed(str(exported_path), model_path, tag)
         print(f"Export successful! Saved to: {exported_path}")
     except Exception as e:
         print(f"Export failed: {e}")
+        return
+    finally:
+        if work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    info = {
+        "name": os.path.splitext(os.path.basename(model_path))[0],
+        "format": format,
+        "source": os.path.basename(model_path),
+        "imgsz": max(h, w),
+        "input_hw": None if dynamic else [h, w],
+        "channels": 1 if mono else 3,
+        "batch": int(batch),
+        "dynamic": bool(dynamic),
+        "precision": detect_precision(str(exported_path)) or ("int8" if int8 else ("fp16" if half else "fp32")),
+        # Mono and rectangular exports sit next to the primary export of the model, never replace it
+        "variant": "mono" if mono else ("rect" if rect else None),
+        "latency_ms": measure_latency(str(exported_path), max(h, w), runs) if runs > 0 else None,
+    }
+    if info["name"] == "best":
+        info["name"] = "yolo26s"
+    print(f"Manifest written: {write_manifest(str(exported_path), info)}")
+
+
+def calibrate(
+    model_path: str = "models/best.pt",
+    history_dir: str | None = None,
+    samples: int = 200,
+    formats=("onnx", "openvino"),
+    imgsz: int = 640,
+    conf: float = 0.25,
+    method: str = "minmax",
+    min_agreement: float = 0.9,
+    min_speedup: float = 1.0,
+    out_dir: str | None = None,
+):
+    """
+    Builds INT8 ONNX / OpenVINO exports calibrated on frames from the history captures.
+
+    Args:
+        model_path (str): .pt model (exported to FP32 ONNX first) or an FP32 .onnx export.
+        history_dir (str|None): Capture directory; defaults to the backend's HISTORY_DIR.
+        samples (int): Number of captures used for calibration and for the comparison.
+        formats: INT8 targets, any of 'onnx' and 'openvino'.
+        imgsz (int): Input size for exports with a dynamic input.
+        conf (float): Confidence threshold for the FP32 / INT8 comparison.
+        method (str): Calibration method: 'minmax', 'entropy' or 'percentile'.
+        min_agreement (float): Detection agreement (F1 vs FP32) an INT8 export needs to be
+            installed into the models directory.
+        min_speedup (float): Mean latency gain over FP32 it needs on this host as well.
+        out_dir (str|None): Models directory; defaults to the one holding model_path.
+
+    Every INT8 model is compared with its FP32 counterpart on the same captures
+    (latency and detection agreement). Exports that pass both thresholds are copied into
+    the models directory with a manifest; the rest stay in <models>/calibration.
+    Returns the report that is also saved as <models>/calibration/calibration_report.json.
+    """
+    from calibration import compare, default_history_dir, load_images, onnx_to_openvino, quantize_onnx, sample_history
+
+    if not os.path.exists(model_path):
+        print(f"Error: Model file '{model_path}' not found.")
+        return None
+    history_dir = history_dir or default_history_dir()
+    paths = sample_history(history_dir, samples)
+    frames = load_images(paths)
+    if len(frames) < 8:
+        print(f"Error: only {len(frames)} usable captures in '{history_dir}' (need at least 8).")
+        return None
+    print(f"Calibrating on {len(frames)} captures from {history_dir}")
+
+    models_dir = out_dir or os.path.dirname(os.path.abspath(model_path))
+    work_dir = os.path.join(models_dir, "calibration")
+    os.makedirs(work_dir, exist_ok=True)
+    base = os.path.splitext(os.path.basename(model_path))[0]
+
+    if model_path.endswith(".onnx"):
+        fp32_onnx = os.path.abspath(model_path)
+    else:
+        # Export from a copy so the FP32 ONNX never overwrites an export in the models dir
+        pt_copy = os.path.join(work_dir, os.path.basename(model_path))
+        shutil.copy2(model_path, pt_copy)
+        print(f"Exporting FP32 ONNX reference (imgsz={imgsz})...")
+        fp32_onnx = str(YOLO(pt_copy).export(format="onnx", imgsz=int(imgsz), batch=1, half=False))
+
+    print(f"Quantizing to INT8 ({method})...")
+    int8_onnx = quantize_onnx(fp32_onnx, os.path.join(work_dir, f"{base}_int8.onnx"), frames, imgsz, method)
+
+    report = {"history_dir": history_dir, "images": len(frames), "method": method, "fp32": fp32_onnx, "formats": {}}
+    # (fp32 reference, int8 candidate, install path) per format, all built before anything is installed
+    candidates = {}
+    for fmt in formats:
+        if fmt == "onnx":
+            candidates[fmt] = (fp32_onnx, int8_onnx, os.path.join(models_dir, f"{base}_int8.onnx"))
+        elif fmt == "openvino":
+            candidates[fmt] = (
+                onnx_to_openvino(fp32_onnx, os.path.join(work_dir, f"{base}_fp32_openvino_model")),
+                onnx_to_openvino(int8_onnx, os.path.join(work_dir, f"{base}_int8_openvino_model")),
+                os.path.join(models_dir, f"{base}_int8_openvino_model"),
+            )
+        else:
+            print(f"Skipping unsupported INT8 format: {fmt}")
+
+    for fmt, (ref, test, dest) in candidates.items():
+        print(f"Comparing {fmt} INT8 with FP32 on {len(frames)} captures...")
+        result = compare(ref, test, frames, imgsz, conf)
+        if not result["boxes_ref"]:
+            reason = f"FP32 found nothing at conf={conf}, so agreement is not measurable (lower --conf or capture more defects)"
+        elif result["agreement"] < min_agreement:
+            reason = f"agreement below {min_agreement}"
+        elif result["speedup"] < min_speedup:
+            reason = f"speedup below x{min_speedup} on this host"
+        else:
+            reason = None
+        result["accepted"] = reason is None
+        print(
+            f"[{fmt}] FP32 {result['latency_fp32_ms']['mean']:.1f} ms -> INT8 {result['latency_int8_ms']['mean']:.1f} ms "
+            f"(x{result['speedup']:.2f}), agreement {result['agreement']:.3f} "
+            f"(recall {result['recall']:.3f}, precision {result['precision']:.3f})"
+        )
+        if result["accepted"]:
+            if os.path.isdir(dest):
+                shutil.rmtree(dest)
+            elif os.path.exists(dest):
+                os.remove(dest)
+            if os.path.isdir(test):
+                shutil.copytree(test, dest)
+            else:
+                shutil.copy2(test, dest)
+            info = {
+                "name": "yolo26s" if base == "best" else base,
+                "format": fmt,
+                "source": os.path.basename(model_path),
+                "imgsz": int(imgsz),
+                "batch": 1,
+                "dynamic": False,
+                "precision": "int8",
+                # {base}_int8 is picked explicitly (or by autotune), never as the model itself
+                "variant": "int8",
+                "latency_ms": result["latency_int8_ms"],
+                "calibration": {
+                    "images": len(frames),
+                    "method": method,
+                    "agreement": round(result["agreement"], 4),
+                    "speedup": result["speedup"],
+                },
+            }
+            print(f"Installed {dest} (manifest: {write_manifest(dest, info)})")
+            result["path"] = dest
+        else:
+            print(f"Not installed: {reason}; kept in {test}")
+            result["rejected"] = reason
+            result["path"] = test
+        report["formats"][fmt] = result
+
+    report_path = os.path.join(work_dir, "calibration_report.json")
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Report written: {report_path}")
+    return report
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--model", default="models/best.pt")
     parser.add_argument("--format", default="onnx")
-    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--imgsz", default="640", help='square size ("640") or "WxH" ("640x480")')
+    parser.add_argument("--camera", default=None, help='camera resolution "WxH": export its aspect at the --imgsz long side')
+    parser.add_argument("--mono", action="store_true", help="single-channel input for Mono8 cameras (first layer summed over RGB)")
     parser.add_argument("--batch", type=int, default=1)
+    parser.add_argument("--dynamic", action="store_true", help="export a dynamic batch axis")
     parser.add_argument("--int8", action="store_true")
     parser.add_argument("--half", action="store_true")
     parser.add_argument("--data", default=None)
+    parser.add_argument("--runs", type=int, default=30, help="predict() runs for the manifest latency (0 = skip)")
+    sub = parser.add_subparsers(dest="command")
+    cal = sub.add_parser("calibrate", help="INT8 exports calibrated on captured history, compared with FP32")
+    # --model / --imgsz may come before or after "calibrate"; SUPPRESS keeps the parent's value when omitted here
+    cal.add_argument("--model", default=argparse.SUPPRESS)
+    cal.add_argument("--history", default=None, help="capture directory (default: the backend's HISTORY_DIR)")
+    cal.add_argument("--samples", type=int, default=200)
+    cal.add_argument("--formats", default="onnx,openvino")
+    cal.add_argument("--imgsz", default=argparse.SUPPRESS, help="input size for exports with a dynamic input (long side of WxH)")
+    cal.add_argument("--conf", type=float, default=0.25)
+    cal.add_argument("--method", default="minmax", choices=["minmax", "entropy", "percentile"])
+    cal.add_argument("--min-agreement", type=float, default=0.9)
+    cal.add_argument("--min-speedup", type=float, default=1.0)
+    cal.add_argument("--out", default=None, help="models directory (default: next to --model)")
     args = parser.parse_args()
 
+    if args.command == "calibrate":
+        calibrate(
+            model_path=args.model,
+            history_dir=args.history,
+            samples=args.samples,
+            formats=[f.strip() for f in args.formats.split(",") if f.strip()],
+            imgsz=max(parse_imgsz(args.imgsz)),
+            conf=args.conf,
+            method=args.method,
+            min_agreement=args.min_agreement,
+            min_speedup=args.min_speedup,
+            out_dir=args.out,
+        )
+        raise SystemExit(0)
+
     half = bool(args.half)
     if not args.int8 and not args.half:
         half = True
@@ -69,7 +427,11 @@ if __name__ == "__main__":
         format=args.format,
         imgsz=args.imgsz,
         batch=args.batch,
+        dynamic=bool(args.dynamic),
         int8=bool(args.int8),
         half=half,
         data=args.data,
+        runs=args.runs,
+        camera=args.camera,
+        mono=bool(args.mono),
     )
@@ -0,0 +1,156 @@
+import threading
+import time
+
+# Degradation ladder, mildest first; each rung is the complete real-time profile at that level.
+# Inference rate goes first (detections lag a little), then the model input size (small defects
+# suffer), and only then what the operator sees: stream frame rate and JPEG quality.
+LADDER = (
+    {"name": "normal", "inference_interval": 0.1, "imgsz_scale": 1.0, "fps_limit": 30, "full_quality": 80, "grid_quality": 75},
+    {"name": "infer_5hz", "inference_interval": 0.2, "imgsz_scale": 1.0, "fps_limit": 30, "full_quality": 80, "grid_quality": 75},
+    {"name": "infer_2.5hz", "inference_interval": 0.4, "imgsz_scale": 1.0, "fps_limit": 30, "full_quality": 80, "grid_quality": 75},
+    {"name": "small_imgsz", "inference_interval": 0.4, "imgsz_scale": 0.75, "fps_limit": 30, "full_quality": 80, "grid_quality": 75},
+    {"name": "stream_15fps", "inference_interval": 0.4, "imgsz_scale": 0.75, "fps_limit": 15, "full_quality": 70, "grid_quality": 65},
+    {"name": "stream_10fps", "inference_interval": 0.8, "imgsz_scale": 0.75, "fps_limit": 10, "full_quality": 60, "grid_quality": 55},
+)
+
+_EMA_ALPHA = 0.2
+_UP_RATIO = 0.6  # step back up only with this much headroom, so the levels do not flap
+_STALE_S = 2.0  # a latency not measured for this long (no watchers / detection off) is ignored
+_MIN_IMGSZ = 160
+_ENCODE_SHARE = 0.5  # encode dominates an overrunning loop pass at this share of it
+_STREAM_KEYS = {"fps_limit", "full_quality", "grid_quality"}
+
+
+class LatencyGovernor:
+    """Holds real-time latency to a target by walking the degradation LADDER.
+
+    Stream workers report inference latency (submit to result, so queueing behind
+    other slots counts), JPEG encode time and the busy time of each loop pass. The
+    governor is shared by all slots because they compete for the same CPU.
+
+    A level is dropped when inference exceeds target_ms, or a loop pass overruns
+    the frame budget of the current fps, for down_after_s. When the loop overruns
+    while inference is within target and JPEG encode takes at least half of the pass,
+    the rungs that only slow inference down cannot help, so the step goes straight to
+    the next rung that lowers stream fps / JPEG quality. A level is regained when
+    both sit below 60 % of their budgets (the next rung's frame budget for the loop)
+    for up_after_s. Measurements restart after every change so a new level is judged
+    on its own numbers.
+    """
+
+    def __init__(self, enabled: bool = True, target_ms: float = 150.0, down_after_s: float = 2.0, up_after_s: float = 10.0):
+        self._lock = threading.Lock()
+        self.imgsz_fixed = False
+        self.level = 0
+        self.changes = 0
+        self.last_change_at = 0.0
+        self.trigger = None  # latencies (ms) that caused the last change
+        self.configure(enabled, target_ms, down_after_s, up_after_s)
+        self._reset_window(time.perf_counter())
+
+    def configure(self, enabled=None, target_ms=None, down_after_s=None, up_after_s=None, imgsz_fixed=None):
+        with self._lock:
+            if enabled is not None:
+                self.enabled = bool(enabled)
+            if target_ms is not None:
+                self.target_ms = max(1.0, float(target_ms))
+            if down_after_s is not None:
+                self.down_after_s = max(0.0, float(down_after_s))
+            if up_after_s is not None:
+                self.up_after_s = max(0.0, float(up_after_s))
+            if imgsz_fixed is not None:
+                # Static-shape exports ignore imgsz: the small_imgsz rung would cost a step and gain nothing
+                self.imgsz_fixed = bool(imgsz_fixed)
+
+    def _reset_window(self, now):
+        self._ema = {"infer": 0.0, "encode": 0.0, "loop": 0.0}
+        self._seen = {"infer": 0.0, "encode": 0.0, "loop": 0.0}
+        self._over_since = None
+        self._under_since = None
+
+    def observe(self, kind: str, ms: float, now: float | None = None):
+        """Record one latency sample; kind is "infer", "encode" or "loop"."""
+        now = time.perf_counter() if now is None else now
+        with self._lock:
+            old = self._ema.get(kind)
+            if old is None:
+                return
+            self._ema[kind] = ms if old <= 0 else (old * (1.0 - _EMA_ALPHA) + ms * _EMA_ALPHA)
+            self._seen[kind] = now
+
+    def _fresh(self, kind, now):
+        return self._seen[kind] and now - self._seen[kind] <= _STALE_S
+
+    def _step(self, level, direction, keys=None):
+        """Next rung in direction, skipping rungs that change nothing on this engine
+        (or, with keys, none of those settings)."""
+        nxt = level + direction
+        while 0 <= nxt < len(LADDER):
+            differs = {k for k in LADDER[nxt] if k != "name" and LADDER[nxt][k] != LADDER[nxt - direction][k]}
+            if not (self.imgsz_fixed and differs <= {"imgsz_scale"}) and (keys is None or differs & keys):
+                return nxt
+            nxt += direction
+        return level
+
+    def evaluate(self, now: float | None = None) -> bool:
+        """Move at most one rung based on the current window; True when the level changed."""
+        now = time.perf_counter() if now is None else now
+        with self._lock:
+            if not self.enabled:
+                if self.level == 0:
+                    return False
+                target = 0
+            else:
+                infer = self._ema["infer"] if self._fresh("infer", now) else 0.0
+                loop = self._ema["loop"] if self._fresh("loop", now) else 0.0
+                encode = self._ema["encode"] if self._fresh("encode", now) else 0.0
+                if not infer and not loop:
+                    # Nothing streaming: keep the level, restart the clocks
+                    self._over_since = self._under_since = None
+                    return False
+                budget_ms = 1000.0 / LADDER[self.level]["fps_limit"]
+                up = self._step(self.level, -1)
+                up_budget_ms = 1000.0 / LADDER[up]["fps_limit"]
+                over = infer > self.target_ms or loop > budget_ms
+                under = infer < self.target_ms * _UP_RATIO and loop < up_budget_ms * _UP_RATIO
+                self._over_since = (self._over_since or now) if over else None
+                self._under_since = (self._under_since or now) if under else None
+                target = self.level
+                if over and now - self._over_since >= self.down_after_s:
+                    encode_bound = infer <= self.target_ms and loop > budget_ms and encode >= loop * _ENCODE_SHARE
+                    target = self._step(self.level, 1, _STREAM_KEYS if encode_bound else None)
+                elif under and now - self._under_since >= self.up_after_s:
+                    target = up
+                if target == self.level:
+                    return False
+                self.trigger = {"infer_ms": infer, "encode_ms": encode, "loop_ms": loop}
+            self.level = target
+            self.changes += 1
+            self.last_change_at = time.time()
+            self._reset_window(now)
+            return True
+
+    def profile(self, base_imgsz: int):
+        """Stream-worker settings for the current level; imgsz is None at full input size."""
+        with self._lock:
+            rung = dict(LADDER[self.level])
+            fixed = self.imgsz_fixed
+        scale = rung.pop("imgsz_scale")
+        rung["imgsz"] = None if (scale >= 1.0 or fixed) else max(_MIN_IMGSZ, int(base_imgsz * scale) // 32 * 32)
+        return rung
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "level": self.level,
+                "rung": LADDER[self.level]["name"],
+                "max_level": len(LADDER) - 1,
+                "target_ms": self.target_ms,
+                "infer_ms": self._ema["infer"],
+                "encode_ms": self._ema["encode"],
+                "loop_ms": self._ema["loop"],
+                "changes": self.changes,
+                "last_change_at": self.last_change_at,
+                "trigger": self.trigger,
+            }
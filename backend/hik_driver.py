@@ -525,6 +525,19 @@ class HikCameraDriver:
                 return None, None, None, float(self.camera_fps)
             return frame.copy(), int(self.frame_seq), float(self.frame_update_time), float(self.camera_fps)
 
+    def get_raw_frame_ref(self):
+        """Latest full-resolution frame without a copy, for inference that only reads it.
+
+        Safe because every capture stores a new array instead of writing into the old one.
+        """
+        if not SDK_AVAILABLE:
+            if REQUIRE_HIK_SDK:
+                return None
+            return self._get_mock_frame()
+
+        with self._lock:
+            return self.latest_frame_raw if self.latest_frame_raw is not None else self.latest_frame
+
     def _get_mock_frame(self, text=None):
         h, w = 480, 640
         canvas = np.zeros((h, w, 3), np.uint8)
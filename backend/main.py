@@ -1,3 +1,8 @@
+import time
+
+# Startup phase timing starts here, so the import cost of the modules below is measured too
+_PROCESS_T0 = time.perf_counter()
+
 import cv2
 import uvicorn
 import asyncio
@@ -7,8 +12,9 @@ from fastapi.responses import StreamingResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 import socketio
 from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
 import threading
-import time
+import multiprocessing
 import numpy as np
 import os
 import sys
@@ -18,7 +24,17 @@ from typing import Dict, List
 
 from hik_driver import HikCameraDriver, get_available_cameras, get_hik_sdk_status
 from detector import DefectDetector
-from config_store import load_settings, save_settings, default_settings, _config_path as get_config_path
+from detections import Detections
+from roi import SlotRoi, build_slot_rois
+from change_gate import ChangeGate
+from governor import LatencyGovernor
+from tracker import SlotTracker
+from scheduler import InferenceScheduler
+from cascade import CascadeDetector
+from config_store import load_settings, save_settings, default_settings, normalize_tiling, normalize_roi, normalize_autotune, normalize_governor, normalize_tracker, normalize_scheduler, normalize_cascade, _config_path as get_config_path
+from autotune import autotune
+from benchmark import load_frames
+from calibration import load_images, sample_history
 
 
 def _is_pid_alive(pid: int) -> bool:
@@ -70,8 +86,22 @@ _start_parent_watchdog()
 
 # Global State
 cameras: Dict[int, HikCameraDriver] = {}
-camera_detections: Dict[int, List] = {0: [], 1: [], 2: [], 3: []} # Store latest detections per camera
+camera_detections: Dict[int, Detections] = {i: Detections() for i in range(4)} # Store latest detections per camera
 detector = None
+# Orders manual / upload / real-time inference and batches real-time frames across slots
+scheduler: InferenceScheduler | None = None
+# Real-time screening cascade: a nano model screens every frame, the active model confirms
+cascade: CascadeDetector | None = None
+# Annotation drawing + JPEG writes, kept off the inference replicas and the event loop
+render_pool: ThreadPoolExecutor | None = None
+# Compiled per-slot regions of interest (only slots with an enabled ROI)
+slot_rois: Dict[int, SlotRoi] = {}
+# Per-slot static-scene detectors that let real-time mode skip redundant inference
+change_gates: Dict[int, ChangeGate] = {}
+# Shared latency governor: degrades the real-time profile of every slot under load
+governor: LatencyGovernor | None = None
+# Per-slot trackers that carry real-time detections between detector runs
+trackers: Dict[int, SlotTracker] = {}
 running = False
 # Auto-inference control: True = detect every frame, False = only on trigger
 auto_inference = False
@@ -86,7 +116,16 @@ slot_op_locks: Dict[int, asyncio.Lock] = {}
 device_op_locks: Dict[int, asyncio.Lock] = {}
 
 model_reload_lock: asyncio.Lock | None = None
+# True while a replacement model loads in the background (the old one keeps serving)
 model_reloading = False
+model_reload_task: asyncio.Task | None = None
+# Background model load started by lifespan; the server accepts requests while it runs
+model_startup_task: asyncio.Task | None = None
+# On-host autotune run (first start or POST /autotune) and its last known state
+autotune_task: asyncio.Task | None = None
+autotune_state: Dict = {"state": "idle", "progress": 0.0, "detail": "", "result": None}
+# Readiness ("starting" -> "loading_model" -> "ready" | "failed") and phase durations in ms
+startup_state: Dict = {"state": "starting", "phases": {}, "serving_ms": None, "ready_ms": None, "error": None}
 
 # Per-slot inference busy tracking for frame-skip
 infer_busy: Dict[int, bool] = {0: False, 1: False, 2: False, 3: False}
@@ -158,55 +197,27 @@ async def get_paths():
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    global cameras, detector, running, log_cooldown, persisted_settings, is_manual_mode, auto_inference, stream_state, stream_tasks, fps_broadcast_task, sdk_op_lock, slot_op_locks, device_op_locks, model_reload_lock
+    global cameras, detector, scheduler, render_pool, slot_rois, change_gates, governor, trackers, running, log_cooldown, persisted_settings, is_manual_mode, auto_inference, stream_state, stream_tasks, fps_broadcast_task, sdk_op_lock, slot_op_locks, device_op_locks, model_reload_lock, model_startup_task
     
+    _startup_phase("imports", _PROCESS_T0)
+    t0 = time.perf_counter()
     persisted_settings = load_settings()
+    slot_rois = build_slot_rois(persisted_settings.get("roi"))
+    gate_cfg = persisted_settings.get("change_gate", {})
+    change_gates = {i: ChangeGate(**gate_cfg) for i in range(4)}
+    governor = LatencyGovernor(**persisted_settings.get("governor", {}))
+    trackers = {i: SlotTracker(**persisted_settings.get("tracker", {})) for i in range(4)}
     log_cooldown = float(persisted_settings.get("log_interval", log_cooldown))
     is_manual_mode = bool(persisted_settings.get("manual_mode", True))
     auto_inference = not is_manual_mode
     print(f"DATA_DIR={APP_DATA_DIR}")
     print(f"HISTORY_DIR={HISTORY_DIR}")
     print(f"CONFIG_PATH={get_config_path()}")
+    render_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="Render")
+    _startup_phase("settings", t0)
 
-    # 1. Initialize Detector
-    print("-" * 30)
-    print("CORE SYSTEM STARTUP: Initializing AI Engine...")
-    try:
-        detector = DefectDetector()
-        try:
-            await asyncio.to_thread(
-                detector.update_settings,
-                conf=float(persisted_settings.get("conf", detector.conf)),
-                imgsz=int(persisted_settings.get("imgsz", detector.imgsz)),
-            )
-        except Exception:
-            pass
-
-        try:
-            mt = str(persisted_settings.get("model_type", "auto"))
-            mn = str(persisted_settings.get("model_name", "yolo26s"))
-            if mt == "auto":
-                detector.reload_model("auto", mn)
-            elif mt != detector.current_model_type:
-                detector.reload_model(mt, mn)
-        except Exception:
-            pass
-
-        if not detector.is_loaded():
-             print("[ERROR] AI Engine Initialization Failed: No model loaded.")
-             print("        Please ensure 'models/best.pt' (or .onnx) exists.")
-        else:
-             print(f"[SUCCESS] AI Engine Ready.")
-             print(f"          - Model: {detector.model_path}")
-             print(f"          - Type: {detector.current_model_type}")
-             print(f"          - Device: {detector.device}")
-             print(f"          - Settings: conf={detector.conf}, imgsz={detector.imgsz}")
-    except Exception as e:
-        print(f"[CRITICAL] AI Engine Exception: {e}")
-        import traceback
-        traceback.print_exc()
-
-    # 2. Initialize Camera Slots
+    # 1. Initialize Camera Slots (the AI engine loads in the background, see below)
+    t0 = time.perf_counter()
     print("-" * 30)
     print("CORE SYSTEM STARTUP: Initializing Camera Slots...")
     # Initialize 4 slots but DO NOT connect yet
@@ -216,7 +227,9 @@ async def lifespan(app: FastAPI):
         # User must manually select camera via frontend.
     print(f"[SUCCESS] {len(cameras)} Camera Slots Prepared (Idle Mode).")
     print("-" * 30)
+    _startup_phase("camera_slots", t0)
     
+    t0 = time.perf_counter()
     running = True
     if sdk_op_lock is None:
         sdk_op_lock = asyncio.Lock()
@@ -244,17 +257,42 @@ async def lifespan(app: FastAPI):
     }
     stream_tasks = {i: asyncio.create_task(_camera_stream_worker(i)) for i in range(4)}
     fps_broadcast_task = asyncio.create_task(_broadcast_fps_loop())
+    _startup_phase("stream_workers", t0)
+
+    # 2. Initialize Detector in the background: /status, camera discovery and the streams
+    # are served right away, inference starts once the model is ready
+    startup_state["state"] = "loading_model"
+    startup_state["serving_ms"] = round((time.perf_counter() - _PROCESS_T0) * 1000, 1)
+    print(f"[STARTUP] Serving after {startup_state['serving_ms']:.0f} ms, AI engine loading in background...")
+    model_startup_task = asyncio.create_task(_load_model_at_startup())
 
     yield
     # Shutdown
     print("Shutting down...")
     running = False
+    if model_startup_task:
+        model_startup_task.cancel()
+        model_startup_task = None
+    if autotune_task:
+        autotune_task.cancel()
     for t in list(stream_tasks.values()):
         t.cancel()
     stream_tasks = {}
     if fps_broadcast_task:
         fps_broadcast_task.cancel()
         fps_broadcast_task = None
+    if scheduler:
+        scheduler.close()
+        scheduler = None
+    if cascade:
+        screen = cascade.set_screen(None)
+        if screen is not None:
+            screen.close()
+    if detector:
+        detector.close()
+    if render_pool:
+        render_pool.shutdown(wait=True)
+        render_pool = None
     for cam in cameras.values():
         cam.release()
 
@@ -262,6 +300,308 @@ async def lifespan(app: FastAPI):
 app.router.lifespan_context = lifespan
 
 
+def _startup_phase(name: str, t0: float):
+    """Record how long a startup phase took (since t0) in startup_state and the console."""
+    ms = round((time.perf_counter() - t0) * 1000, 1)
+    startup_state["phases"][name] = ms
+    print(f"[STARTUP] {name}: {ms:.0f} ms")
+
+
+def _startup_progress_reporter(inner):
+    """Wrap a model_load progress callback so each load stage is timed as a startup phase."""
+    marks = {"stage": None, "t": time.perf_counter()}
+
+    def _report(stage: str, fraction: float, detail: str = ""):
+        if stage != marks["stage"]:
+            if marks["stage"] is not None:
+                _startup_phase(f"model_{marks['stage']}", marks["t"])
+            marks["stage"], marks["t"] = stage, time.perf_counter()
+        inner(stage, fraction, detail)
+
+    return _report
+
+
+def _create_detector(settings: Dict) -> DefectDetector:
+    det = DefectDetector(
+        engine=str(settings.get("inference_engine", "auto")),
+        replicas=int(settings.get("replicas", 1)),
+        intra_op_threads=int(settings.get("intra_op_threads", 0)),
+        dispatch=str(settings.get("replica_dispatch", "least_loaded")),
+        replica_mode=str(settings.get("replica_mode", "thread")),
+        async_requests=(
+            int(settings.get("async_requests", 0))
+            if settings.get("openvino_async")
+            else None
+        ),
+        cache_mb=int(settings.get("model_cache_mb", 1024)),
+        compile_cache_dir=os.path.join(APP_DATA_DIR, "model_cache"),
+        autoload=False,
+    )
+    try:
+        det.update_settings(
+            conf=float(settings.get("conf", det.conf)),
+            imgsz=int(settings.get("imgsz", det.imgsz)),
+        )
+    except Exception:
+        pass
+    return det
+
+
+async def _load_model_at_startup():
+    """Create the detector and load the persisted model without blocking the server."""
+    global detector, scheduler, cascade, model_reloading
+    print("-" * 30)
+    print("CORE SYSTEM STARTUP: Initializing AI Engine...")
+    mt = str(persisted_settings.get("model_type", "auto"))
+    mn = str(persisted_settings.get("model_name", "yolo26s"))
+    request = f"{mn}/{mt}"
+    async with model_reload_lock:
+        model_reloading = True
+        try:
+            t0 = time.perf_counter()
+            # Only resolves paths; /models and /status can use it while the model loads
+            detector = await asyncio.to_thread(_create_detector, persisted_settings)
+            detector.set_autotune((persisted_settings.get("autotune") or {}).get("result"))
+            autotune_state["result"] = detector.autotuned
+            # All inference goes through the scheduler; real-time frames are batched across slots.
+            # Created before the load so a model loaded later (after a failed start) is served too
+            scheduler = InferenceScheduler(detector, *_scheduler_shape(), **persisted_settings.get("scheduler", {}))
+            cascade = CascadeDetector(detector, **persisted_settings.get("cascade", {}))
+            scheduler.cascade = cascade
+            _startup_phase("detector_init", t0)
+
+            reporter = _startup_progress_reporter(_model_progress_reporter(asyncio.get_running_loop(), request))
+            t0 = time.perf_counter()
+            success, msg = await asyncio.to_thread(detector.reload_model, mt, mn, False, reporter)
+            if not success:
+                # Requested type missing: fall back to the best available model, as before
+                print(f"Startup model {request} unavailable ({msg}), loading default model...")
+                await asyncio.to_thread(detector.load_model, progress=reporter)
+            _startup_phase("model_total", t0)
+
+            if not detector.is_loaded():
+                raise RuntimeError("No model loaded.")
+            scheduler.resize(*_scheduler_shape())
+            startup_state["state"] = "ready"
+        except Exception as e:
+            startup_state["state"] = "failed"
+            startup_state["error"] = str(e)
+            print(f"[ERROR] AI Engine Initialization Failed: {e}")
+            print("        Please ensure 'models/best.pt' (or .onnx) exists.")
+        finally:
+            model_reloading = False
+
+    startup_state["ready_ms"] = round((time.perf_counter() - _PROCESS_T0) * 1000, 1)
+    await sio.emit("startup", startup_state)
+    if startup_state["state"] == "ready":
+        print(f"[SUCCESS] AI Engine Ready after {startup_state['ready_ms']:.0f} ms.")
+        print(f"          - Model: {detector.model_path}")
+        print(f"          - Type: {detector.current_model_type}")
+        print(f"          - Engine: {detector.engine_name}")
+        print(f"          - Device: {detector.device}")
+        print(f"          - Settings: conf={detector.conf}, imgsz={detector.imgsz}")
+        print(f"          - Batch: {detector.max_batch or 'dynamic'}")
+        print(f"          - Replicas: {len(detector.replicas)} x {detector.intra_op_threads or 'default'} threads ({detector.dispatch}, {detector.replica_mode})")
+        print(f"          - Async pipeline: {'on' if detector.supports_async() else 'off'}")
+        await broadcast_log(
+            "系统",
+            f"AI 引擎就绪 ({startup_state['ready_ms'] / 1000:.1f}s): {detector.model_name}/{detector.current_model_type} ({detector.engine_name})",
+            "info",
+        )
+    else:
+        await broadcast_log("错误", f"AI 引擎初始化失败: {startup_state['error']}", "high")
+    print("-" * 30)
+
+    tune_cfg = persisted_settings.get("autotune") or {}
+    if startup_state["state"] == "ready" and tune_cfg.get("on_first_start") and detector.autotuned is None:
+        # First start on this host (or a result recorded elsewhere): find the fastest configuration,
+        # pausing while real-time inference needs the CPU
+        _start_autotune(wait_idle=True)
+    if startup_state["state"] == "ready" and cascade is not None and cascade.enabled:
+        await _apply_cascade()
+
+
+def _load_screen_detector(screen_model: str) -> DefectDetector:
+    """A second detector (same engine / pool settings) serving the cascade's screening model."""
+    screen = _create_detector(persisted_settings)
+    preferred = str(persisted_settings.get("model_type", "auto"))
+    for model_type in dict.fromkeys((preferred, "auto")):
+        success, msg = screen.reload_model(model_type, screen_model)
+        # Lookups fall back to best.*: a screen that resolved to the confirm model would only add cost
+        if success and screen.is_loaded() and os.path.abspath(screen.model_path) != os.path.abspath(detector.model_path):
+            return screen
+    screen.close()
+    raise RuntimeError(f"no export of {screen_model} besides the active model")
+
+
+async def _apply_cascade(force: bool = False):
+    """Load, swap or drop the cascade's screening model to match its settings
+    (force: rebuild it even if the model is unchanged, after engine / pool changes)."""
+    if cascade is None or detector is None:
+        return
+    async with model_reload_lock:
+        screen = cascade.screen
+        if not cascade.enabled:
+            old = cascade.set_screen(None)
+            if old is not None:
+                await asyncio.to_thread(old.close)
+                await broadcast_log("配置", "级联筛查已关闭: 实时推理恢复为单模型", "medium")
+            return
+        if not force and screen is not None and screen.is_loaded() and screen.model_name == cascade.screen_model:
+            return
+        try:
+            screen = await asyncio.to_thread(_load_screen_detector, cascade.screen_model)
+        except Exception as e:
+            await broadcast_log("错误", f"级联筛查模型加载失败 ({cascade.screen_model}): {e} | 实时推理仍使用单模型", "high")
+            return
+        old = cascade.set_screen(screen)
+        cascade.reset_stats()
+        if old is not None:
+            await asyncio.to_thread(old.close)
+    await broadcast_log(
+        "配置",
+        f"级联筛查已启用: 筛查 {screen.model_name}/{screen.current_model_type} ({screen.engine_name}) conf={cascade.screen_conf} -> "
+        f"确认 {detector.model_name}/{detector.current_model_type} | 模式 {cascade.mode}",
+        "medium",
+    )
+
+
+def _autotune_frames(count: int = 8):
+    """Captures from this installation's history, else a fixed synthetic set."""
+    frames = load_images(sample_history(HISTORY_DIR, count))
+    return frames or load_frames(None, count)
+
+
+def _inference_idle(quiet_s: float = 2.0) -> bool:
+    """True while no slot has run real-time inference in the last quiet_s seconds."""
+    if not auto_inference:
+        return True
+    now = time.time()
+    return all(now - float(st["stats"].get("infer_updated_at", 0.0)) > quiet_s for st in list(stream_state.values()))
+
+
+def _start_autotune(wait_idle: bool = False) -> bool:
+    global autotune_task
+    if autotune_task is not None and not autotune_task.done():
+        return False
+    autotune_task = asyncio.create_task(_run_autotune(wait_idle))
+    return True
+
+
+async def _run_autotune(wait_idle: bool = False):
+    """Benchmark the exports of the configured model on this host and adopt the winner.
+
+    The result is persisted in settings ("autotune.result", plus the winning imgsz and
+    intra_op_threads); with model_type "auto" the winning export is loaded right away.
+    With wait_idle, each benchmark case waits until real-time inference is idle.
+    """
+    global persisted_settings
+    cfg = persisted_settings.get("autotune") or default_settings()["autotune"]
+    model_name = str(persisted_settings.get("model_name", "yolo26s"))
+    models_dir = detector._get_models_dir() if detector else None
+    if not models_dir:
+        autotune_state.update({"state": "failed", "progress": 1.0, "detail": "no models directory"})
+        return
+
+    loop = asyncio.get_running_loop()
+
+    def _progress(stage: str, fraction: float, detail: str = ""):
+        autotune_state.update({"progress": round(float(fraction), 2), "detail": detail})
+        payload = {"stage": stage, "progress": round(float(fraction), 2), "detail": detail}
+        asyncio.run_coroutine_threadsafe(sio.emit("autotune", payload), loop)
+
+    autotune_state.update({"state": "running", "progress": 0.0, "detail": ""})
+    await broadcast_log("配置", f"开始性能自动调优: model={model_name}, 延迟预算 {cfg['budget_ms']:.0f}ms", "medium")
+    try:
+        frames = await asyncio.to_thread(_autotune_frames)
+        result = await asyncio.to_thread(
+            autotune,
+            models_dir,
+            model_name,
+            frames,
+            cfg["imgsz_options"],
+            cfg["threads_options"],
+            float(cfg["budget_ms"]),
+            int(cfg["runs"]),
+            progress=_progress,
+            formats=tuple(cfg.get("formats") or default_settings()["autotune"]["formats"]),
+            idle=_inference_idle if wait_idle else None,
+        )
+    except Exception as e:
+        result = None
+        autotune_state["detail"] = str(e)
+    if result is None:
+        autotune_state.update({"state": "failed", "progress": 1.0})
+        await broadcast_log("错误", f"性能自动调优失败: {autotune_state['detail']}", "high")
+        return
+
+    persisted_settings = load_settings()
+    persisted_settings["autotune"]["result"] = result
+    persisted_settings["imgsz"] = int(result["imgsz"])
+    persisted_settings["intra_op_threads"] = int(result["intra_op_threads"])
+    save_settings(persisted_settings)
+    autotune_state.update({"state": "done", "progress": 1.0, "result": result})
+    await broadcast_log(
+        "配置",
+        f"自动调优完成: {result['file']} ({result['model_type']}{'/' + result['precision'] if result.get('precision') else ''}), "
+        f"imgsz={result['imgsz']}, threads={result['intra_op_threads'] or 'default'}, p50={result['p50_ms']:.1f}ms, p95={result['p95_ms']:.1f}ms"
+        f"{'' if result['within_budget'] else ' (超出延迟预算, 已选最快配置)'}",
+        "medium" if result["within_budget"] else "high",
+    )
+
+    if detector:
+        detector.set_autotune(result)
+        force = detector.configure_pool(None, result["intra_op_threads"], None)
+        await asyncio.to_thread(detector.update_settings, imgsz=int(result["imgsz"]))
+        if str(persisted_settings.get("model_type", "auto")) == "auto":
+            await _reload_model_in_background("auto", model_name, force)
+
+
+def _scheduler_shape():
+    """(workers, max_batch) for the scheduler: one worker per replica, batches the export accepts."""
+    return max(1, len(detector.replicas)), (detector.max_batch or 4)
+
+
+async def _run_inference(priority: str, fn):
+    """Run fn() (blocking detector work) through the scheduler at the given priority class."""
+    if scheduler is None:
+        return await asyncio.to_thread(fn)
+    return await asyncio.wrap_future(scheduler.submit(priority, fn))
+
+
+def _slot_infer_shape(slot_id: int):
+    """(h, w) of the image real-time inference sends for a connected slot (capture size after ROI), or None."""
+    st = stream_state.get(slot_id) or {}
+    cam = cameras.get(slot_id)
+    infer_shape = st.get("infer_shape")
+    if not infer_shape or not cam or not cam.connected:
+        return None
+    roi = slot_rois.get(slot_id)
+    if roi is None:
+        return tuple(infer_shape)
+    w, h = roi.plan(infer_shape).canvas_wh
+    return (h, w)
+
+
+def _expected_infer_shapes():
+    """(h, w) of the images real-time inference will send per connected slot, after ROI."""
+    return sorted({shape for shape in map(_slot_infer_shape, list(stream_state)) if shape})
+
+
+def _render_and_save(filepath: str, frame, detections: Detections) -> bool:
+    return bool(cv2.imwrite(filepath, draw_detections(frame.copy(), detections)))
+
+
+async def save_annotated(filepath: str, frame, detections: Detections) -> bool:
+    """Render detections onto frame and write it, on the render pool.
+
+    Inference only returns Detections; drawing happens here, after the replica
+    lock is released and only for callers that actually keep an image.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(render_pool, _render_and_save, filepath, frame, detections)
+
+
 async def broadcast_log(
     title: str, message: str, level: str = "info", attachment: str = None
 ):
@@ -307,7 +647,7 @@ async def predict_image(file: UploadFile = File(...)):
         await broadcast_log("操作受限", msg, "high")
         return JSONResponse(status_code=400, content={"error": msg})
 
-    if not detector:
+    if not detector or not detector.is_loaded():
         await broadcast_log("错误", "模型未加载", "high")
         return JSONResponse(status_code=500, content={"error": "Model not loaded"})
 
@@ -335,7 +675,7 @@ async def predict_image(file: UploadFile = File(...)):
         # Inference
         start_time = time.time()
         # Use to_thread to prevent blocking event loop during heavy inference
-        results, annotated_frame = await asyncio.to_thread(detector.predict, img)
+        results = await _run_inference("upload", lambda: detector.predict(img))
         dt = time.time() - start_time
 
         det_count = len(results)
@@ -347,7 +687,7 @@ async def predict_image(file: UploadFile = File(...)):
         timestamp = int(time.time() * 1000)
         filename = f"detected_{timestamp}.jpg"
         filepath = os.path.join(HISTORY_DIR, filename)
-        await asyncio.to_thread(cv2.imwrite, filepath, annotated_frame)
+        await save_annotated(filepath, img, results)
         image_url = f"http://localhost:8000/history/{filename}"
 
         await broadcast_log(
@@ -385,6 +725,10 @@ def draw_detections(frame, detections):
     
     img = frame
     
+    # One vectorized conversion of the columns, then plain tuples for drawing
+    track_ids = detections.ids.tolist() if detections.ids is not None else [None] * len(detections)
+    boxes = list(zip(detections.xyxy.astype(int).tolist(), detections.conf.tolist(), detections.labels(), track_ids))
+
     # Label mapping
     label_map_cn = {"item": "缺陷", "defect": "缺陷"}
     label_map_en = {"item": "QueXian", "defect": "Defect"}
@@ -406,20 +750,14 @@ def draw_detections(frame, detections):
             except IOError:
                 font = ImageFont.load_default()
 
-        for det in detections:
-            xyxy = det.get("xyxy")
-            if not xyxy: continue
-            x1, y1, x2, y2 = map(int, xyxy[0])
-            conf = det.get("conf", 0)
-            raw_label = det.get("label", "Unknown")
-            
+        for (x1, y1, x2, y2), conf, raw_label, track_id in boxes:
             # Use Chinese label if font supports it (msyh/simhei), otherwise fallback
             label = label_map_cn.get(raw_label.lower(), raw_label)
             
             color = (0, 255, 0)
             draw.rectangle([x1, y1, x2, y2], outline=color, width=2)
             
-            text = f"{label} {conf:.2f}"
+            text = f"{label} {conf:.2f}" if track_id is None else f"#{track_id} {label} {conf:.2f}"
             bbox = draw.textbbox((x1, y1 - 25), text, font=font)
             draw.rectangle(bbox, fill=color)
             draw.text((x1, y1 - 25), text, font=font, fill=(255, 255, 255))
@@ -428,19 +766,14 @@ def draw_detections(frame, detections):
 
     except Exception as e:
         # Fallback to OpenCV
-        for det in detections:
-            xyxy = det.get("xyxy")
-            if not xyxy: continue
-            x1, y1, x2, y2 = map(int, xyxy[0])
-            conf = det.get("conf", 0)
-            raw_label = det.get("label", "Unknown")
+        for (x1, y1, x2, y2), conf, raw_label, track_id in boxes:
             # Use Pinyin/English to avoid garbage chars
             label = label_map_en.get(raw_label.lower(), raw_label)
             
             color = (0, 255, 0)
             cv2.rectangle(img, (x1, y1), (x2, y2), color, 2)
             
-            text = f"{label} {conf:.2f}"
+            text = f"{label} {conf:.2f}" if track_id is None else f"#{track_id} {label} {conf:.2f}"
             t_size = cv2.getTextSize(text, 0, fontScale=0.5, thickness=1)[0]
             c2 = x1 + t_size[0], y1 - t_size[1] - 3
             cv2.rectangle(img, (x1, y1), c2, color, -1, cv2.LINE_AA)  # filled
@@ -459,23 +792,31 @@ def _resize_to_width(frame, target_width: int):
     return cv2.resize(frame, (target_width, new_h))
 
 
-def _scale_detections_xyxy(detections, sx: float, sy: float):
-    if not detections or (sx == 1.0 and sy == 1.0):
-        return detections
-    scaled = []
-    for det in detections:
-        xyxy = det.get("xyxy")
-        if not xyxy:
-            continue
-        x1, y1, x2, y2 = xyxy[0]
-        scaled_det = dict(det)
-        scaled_det["xyxy"] = [[x1 * sx, y1 * sy, x2 * sx, y2 * sy]]
-        bbox = det.get("bbox")
-        if bbox and len(bbox) == 1 and len(bbox[0]) == 4:
-            x, y, bw, bh = bbox[0]
-            scaled_det["bbox"] = [[x * sx, y * sy, bw * sx, bh * sy]]
-        scaled.append(scaled_det)
-    return scaled
+def _infer_input(roi, gate, frame, now_pc, imgsz=None):
+    """(RoiPlan or None, image the detector sees, its ROI scale, whether to run it) for a
+    due frame: the slot's ROI applied, then the change gate checked on the result.
+
+    Packed / masked ROI crops are resized straight to the model's input scale, so the
+    capture is resized once and the gate thumbnails the small image. Building the plan
+    and the crops still take tens of ms, so the stream worker runs this in one
+    worker-thread job, off the loop.
+    """
+    plan, image, scale = None, frame, 1.0
+    if roi is not None:
+        plan = roi.plan(frame.shape)
+        mono = frame.ndim == 2 or frame.shape[2] == 1
+        image, scale = plan.prepare_scaled(frame, detector.input_hw_for(plan.canvas_wh[::-1], imgsz, mono))
+    return plan, image, scale, gate is None or gate.should_infer(image, now_pc)
+
+
+def _to_profile(dets: Detections, src_shape, dst_shape) -> Detections:
+    """Map detections from the frame they were inferred on (src_shape) onto a display
+    frame of dst_shape; the detector has already undone its letterbox scale and padding."""
+    if not dets or not src_shape:
+        return Detections()
+    sx = dst_shape[1] / float(src_shape[1])
+    sy = dst_shape[0] / float(src_shape[0])
+    return dets if (sx, sy) == (1.0, 1.0) else dets.scaled(sx, sy)
 
 
 def _encode_jpeg(frame, quality: int):
@@ -514,7 +855,7 @@ def _batch_process_frame(
     full_frame, grid_width: int,
     needs_grid: bool, needs_full: bool,
     wants_detect: bool,
-    dets_grid: list, dets_full: list,
+    dets_grid: Detections, dets_full: Detections,
     grid_quality: int, full_quality: int,
     watchers: dict,
     pre_grid_frame=None,
@@ -524,7 +865,7 @@ def _batch_process_frame(
 
     # Resize for grid if needed (reuse pre-computed if available)
     grid_frame = None
-    if needs_grid or wants_detect:
+    if needs_grid:
         grid_frame = pre_grid_frame if pre_grid_frame is not None else _resize_to_width(full_frame, grid_width)
 
     # Grid encoding
@@ -551,25 +892,33 @@ def _batch_process_frame(
 
 
 async def _camera_stream_worker(camera_id: int):
-    global cameras, detector, running, auto_inference, camera_detections, stream_state, last_log_time, model_reloading, infer_busy
-
-    fps_limit = 30
-    frame_duration = 1.0 / fps_limit
-    inference_interval = 0.1
+    global cameras, detector, running, auto_inference, camera_detections, stream_state, last_log_time, infer_busy
 
+    # Inference interval, stream fps, JPEG qualities and auto imgsz come from the governor's current rung
     grid_width = 960
-    full_quality = 80
-    grid_quality = 75
+    frame_duration = 1.0 / 30
 
     last_inference_time = 0.0
+    frames_since_infer = 0
     last_stream_tick = 0.0
     stream_fps_ema = 0.0
     last_frame_seq = None
 
     while running:
         loop_start_pc = time.perf_counter()
+        loop_work = False
 
         try:
+            prof = governor.profile(detector.imgsz if detector else 640)
+            inference_interval = prof["inference_interval"]
+            if scheduler is not None:
+                # Slots without recent defects are sampled less often, freeing the CPU for active ones
+                inference_interval = scheduler.interval(camera_id, inference_interval)
+            frame_duration = 1.0 / prof["fps_limit"]
+            full_quality = prof["full_quality"]
+            grid_quality = prof["grid_quality"]
+            auto_imgsz = prof["imgsz"]
+
             cam = cameras.get(camera_id)
             if not cam or not cam.connected:
                 await asyncio.sleep(0.2)
@@ -589,7 +938,8 @@ async def _camera_stream_worker(camera_id: int):
             wants_detect = bool((watchers.get("grid") or {}).get("detect", 0) > 0 or (watchers.get("full") or {}).get("detect", 0) > 0)
 
             if not wants_any:
-                camera_detections[camera_id] = []
+                camera_detections[camera_id] = Detections()
+                trackers[camera_id].reset()
                 st["stats"]["infer_ms_ema"] = 0.0
                 st["stats"]["infer_fps_ema"] = 0.0
                 await asyncio.sleep(0.2)
@@ -603,35 +953,66 @@ async def _camera_stream_worker(camera_id: int):
                 await asyncio.sleep(0.005)
                 continue
             last_frame_seq = frame_seq
+            loop_work = True
+            frames_since_infer += 1
+            tracker = trackers[camera_id] if trackers[camera_id].enabled else None
 
             now_pc = time.perf_counter()
             now_wall = time.time()
 
-            # Check if inference should run (before batch processing, need grid_frame)
-            # We need a preliminary resize to get grid_frame for inference
+            # The grid profile is only resized when someone watches it; inference does not use it
             prelim_grid = None
-            if needs_grid or wants_detect:
+            if needs_grid:
                 prelim_grid = await asyncio.to_thread(_resize_to_width, full_frame, grid_width)
                 if prelim_grid is None:
                     await asyncio.sleep(0.01)
                     continue
+                st["grid_shape"] = prelim_grid.shape[:2]
 
             should_infer = False
-            if (not model_reloading) and detector and auto_inference and wants_detect and (now_pc - last_inference_time >= inference_interval) and (prelim_grid is not None) and not infer_busy[camera_id]:
-                should_infer = True
+            # With a tracker the boxes are carried between runs, so the detector only needs every Nth frame
+            frame_due = tracker is None or frames_since_infer >= tracker.detect_every
+            if detector and detector.is_loaded() and auto_inference and wants_detect and frame_due and (now_pc - last_inference_time >= inference_interval) and not infer_busy[camera_id]:
                 last_inference_time = now_pc
+                frames_since_infer = 0
+                # The detector letterboxes the capture straight to its input size (one resize);
+                # detections come back in capture coordinates and are scaled per display profile
+                infer_source = cam.get_raw_frame_ref()
+                if infer_source is None:
+                    infer_source = full_frame
+                st["infer_shape"] = infer_source.shape[:2]
+                st["infer_mono"] = infer_source.ndim == 2 or infer_source.shape[2] == 1
+                # With an ROI the detector only sees the cropped / packed regions
+                roi = slot_rois.get(camera_id)
+                # Static scene: keep the previous detections instead of re-running the model
+                gate = change_gates.get(camera_id)
+                if roi is None and gate is None:
+                    roi_plan, frame_for_infer, roi_scale, should_infer = None, infer_source, 1.0, True
+                else:
+                    roi_plan, frame_for_infer, roi_scale, should_infer = await asyncio.to_thread(
+                        _infer_input, roi, gate, infer_source, now_pc, auto_imgsz
+                    )
 
             if should_infer:
                 # Fire-and-forget: run inference in background, don't block stream
                 infer_busy[camera_id] = True
-                frame_for_infer = prelim_grid.copy()
 
-                async def _run_infer(sid, frame, _now_wall):
+                async def _run_infer(sid, frame, _now_wall, frame_t, plan=None, src_shape=None, display=None, imgsz=None, plan_scale=1.0):
                     global camera_detections, last_log_time
                     try:
                         t0 = time.perf_counter()
-                        results, _ = await asyncio.to_thread(detector.predict, frame, False)
+                        if scheduler is not None:
+                            results = await asyncio.wrap_future(scheduler.submit_frame(sid, frame, imgsz))
+                            if results is None:
+                                # Superseded by a newer frame or past its deadline
+                                return
+                            scheduler.note_detections(sid, len(results))
+                        else:
+                            results = await asyncio.to_thread(detector.predict, frame, imgsz)
+                        if plan is not None:
+                            results = plan.restore(results, plan_scale)
                         infer_ms = (time.perf_counter() - t0) * 1000.0
+                        governor.observe("infer", infer_ms)
                         # Update EMA in stream_state directly
                         st_ref = stream_state.get(sid)
                         if st_ref:
@@ -644,41 +1025,51 @@ async def _camera_stream_worker(camera_id: int):
                                 old_fps = st_ref["stats"].get("infer_fps_ema", 0.0)
                                 st_ref["stats"]["infer_fps_ema"] = inst if old_fps <= 0 else (old_fps * 0.8 + inst * 0.2)
                             st_ref["stats"]["_last_infer_tick"] = now_tick
+                        slot_tracker = trackers.get(sid)
+                        if slot_tracker is not None and slot_tracker.enabled:
+                            # One alert per physical defect: only tracks confirmed by this run are new
+                            results, new_ids = slot_tracker.update(results, frame_t)
+                            should_alert = bool(new_ids)
+                            summary = f"发现 {len(new_ids)} 个新异常目标 (ID {', '.join(f'#{i}' for i in new_ids)}), 跟踪中 {len(results)} 个"
+                        else:
+                            should_alert = len(results) > 0 and _now_wall - last_log_time.get(sid, 0) > log_cooldown
+                            summary = f"发现 {len(results)} 个异常目标"
                         camera_detections[sid] = results
 
-                        if len(results) > 0:
-                            last_log = last_log_time.get(sid, 0)
-                            if _now_wall - last_log > log_cooldown:
-                                ts = int(_now_wall * 1000)
-                                fname = f"auto_detect_slot{sid}_{ts}.jpg"
-                                fpath = os.path.join(HISTORY_DIR, fname)
-                                annotated = await asyncio.to_thread(draw_detections, frame.copy(), results)
-                                await asyncio.to_thread(cv2.imwrite, fpath, annotated)
-                                img_url = f"http://localhost:8000/history/{fname}"
-                                await broadcast_log(
-                                    f"实时告警 (Cam {sid})",
-                                    f"发现 {len(results)} 个异常目标 | Model={detector.model_name}/{detector.current_model_type} ({detector.device}) | conf={detector.conf}, imgsz={detector.imgsz}",
-                                    "medium",
-                                    attachment=img_url,
-                                )
-                                last_log_time[sid] = _now_wall
+                        if should_alert:
+                            ts = int(_now_wall * 1000)
+                            fname = f"auto_detect_slot{sid}_{ts}.jpg"
+                            fpath = os.path.join(HISTORY_DIR, fname)
+                            await save_annotated(fpath, display, _to_profile(results, src_shape, display.shape))
+                            img_url = f"http://localhost:8000/history/{fname}"
+                            await broadcast_log(
+                                f"实时告警 (Cam {sid})",
+                                f"{summary} | Model={detector.model_name}/{detector.current_model_type} ({detector.device}) | conf={detector.conf}, imgsz={detector.imgsz}",
+                                "medium",
+                                attachment=img_url,
+                            )
+                            last_log_time[sid] = _now_wall
                     except Exception as e:
                         print(f"[InferWorker {sid}] error: {e}")
                     finally:
                         infer_busy[sid] = False
 
-                asyncio.create_task(_run_infer(camera_id, frame_for_infer, now_wall))
+                asyncio.create_task(_run_infer(camera_id, frame_for_infer, now_wall, now_pc, roi_plan, st["infer_shape"], full_frame, auto_imgsz, roi_scale))
             # When not inferring, keep last detections (don't clear)
 
-            # Get current detections for encoding
-            dets_grid = camera_detections.get(camera_id, []) if (prelim_grid is not None) else []
-            dets_full = []
-            if needs_full and wants_detect and dets_grid and prelim_grid is not None:
-                sx = full_frame.shape[1] / float(prelim_grid.shape[1])
-                sy = full_frame.shape[0] / float(prelim_grid.shape[0])
-                dets_full = _scale_detections_xyxy(dets_grid, sx, sy)
+            # Current detections (capture coordinates) for encoding; tracked boxes are extrapolated to this frame
+            dets_src = Detections()
+            if wants_detect:
+                if tracker is not None and auto_inference:
+                    dets_src = tracker.predict(now_pc)
+                else:
+                    dets_src = camera_detections.get(camera_id) or Detections()
+            src_shape = st.get("infer_shape")
+            dets_grid = _to_profile(dets_src, src_shape, prelim_grid.shape) if prelim_grid is not None else Detections()
+            dets_full = _to_profile(dets_src, src_shape, full_frame.shape) if needs_full else Detections()
 
             # Batch all encoding into a single thread call (reuse prelim_grid to avoid duplicate resize)
+            encode_t0 = time.perf_counter()
             encoded, grid_frame = await asyncio.to_thread(
                 _batch_process_frame,
                 full_frame, grid_width,
@@ -690,6 +1081,7 @@ async def _camera_stream_worker(camera_id: int):
             )
 
             now_pc2 = time.perf_counter()
+            governor.observe("encode", (now_pc2 - encode_t0) * 1000.0)
             inst_stream = 0.0 if not last_stream_tick else 1.0 / max(1e-6, (now_pc2 - last_stream_tick))
             stream_fps_ema = inst_stream if stream_fps_ema <= 0 else (stream_fps_ema * 0.8 + inst_stream * 0.2)
             last_stream_tick = now_pc2
@@ -706,6 +1098,10 @@ async def _camera_stream_worker(camera_id: int):
                 st["stats"]["infer_fps"] = float(st["stats"].get("infer_fps_ema", 0.0))
                 st["stats"]["infer_ms"] = float(st["stats"].get("infer_ms_ema", 0.0))
                 st["stats"]["infer_updated_at"] = float(now_wall if should_infer else 0.0)
+                gate = change_gates.get(camera_id)
+                if gate is not None:
+                    st["stats"]["infer_skipped"] = int(gate.skipped)
+                    st["stats"]["infer_saved_ratio"] = float(gate.skipped / gate.checked) if gate.checked else 0.0
                 st["stats"]["updated_at"] = float(now_wall)
                 st["cond"].notify_all()
         except Exception as e:
@@ -716,6 +1112,8 @@ async def _camera_stream_worker(camera_id: int):
             await asyncio.sleep(0.1)
 
         elapsed = time.perf_counter() - loop_start_pc
+        if loop_work:
+            governor.observe("loop", elapsed * 1000.0)
         if elapsed < frame_duration:
             await asyncio.sleep(frame_duration - elapsed)
 
@@ -776,13 +1174,37 @@ async def _broadcast_fps_loop():
             if now - float(stats.get("infer_updated_at", 0.0)) > 2.0:
                 stats["infer_fps"] = 0.0
             cameras_payload[int(cam_id)] = stats
+        await _evaluate_governor()
         try:
-            await sio.emit("camera_fps", {"cameras": cameras_payload})
+            await sio.emit("camera_fps", {"cameras": cameras_payload, "governor": governor.stats()})
         except Exception:
             pass
         await asyncio.sleep(0.5)
 
 
+async def _evaluate_governor():
+    """Let the governor move one rung and announce it; runs on the fps broadcast tick."""
+    if detector is not None and detector.is_loaded():
+        governor.configure(imgsz_fixed=detector.input_size_fixed())
+    if not governor.evaluate():
+        return
+    g = governor.stats()
+    cause = g["trigger"] or {"infer_ms": 0.0, "encode_ms": 0.0, "loop_ms": 0.0}
+    prof = governor.profile(detector.imgsz if detector else 640)
+    if detector is not None and detector.is_loaded() and prof["imgsz"]:
+        # Compile the smaller input size before the next real-time frames need it
+        detector.prewarm(_expected_infer_shapes(), prof["imgsz"])
+    try:
+        await broadcast_log(
+            "性能",
+            f"延迟调节: 级别 {g['level']}/{g['max_level']} ({g['rung']}) | 推理 {cause['infer_ms']:.0f}ms / 目标 {g['target_ms']:.0f}ms, 循环 {cause['loop_ms']:.0f}ms (编码 {cause['encode_ms']:.0f}ms) | "
+            f"推理间隔 {prof['inference_interval']}s, imgsz={prof['imgsz'] or (detector.imgsz if detector else '-')}, 推流 {prof['fps_limit']}fps, JPEG {prof['grid_quality']}/{prof['full_quality']}",
+            "info",
+        )
+    except Exception:
+        pass
+
+
 def _get_device_lock(camera_index: int) -> asyncio.Lock:
     global device_op_locks
     lock = device_op_locks.get(int(camera_index))
@@ -814,37 +1236,71 @@ async def get_status():
     status_data = {
         "model_loaded": detector.is_loaded() if detector else False,
         "model_type": detector.current_model_type if detector else "none", # Return actual loaded type
+        "engine": detector.engine_name if detector else "none",
+        "replicas": detector.pool_stats() if detector else [],
+        "async_pipeline": detector.supports_async() if detector else False,
+        "model_cache": detector.cache_stats() if detector else None,
+        "model_loading": model_reloading,
+        "ready": startup_state["state"] == "ready",
+        "startup": startup_state,
+        "governor": governor.stats() if governor else None,
+        "scheduler": scheduler.stats() if scheduler else None,
+        "cascade": cascade.stats() if cascade else None,
         "device": detector.device if detector else "unknown",
         "cameras": [],
     }
 
     for i in range(4):
         cam = cameras.get(i)
+        infer_shape = _slot_infer_shape(i)
+        mono = bool((stream_state.get(i) or {}).get("infer_mono"))
+        model_ready = bool(infer_shape and detector and detector.is_loaded())
         status_data["cameras"].append(
             {
                 "id": i,
                 "connected": cam.connected if cam else False,
                 "index": cam.index if cam else None,
+                "change_gate": change_gates[i].stats() if i in change_gates else None,
+                "tracker": trackers[i].stats() if i in trackers else None,
+                # Model input (h, w) this slot's real-time frames run at (aspect-matched export / letterbox)
+                "infer_input": list(detector.input_hw_for(infer_shape, mono=mono)) if model_ready else None,
+                # Mono8 slots run on a single-channel export of the model when one is installed
+                "mono": mono if infer_shape else None,
+                "infer_channels": detector.input_channels_for(mono) if model_ready else None,
             }
         )
     return status_data
 
 
+@app.get("/autotune")
+async def get_autotune():
+    return {**autotune_state, "settings": {k: v for k, v in (persisted_settings.get("autotune") or {}).items() if k != "result"}}
+
+
+@app.post("/autotune")
+async def run_autotune():
+    """Re-run the on-host autotune in the background; progress arrives as `autotune` events."""
+    if not detector or not detector.is_loaded():
+        return JSONResponse(status_code=503, content={"error": "Detector not loaded"})
+    if not _start_autotune():
+        return JSONResponse(status_code=409, content={"error": "Autotune already running"})
+    return {"status": "started"}
+
+
 # --- Camera Discovery & Management APIs ---
 
 @app.get("/models")
 async def list_models():
-    global detector
     try:
-        if not detector:
-            detector = DefectDetector()
-        models = detector.list_available_models()
+        # Discovery needs no loaded model, so this also answers before startup has created one
+        source = detector or DefectDetector(autoload=False)
+        models = source.list_available_models()
         return {
             "models": models,
             "default_model": "yolo26s",
-            "active_model_name": detector.model_name,
-            "active_model_type": detector.current_model_type,
-            "active_device": detector.device,
+            "active_model_name": source.model_name,
+            "active_model_type": source.current_model_type,
+            "active_device": source.device,
         }
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
@@ -893,7 +1349,8 @@ async def connect_camera(request: ConnectRequest, slot_id: int = Path(..., ge=0,
                 if cam.connected:
                     await asyncio.to_thread(cam.release)
 
-                camera_detections[slot_id] = []
+                camera_detections[slot_id] = Detections()
+                trackers[slot_id].reset()
                 st = stream_state.get(slot_id)
                 if st:
                     async with st["cond"]:
@@ -956,7 +1413,8 @@ async def disconnect_camera(slot_id: int = Path(..., ge=0, le=3)):
         if slot_id in cameras:
             async with sdk_op_lock:
                 await asyncio.to_thread(cameras[slot_id].release)
-            camera_detections[slot_id] = []
+            camera_detections[slot_id] = Detections()
+            trackers[slot_id].reset()
             infer_busy[slot_id] = False
             st = stream_state.get(slot_id)
             if st:
@@ -1002,7 +1460,7 @@ async def trigger_detect():
     """Manually trigger detection on all connected cameras"""
     global cameras, detector
     
-    if not detector:
+    if not detector or not detector.is_loaded():
         return JSONResponse(status_code=500, content={"error": "Detector not loaded"})
     
     connected = []
@@ -1024,38 +1482,65 @@ async def trigger_detect():
         await broadcast_log("手动检测", "未获取到有效帧", "medium")
         return {"message": "No valid frames"}
 
-    sem = asyncio.Semaphore(2)
-
-    async def _run_one(slot_id: int, frame):
-        async with sem:
-            t0 = time.perf_counter()
-            results, annotated_frame = await asyncio.to_thread(detector.predict, frame)
-            dt_ms = (time.perf_counter() - t0) * 1000.0
-
-            det_count = len(results)
-            ts = time.time_ns()
-            filename = f"manual_trigger_slot{slot_id}_{ts}.jpg"
-            filepath = os.path.join(HISTORY_DIR, filename)
-            await asyncio.to_thread(cv2.imwrite, filepath, annotated_frame)
-            image_url = f"http://localhost:8000/history/{filename}"
+    # Slots with tiling enabled are cut into overlapping tiles of the raw frame so small
+    # defects survive; all tiles and whole frames share one batched pass
+    tiling_cfg = persisted_settings.get("tiling", {})
+    tiling = []
+    for slot_id, _ in frames:
+        cfg = tiling_cfg.get(str(slot_id), {})
+        tiling.append((cfg.get("tile_size", 640), cfg.get("overlap", 0.2)) if cfg.get("enabled") else None)
+
+    plans = [slot_rois[s].plan(f.shape) if s in slot_rois else None for s, f in frames]
+
+    def _detect():
+        inputs = [plan.prepare(f) if plan else f for plan, (_, f) in zip(plans, frames)]
+        outputs, tiles = detector.predict_tiled(inputs, tiling)
+        return [plan.restore(d) if plan else d for plan, d in zip(plans, outputs)], tiles
+
+    t0 = time.perf_counter()
+    # Manual triggers go ahead of queued uploads and real-time frames
+    outputs, tiles = await _run_inference("manual", _detect)
+    if scheduler is not None:
+        for (slot_id, _), res in zip(frames, outputs):
+            scheduler.note_detections(slot_id, len(res))
+    dt_ms = (time.perf_counter() - t0) * 1000.0
+    tiles_per_sec = tiles / max(1e-6, dt_ms / 1000.0)
+    tile_note = f", tiles={tiles} ({tiles_per_sec:.1f} tiles/s)" if tiles else ""
+
+    async def _run_one(slot_id: int, frame, results):
+        det_count = len(results)
+        ts = time.time_ns()
+        filename = f"manual_trigger_slot{slot_id}_{ts}.jpg"
+        filepath = os.path.join(HISTORY_DIR, filename)
+        await save_annotated(filepath, frame, results)
+        image_url = f"http://localhost:8000/history/{filename}"
 
-            msg_type = "high" if det_count > 0 else "info"
-            await broadcast_log(
-                f"手动抓拍 (Slot {slot_id})",
-                f"耗时 {dt_ms:.1f}ms, 检测到 {det_count} 个目标 | Model={detector.model_name}/{detector.current_model_type} ({detector.device}) | conf={detector.conf}, imgsz={detector.imgsz}",
-                msg_type,
-                attachment=image_url,
-            )
+        msg_type = "high" if det_count > 0 else "info"
+        await broadcast_log(
+            f"手动抓拍 (Slot {slot_id})",
+            f"耗时 {dt_ms:.1f}ms (batch={len(frames)}{tile_note}), 检测到 {det_count} 个目标 | Model={detector.model_name}/{detector.current_model_type} ({detector.device}) | conf={detector.conf}, imgsz={detector.imgsz}",
+            msg_type,
+            attachment=image_url,
+        )
 
-            return {"slot": slot_id, "detections": det_count, "image_url": image_url}
+        return {"slot": slot_id, "detections": det_count, "boxes": results.to_list(), "image_url": image_url}
 
-    results_summary = [r for r in await asyncio.gather(*[_run_one(s, f) for s, f in frames]) if r]
+    results_summary = [
+        r
+        for r in await asyncio.gather(*[_run_one(s, f, res) for (s, f), res in zip(frames, outputs)])
+        if r
+    ]
     
     if not results_summary:
         await broadcast_log("手动检测", "未发现活跃的摄像头连接", "medium")
         return {"message": "No active cameras"}
         
-    return {"message": "Detection completed", "results": results_summary}
+    return {
+        "message": "Detection completed",
+        "results": results_summary,
+        "tiles": tiles,
+        "tiles_per_sec": round(tiles_per_sec, 1),
+    }
 
 
 # --- Logs and Settings ---
@@ -1115,6 +1600,22 @@ class SettingsModel(BaseModel):
     model_name: str = "yolo26s"
     camera_params: Dict[str, Dict] = {}
     scene_mode: str | None = None
+    inference_engine: str | None = None # auto, native, ultralytics
+    replicas: int | None = None
+    intra_op_threads: int | None = None
+    replica_dispatch: str | None = None # least_loaded, round_robin
+    replica_mode: str | None = None # thread, process
+    openvino_async: bool | None = None
+    async_requests: int | None = None # 0 = runtime optimum
+    tiling: Dict[str, Dict] = {} # per slot: enabled, tile_size, overlap
+    roi: Dict[str, Dict] = {} # per slot: enabled, mode (bbox/packed), regions
+    change_gate: Dict | None = None # enabled, threshold, refresh_s
+    model_cache_mb: int | None = None # LRU cap for warmed models kept in memory
+    autotune: Dict | None = None # on_first_start, budget_ms, imgsz_options, threads_options, runs, formats
+    governor: Dict | None = None # enabled, target_ms, down_after_s, up_after_s
+    tracker: Dict | None = None # enabled, detect_every, high_conf, match_iou, min_hits, max_misses
+    scheduler: Dict | None = None # auto_deadline_s, idle_factor, active_window_s, active_weight, max_wait_ms
+    cascade: Dict | None = None # enabled, screen_model, screen_conf, mode (frame/region)
 
 
 @app.get("/config/settings")
@@ -1128,6 +1629,7 @@ async def get_settings():
         settings["active_model_type"] = detector.current_model_type
         settings["active_device"] = detector.device
         settings["active_model_name"] = detector.model_name
+        settings["active_engine"] = detector.engine_name
 
     if isinstance(settings.get("camera_params"), dict):
         for slot_id, cam in cameras.items():
@@ -1168,9 +1670,58 @@ async def set_scene(request: SceneRequest):
     return {"status": "updated", "scene_mode": mode}
 
 
+def _model_progress_reporter(loop, request: str):
+    """Progress callback for DefectDetector.reload_model that emits `model_load` over Socket.IO."""
+
+    def _report(stage: str, fraction: float, detail: str = ""):
+        payload = {"request": request, "stage": stage, "progress": round(float(fraction), 2), "detail": detail}
+        asyncio.run_coroutine_threadsafe(sio.emit("model_load", payload), loop)
+
+    return _report
+
+
+async def _reload_model_in_background(target_type: str, target_name: str, force: bool):
+    global scheduler, model_reloading
+    request = f"{target_name}/{target_type}"
+    async with model_reload_lock:
+        model_reloading = True
+        first_model = not detector.is_loaded()
+        await broadcast_log(
+            "配置",
+            f"开始切换模型: request=({request}) | current={detector.model_name}/{detector.current_model_type} ({detector.device})",
+            "medium",
+        )
+        reporter = _model_progress_reporter(asyncio.get_running_loop(), request)
+        try:
+            success, msg = await asyncio.to_thread(detector.reload_model, target_type, target_name, force, reporter)
+        except Exception as e:
+            success, msg = False, str(e)
+            await sio.emit("model_load", {"request": request, "stage": "failed", "progress": 1.0, "detail": msg})
+        finally:
+            model_reloading = False
+        if success:
+            if scheduler is not None:
+                # Match worker threads and batch size to the (possibly resized) replica pool
+                scheduler.resize(*_scheduler_shape())
+            for gate in change_gates.values():
+                gate.reset()
+
+    if success:
+        await broadcast_log(
+            "配置",
+            f"模型已切换: name={detector.model_name}, type={detector.current_model_type}, engine={detector.engine_name}, replicas={len(detector.replicas)}, device={detector.device} | request=({request}) | {msg}",
+            "medium",
+        )
+        if first_model and cascade is not None and cascade.enabled:
+            # The startup load failed, so the screening model was never loaded either
+            await _apply_cascade()
+    else:
+        await broadcast_log("错误", f"切换失败: {msg} | 当前模型仍为 {detector.model_name}/{detector.current_model_type}", "high")
+
+
 @app.post("/config/settings")
 async def update_settings(settings: SettingsModel):
-    global log_cooldown, persisted_settings, model_reload_lock, model_reloading
+    global log_cooldown, persisted_settings, model_reload_lock, model_reload_task, slot_rois
     
     # Update log interval
     log_cooldown = float(settings.log_interval)
@@ -1182,6 +1733,22 @@ async def update_settings(settings: SettingsModel):
     persisted_settings["imgsz"] = int(settings.imgsz)
     if settings.scene_mode in ("day", "night"):
         persisted_settings["scene_mode"] = settings.scene_mode
+    if settings.inference_engine in ("auto", "native", "ultralytics"):
+        persisted_settings["inference_engine"] = settings.inference_engine
+    if settings.replicas is not None:
+        persisted_settings["replicas"] = max(1, int(settings.replicas))
+    if settings.intra_op_threads is not None:
+        persisted_settings["intra_op_threads"] = max(0, int(settings.intra_op_threads))
+    if settings.replica_dispatch in ("least_loaded", "round_robin"):
+        persisted_settings["replica_dispatch"] = settings.replica_dispatch
+    if settings.replica_mode in ("thread", "process"):
+        persisted_settings["replica_mode"] = settings.replica_mode
+    if settings.openvino_async is not None:
+        persisted_settings["openvino_async"] = bool(settings.openvino_async)
+    if settings.async_requests is not None:
+        persisted_settings["async_requests"] = max(0, int(settings.async_requests))
+    if settings.model_cache_mb is not None:
+        persisted_settings["model_cache_mb"] = max(0, int(settings.model_cache_mb))
 
     if isinstance(settings.camera_params, dict) and settings.camera_params:
         if not isinstance(persisted_settings.get("camera_params"), dict):
@@ -1200,6 +1767,102 @@ async def update_settings(settings: SettingsModel):
                 if mode in ("auto", "manual"):
                     persisted_settings["camera_params"][slot_key]["exposure_mode"] = mode
 
+    if isinstance(settings.change_gate, dict):
+        gate_cfg = dict(persisted_settings.get("change_gate") or default_settings()["change_gate"])
+        try:
+            if "enabled" in settings.change_gate:
+                gate_cfg["enabled"] = bool(settings.change_gate["enabled"])
+            if "threshold" in settings.change_gate:
+                gate_cfg["threshold"] = max(0.0, float(settings.change_gate["threshold"]))
+            if "refresh_s" in settings.change_gate:
+                gate_cfg["refresh_s"] = max(0.0, float(settings.change_gate["refresh_s"]))
+        except (TypeError, ValueError):
+            pass
+        persisted_settings["change_gate"] = gate_cfg
+        for gate in change_gates.values():
+            gate.configure(**gate_cfg)
+    # Detections cached by the gates may be stale under new conf / model / ROI
+    for gate in change_gates.values():
+        gate.reset()
+
+    if isinstance(settings.autotune, dict):
+        try:
+            persisted_settings["autotune"] = normalize_autotune(
+                persisted_settings.get("autotune") or default_settings()["autotune"], settings.autotune
+            )
+        except (TypeError, ValueError):
+            pass
+
+    if isinstance(settings.governor, dict):
+        try:
+            persisted_settings["governor"] = normalize_governor(
+                persisted_settings.get("governor") or default_settings()["governor"], settings.governor
+            )
+        except (TypeError, ValueError):
+            pass
+        governor.configure(**persisted_settings["governor"])
+
+    if isinstance(settings.tracker, dict):
+        try:
+            persisted_settings["tracker"] = normalize_tracker(
+                persisted_settings.get("tracker") or default_settings()["tracker"], settings.tracker
+            )
+        except (TypeError, ValueError):
+            pass
+        for slot_tracker in trackers.values():
+            slot_tracker.configure(**persisted_settings["tracker"])
+            slot_tracker.reset()
+
+    if isinstance(settings.scheduler, dict):
+        try:
+            persisted_settings["scheduler"] = normalize_scheduler(
+                persisted_settings.get("scheduler") or default_settings()["scheduler"], settings.scheduler
+            )
+        except (TypeError, ValueError):
+            pass
+        if scheduler is not None:
+            scheduler.configure(**persisted_settings["scheduler"])
+
+    cascade_changed = False
+    if isinstance(settings.cascade, dict):
+        try:
+            persisted_settings["cascade"] = normalize_cascade(
+                persisted_settings.get("cascade") or default_settings()["cascade"], settings.cascade
+            )
+        except (TypeError, ValueError):
+            pass
+        if cascade is not None:
+            cascade.configure(**persisted_settings["cascade"])
+            cascade_changed = True
+
+    if isinstance(settings.roi, dict) and settings.roi:
+        roi_cfg = persisted_settings.setdefault("roi", default_settings()["roi"])
+        for slot_key, v in settings.roi.items():
+            if slot_key in roi_cfg and isinstance(v, dict):
+                updated = normalize_roi(roi_cfg[slot_key], v)
+                if updated != roi_cfg[slot_key]:
+                    # Tracks and the gate reference were built on the old crop: start the slot over
+                    slot_id = int(slot_key)
+                    camera_detections[slot_id] = Detections()
+                    if slot_id in trackers:
+                        trackers[slot_id].reset()
+                    if slot_id in change_gates:
+                        change_gates[slot_id].reset()
+                roi_cfg[slot_key] = updated
+        slot_rois = build_slot_rois(roi_cfg)
+        if detector:
+            # New ROI crops change the input aspect; compile those shapes before frames arrive
+            detector.prewarm(_expected_infer_shapes())
+
+    if isinstance(settings.tiling, dict) and settings.tiling:
+        tiling = persisted_settings.setdefault("tiling", default_settings()["tiling"])
+        for slot_key, v in settings.tiling.items():
+            if slot_key in tiling and isinstance(v, dict):
+                try:
+                    tiling[slot_key] = normalize_tiling(tiling[slot_key], v)
+                except (TypeError, ValueError):
+                    pass
+
     save_settings(persisted_settings)
     
     if detector:
@@ -1224,31 +1887,36 @@ async def update_settings(settings: SettingsModel):
                 needs_reload = detector.current_model_type not in ("onnx", "pt")
         else:
             needs_reload = (target_type != detector.current_model_type) or (str(target_name) != str(detector.model_name))
+
+        await asyncio.to_thread(detector.configure_cache, settings.model_cache_mb)
+        engine_changed = False
+        if settings.inference_engine in ("auto", "native", "ultralytics") and settings.inference_engine != detector.engine_preference:
+            detector.engine_preference = settings.inference_engine
+            engine_changed = True
+            needs_reload = True
+        if detector.configure_pool(settings.replicas, settings.intra_op_threads, settings.replica_dispatch, settings.replica_mode):
+            engine_changed = True
+            needs_reload = True
+        if detector.configure_async(
+            bool(persisted_settings.get("openvino_async", False)),
+            int(persisted_settings.get("async_requests", 0)),
+        ):
+            engine_changed = True
+            needs_reload = True
         
+        await asyncio.to_thread(detector.update_settings, conf=settings.conf, imgsz=settings.imgsz)
+
+        reload_state = None
         if needs_reload:
             if model_reload_lock is None:
                 model_reload_lock = asyncio.Lock()
-            async with model_reload_lock:
-                model_reloading = True
-                await broadcast_log(
-                    "配置",
-                    f"开始切换模型: request=({target_name}/{target_type}) | current={detector.model_name}/{detector.current_model_type} ({detector.device})",
-                    "medium",
-                )
-                try:
-                    success, msg = await asyncio.to_thread(detector.reload_model, target_type, target_name)
-                finally:
-                    model_reloading = False
-            if success:
-                await broadcast_log(
-                    "配置",
-                    f"模型已切换: name={detector.model_name}, type={detector.current_model_type}, device={detector.device} | request=({target_name}/{target_type}) | {msg}",
-                    "medium",
-                )
-            else:
-                await broadcast_log("错误", f"切换失败: {msg}", "high")
-
-        await asyncio.to_thread(detector.update_settings, conf=settings.conf, imgsz=settings.imgsz)
+            # Load in the background; the response returns at once and the current
+            # model keeps serving until the replacement is swapped in
+            model_reload_task = asyncio.create_task(_reload_model_in_background(target_type, target_name, engine_changed))
+            reload_state = "started"
+        if cascade_changed or (engine_changed and cascade is not None and cascade.enabled):
+            # Queued behind any model reload; an engine / pool change rebuilds the screen detector too
+            asyncio.create_task(_apply_cascade(force=engine_changed))
 
         applied = []
         for slot_id, cam in cameras.items():
@@ -1273,10 +1941,18 @@ async def update_settings(settings: SettingsModel):
             f"系统参数已更新: Conf={settings.conf}, Size={settings.imgsz}, Interval={log_cooldown}s | ActiveModel={detector.model_name}/{detector.current_model_type} ({detector.device})",
             "medium",
         )
-        return {"status": "updated", "conf": detector.conf, "imgsz": detector.imgsz, "log_interval": log_cooldown}
+        return {
+            "status": "updated",
+            "conf": detector.conf,
+            "imgsz": detector.imgsz,
+            "log_interval": log_cooldown,
+            "model_reload": reload_state,
+        }
     
     return JSONResponse(status_code=500, content={"error": "Detector not initialized"})
 
 
 if __name__ == "__main__":
+    # Process replicas spawn workers from this executable (PyInstaller builds included)
+    multiprocessing.freeze_support()
     uvicorn.run(final_app, host="127.0.0.1", port=8000, reload=False)
@@ -0,0 +1,157 @@
+import json
+import os
+import platform
+import threading
+import time
+from typing import Any, Dict, List
+
+MANIFEST_SUFFIX = ".manifest.json"
+
+
+def manifest_path(export_path: str) -> str:
+    """Manifest location for an export: a sibling file, also for OpenVINO directories."""
+    return export_path.rstrip("/\\") + MANIFEST_SUFFIX
+
+
+def write_manifest(export_path: str, info: Dict[str, Any]) -> str:
+    """Write the manifest for export_path atomically (the rename also bumps the dir mtime)."""
+    path = manifest_path(export_path)
+    data = {"file": os.path.basename(export_path.rstrip("/\\")), "host": platform.node(), "created_at": time.time()}
+    data.update(info)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def openvino_xml(export_dir: str) -> str | None:
+    """IR file of an OpenVINO export directory: best.xml, else <stem>.xml (Ultralytics names
+    it after the weights: yolo26n_openvino_model/yolo26n.xml), else its only .xml file."""
+    try:
+        names = [n for n in os.listdir(export_dir) if n.endswith(".xml")]
+    except OSError:
+        return None
+    stem = os.path.basename(export_dir.rstrip("/\\"))
+    if stem.endswith("_openvino_model"):
+        stem = stem[: -len("_openvino_model")]
+    for name in ("best.xml", f"{stem}.xml"):
+        if name in names:
+            return os.path.join(export_dir, name)
+    return os.path.join(export_dir, names[0]) if len(names) == 1 else None
+
+
+def _read_manifest(export_path: str) -> Dict[str, Any]:
+    try:
+        with open(manifest_path(export_path), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _variant(manifest: Dict[str, Any]) -> str | None:
+    """Derived export kind ("int8" for a quantized copy, "mono" for a single-channel input,
+    "rect" for a non-square one), None for a model's primary export.
+
+    Manifests written by export_model.py record it as "variant"; older ones are classified
+    by their input.
+    """
+    variant = manifest.get("variant")
+    if variant:
+        return str(variant)
+    if manifest.get("precision") == "int8":
+        return "int8"
+    if manifest.get("channels") == 1:
+        return "mono"
+    hw = manifest.get("input_hw")
+    if isinstance(hw, list) and len(hw) == 2 and hw[0] != hw[1]:
+        return "rect"
+    return None
+
+
+def _display_name(base: str) -> str:
+    # Legacy default export names map to the default model
+    return "yolo26s" if base == "best" else base
+
+
+class ModelRegistry:
+    """Exports in a models directory, scanned once and cached until the directory changes.
+
+    Each entry comes from the file itself plus its manifest (written by export_model.py):
+    name, type (pt / onnx / openvino), path, mtime, imgsz, input_hw (static exports),
+    channels (1 for single-channel exports), batch, dynamic, precision and the latency
+    measured on this host, plus variant for exports derived from a primary one (see
+    _variant). Files without a manifest fall back to the name / extension conventions.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cache: Dict[str, tuple] = {}
+
+    def entries(self, models_dir: str) -> List[Dict[str, Any]]:
+        try:
+            stamp = os.stat(models_dir).st_mtime_ns
+        except OSError:
+            return []
+        with self._lock:
+            cached = self._cache.get(models_dir)
+            if cached is not None and cached[0] == stamp:
+                return cached[1]
+        entries = self._scan(models_dir)
+        with self._lock:
+            self._cache[models_dir] = (stamp, entries)
+        return entries
+
+    def invalidate(self, models_dir: str | None = None):
+        with self._lock:
+            if models_dir is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(models_dir, None)
+
+    def _scan(self, models_dir: str) -> List[Dict[str, Any]]:
+        entries = []
+        try:
+            names = os.listdir(models_dir)
+        except OSError:
+            return entries
+        for fname in names:
+            full = os.path.join(models_dir, fname)
+            if fname.endswith(MANIFEST_SUFFIX) or fname.endswith(".tmp"):
+                continue
+            if os.path.isfile(full) and (fname.endswith(".pt") or fname.endswith(".onnx")):
+                base, ext = fname.rsplit(".", 1)
+                model_type = ext
+            elif os.path.isdir(full) and fname.endswith("_openvino_model") and openvino_xml(full):
+                base = fname[: -len("_openvino_model")]
+                model_type = "openvino"
+            else:
+                continue
+            manifest = _read_manifest(full)
+            try:
+                mtime = os.path.getmtime(full)
+            except OSError:
+                continue
+            entries.append(
+                {
+                    "name": str(manifest.get("name") or _display_name(base)),
+                    "file": fname,
+                    "base": base,
+                    "type": model_type,
+                    "path": os.path.abspath(full),
+                    "mtime": mtime,
+                    "imgsz": manifest.get("imgsz"),
+                    "input_hw": manifest.get("input_hw"),
+                    "channels": manifest.get("channels"),
+                    "batch": manifest.get("batch"),
+                    "dynamic": manifest.get("dynamic"),
+                    "precision": manifest.get("precision"),
+                    "latency_ms": manifest.get("latency_ms"),
+                    "variant": _variant(manifest),
+                    "manifest": bool(manifest),
+                }
+            )
+        # Newest first, so "latest export wins" lookups can take the first match
+        entries.sort(key=lambda e: e["mtime"], reverse=True)
+        return entries
@@ -0,0 +1,211 @@
+import threading
+
+import cv2
+import numpy as np
+
+from detections import Detections
+
+_FILL = 114  # same grey the letterbox pads with
+_PACK_GAP = 16  # grey gutter between packed crops so boxes cannot bridge two crops
+
+
+def _merge_boxes(boxes):
+    """Union overlapping (x0, y0, x1, y1) boxes until none overlap."""
+    boxes = [list(b) for b in boxes]
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(boxes)):
+            for j in range(i + 1, len(boxes)):
+                a, b = boxes[i], boxes[j]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    boxes[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                    del boxes[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return [tuple(b) for b in boxes]
+
+
+def _shelf_pack(sizes):
+    """Place (w, h) rectangles on shelves; returns [(px, py), ...] and the canvas (W, H)."""
+    order = sorted(range(len(sizes)), key=lambda i: -sizes[i][1])
+    total = sum((w + _PACK_GAP) * (h + _PACK_GAP) for w, h in sizes)
+    width = max(max(w for w, _ in sizes), int(np.sqrt(total) * 1.2))
+    positions = [None] * len(sizes)
+    x = y = shelf_h = 0
+    for i in order:
+        w, h = sizes[i]
+        if x and x + w > width:
+            x, y = 0, y + shelf_h + _PACK_GAP
+            shelf_h = 0
+        positions[i] = (x, y)
+        x += w + _PACK_GAP
+        shelf_h = max(shelf_h, h)
+    canvas_w = max(px + w for (px, _), (w, _) in zip(positions, sizes))
+    canvas_h = max(py + h for (_, py), (_, h) in zip(positions, sizes))
+    return positions, (canvas_w, canvas_h)
+
+
+class RoiPlan:
+    """A slot's ROI compiled for one frame size.
+
+    Regions are normalised [0, 1] points so one config serves the grid, full and raw
+    frames. mode "bbox" crops to the union bounding box; "packed" cuts one crop per
+    (merged) region and packs them onto a single grey canvas, so either way the
+    detector still sees exactly one image per frame.
+    """
+
+    def __init__(self, regions, mode, shape):
+        h, w = shape[:2]
+        self.shape = (h, w)
+        self.mask = np.zeros((h, w), dtype=np.uint8)
+        boxes = []
+        for region in regions:
+            pts = np.asarray(region["points"], dtype=np.float32) * np.array([w, h], dtype=np.float32)
+            pts = pts.round().astype(np.int32)
+            if region.get("type") == "rect":
+                (x0, y0), (x1, y1) = pts.min(axis=0), pts.max(axis=0)
+                pts = np.array([[x0, y0], [x1, y0], [x1, y1], [x0, y1]], dtype=np.int32)
+            cv2.fillPoly(self.mask, [pts], 1)
+            x0, y0 = np.clip(pts.min(axis=0), 0, [w, h])
+            x1, y1 = np.clip(pts.max(axis=0) + 1, 0, [w, h])
+            if x1 > x0 and y1 > y0:
+                boxes.append((int(x0), int(y0), int(x1), int(y1)))
+
+        if not boxes:
+            boxes = [(0, 0, w, h)]
+            self.mask[:] = 1
+        if mode == "packed":
+            boxes = _merge_boxes(boxes)
+        else:
+            boxes = [(min(b[0] for b in boxes), min(b[1] for b in boxes), max(b[2] for b in boxes), max(b[3] for b in boxes))]
+        self.crops = boxes
+        # Crops that contain non-ROI pixels get those pixels greyed out before inference
+        self.crop_masks = [
+            None if self.mask[y0:y1, x0:x1].all() else self.mask[y0:y1, x0:x1].astype(bool)
+            for x0, y0, x1, y1 in boxes
+        ]
+        if len(boxes) == 1:
+            self.positions, self.canvas_wh = [(0, 0)], (boxes[0][2] - boxes[0][0], boxes[0][3] - boxes[0][1])
+        else:
+            self.positions, self.canvas_wh = _shelf_pack([(x1 - x0, y1 - y0) for x0, y0, x1, y1 in boxes])
+        self.area_ratio = (self.canvas_wh[0] * self.canvas_wh[1]) / float(max(1, w * h))
+        # Canvas geometry per scale (see _layout), for prepare_scaled
+        self._layouts = {}
+
+    def _layout(self, scale):
+        """Canvas (w, h) and per crop (px, py, w, h, mask) with everything scaled by scale."""
+        layout = self._layouts.get(scale)
+        if layout is not None:
+            return layout
+        cw, ch = max(1, int(round(self.canvas_wh[0] * scale))), max(1, int(round(self.canvas_wh[1] * scale)))
+        placed = []
+        for (x0, y0, x1, y1), (px, py), mask in zip(self.crops, self.positions, self.crop_masks):
+            sx, sy = min(int(round(px * scale)), cw - 1), min(int(round(py * scale)), ch - 1)
+            sw = max(1, min(int(round((x1 - x0) * scale)), cw - sx))
+            sh = max(1, min(int(round((y1 - y0) * scale)), ch - sy))
+            if mask is not None:
+                mask = cv2.resize(mask.astype(np.uint8), (sw, sh), interpolation=cv2.INTER_NEAREST).astype(bool)
+            placed.append((sx, sy, sw, sh, mask))
+        if len(self._layouts) >= 4:
+            self._layouts.clear()
+        layout = self._layouts[scale] = ((cw, ch), placed)
+        return layout
+
+    def prepare(self, frame):
+        """The image the detector should see for this frame."""
+        if len(self.crops) == 1 and self.crop_masks[0] is None:
+            x0, y0, x1, y1 = self.crops[0]
+            return frame[y0:y1, x0:x1]
+        cw, ch = self.canvas_wh
+        canvas = np.full((ch, cw) + frame.shape[2:], _FILL, dtype=frame.dtype)
+        for (x0, y0, x1, y1), (px, py), mask in zip(self.crops, self.positions, self.crop_masks):
+            dst = canvas[py:py + (y1 - y0), px:px + (x1 - x0)]
+            src = frame[y0:y1, x0:x1]
+            if mask is None:
+                dst[...] = src
+            else:
+                np.copyto(dst, src, where=mask if src.ndim == 2 else mask[..., None])
+        return canvas
+
+    def prepare_scaled(self, frame, input_hw):
+        """(image, scale) for a detector whose input is input_hw (h, w).
+
+        Packed / masked crops are resized straight onto a canvas at the scale the detector
+        would letterbox the full-size canvas to, so the frame is resized once here and the
+        letterbox only copies it. A plain crop stays a view at scale 1: the letterbox is
+        then its one resize. Pass scale to restore().
+        """
+        cw, ch = self.canvas_wh
+        scale = min(1.0, input_hw[0] / ch, input_hw[1] / cw)
+        if scale >= 1.0 or (len(self.crops) == 1 and self.crop_masks[0] is None):
+            return self.prepare(frame), 1.0
+        (cw, ch), placed = self._layout(scale)
+        canvas = np.full((ch, cw) + frame.shape[2:], _FILL, dtype=frame.dtype)
+        for (x0, y0, x1, y1), (px, py, sw, sh, mask) in zip(self.crops, placed):
+            small = cv2.resize(frame[y0:y1, x0:x1], (sw, sh), interpolation=cv2.INTER_LINEAR).reshape((sh, sw) + frame.shape[2:])
+            dst = canvas[py:py + sh, px:px + sw]
+            if mask is None:
+                dst[...] = small
+            else:
+                np.copyto(dst, small, where=mask if small.ndim == 2 else mask[..., None])
+        return canvas, scale
+
+    def restore(self, dets: Detections, scale: float = 1.0) -> Detections:
+        """Map detections on the prepared image (at scale, see prepare_scaled) back to
+        frame coordinates, dropping any whose centre falls outside the ROI."""
+        if not len(dets):
+            return dets
+        dets = dets.scaled(1.0 / scale, 1.0 / scale)
+        crops = np.asarray(self.crops, dtype=np.float32)
+        pos = np.asarray(self.positions, dtype=np.float32)
+        size = crops[:, 2:] - crops[:, :2]
+        centers = (dets.xyxy[:, :2] + dets.xyxy[:, 2:]) / 2
+        # (n, k) membership of each detection centre in each packed crop
+        rel = centers[:, None, :] - pos[None, :, :]
+        inside = ((rel >= 0) & (rel < size[None, :, :])).all(axis=2)
+        hit = inside.any(axis=1)
+        which = inside.argmax(axis=1)[hit]
+        shift = crops[which, :2] - pos[which]
+        xyxy = dets.xyxy[hit] + np.concatenate([shift, shift], axis=1)
+        lo = np.concatenate([crops[which, :2], crops[which, :2]], axis=1)
+        hi = np.concatenate([crops[which, 2:], crops[which, 2:]], axis=1)
+        xyxy = np.clip(xyxy, lo, hi)
+        out = Detections(xyxy, dets.conf[hit], dets.cls[hit], dets.names)
+        cx = ((xyxy[:, 0] + xyxy[:, 2]) / 2).astype(int).clip(0, self.shape[1] - 1)
+        cy = ((xyxy[:, 1] + xyxy[:, 3]) / 2).astype(int).clip(0, self.shape[0] - 1)
+        return out[self.mask[cy, cx].astype(bool)]
+
+
+class SlotRoi:
+    """ROI config for one slot with RoiPlans cached per frame size."""
+
+    def __init__(self, cfg):
+        self.regions = [r for r in (cfg.get("regions") or []) if isinstance(r, dict) and r.get("points")]
+        self.mode = "packed" if cfg.get("mode") == "packed" else "bbox"
+        self._plans = {}
+        self._lock = threading.Lock()
+
+    def plan(self, shape) -> RoiPlan:
+        key = tuple(shape[:2])
+        plan = self._plans.get(key)
+        if plan is None:
+            with self._lock:
+                plan = self._plans.get(key)
+                if plan is None:
+                    plan = self._plans[key] = RoiPlan(self.regions, self.mode, key)
+        return plan
+
+
+def build_slot_rois(roi_settings):
+    """{slot_id: SlotRoi} for every slot with an enabled, non-empty ROI."""
+    rois = {}
+    for key, cfg in (roi_settings or {}).items():
+        if isinstance(cfg, dict) and cfg.get("enabled") and cfg.get("regions"):
+            try:
+                rois[int(key)] = SlotRoi(cfg)
+            except (TypeError, ValueError):
+                continue
+    return rois
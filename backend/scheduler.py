@@ -0,0 +1,300 @@
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from detector import _resolve
+
+# Highest priority first: an operator's manual trigger, then uploaded images, then real-time frames
+PRIORITIES = ("manual", "upload", "auto")
+_EMA_ALPHA = 0.2
+_WAIT_WINDOW = 256  # recent waits kept per class for the p95
+
+
+class _Job:
+    __slots__ = ("cls", "slot", "fn", "frame", "imgsz", "future", "enqueued", "deadline")
+
+    def __init__(self, cls, slot=None, fn=None, frame=None, imgsz=None, deadline=None):
+        self.cls = cls
+        self.slot = slot
+        self.fn = fn
+        self.frame = frame
+        self.imgsz = imgsz
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+        self.deadline = deadline
+
+
+class _ClassStats:
+    def __init__(self):
+        self.submitted = 0
+        self.completed = 0
+        self.dropped = 0
+        self.failed = 0
+        self.wait_ms_ema = 0.0
+        self.run_ms_ema = 0.0
+        self.waits = deque(maxlen=_WAIT_WINDOW)
+
+    def started(self, wait_ms):
+        self.waits.append(wait_ms)
+        self.wait_ms_ema = wait_ms if self.wait_ms_ema <= 0 else (self.wait_ms_ema * (1.0 - _EMA_ALPHA) + wait_ms * _EMA_ALPHA)
+
+    def finished(self, run_ms, ok=True):
+        if ok:
+            self.completed += 1
+        else:
+            self.failed += 1
+        self.run_ms_ema = run_ms if self.run_ms_ema <= 0 else (self.run_ms_ema * (1.0 - _EMA_ALPHA) + run_ms * _EMA_ALPHA)
+
+
+class InferenceScheduler:
+    """Single entry point for all inference, ordered by priority class with per-slot fairness.
+
+    Manual triggers and uploads are callables run as-is, in FIFO order within their
+    class. Real-time frames are queued per slot; when a worker is free it takes up to
+    max_batch slots with the least virtual time (a slot's virtual time grows by
+    1 / weight per served frame, weight active_weight for slots that reported defects
+    within active_window_s) and runs them as one batched pass. While fewer frames than
+    max_batch are queued and other known slots have none, the batch is held for up to
+    max_wait_ms after its oldest frame arrived so their next frames can join. A newer frame from a
+    slot replaces its queued one, and frames past their deadline are dropped. Both
+    resolve the future with None, meaning keep the previous detections.
+
+    One worker thread per detector replica, so at most one pass per replica is in
+    flight and a manual trigger waits for a single pass, never for a backlog. With an
+    active cascade (cascade.CascadeDetector), real-time batches are screened by its small
+    model first; manual triggers and uploads always run on the detector itself.
+    """
+
+    def __init__(
+        self,
+        detector,
+        workers: int = 1,
+        max_batch: int = 4,
+        auto_deadline_s: float = 1.0,
+        idle_factor: float = 2.0,
+        active_window_s: float = 10.0,
+        active_weight: float = 2.0,
+        max_wait_ms: float = 5.0,
+    ):
+        self.detector = detector
+        self.cascade = None
+        self._cond = threading.Condition()
+        self._fifo = {"manual": deque(), "upload": deque()}
+        self._auto = {}  # slot -> queued _Job (latest frame only)
+        self._vtime = {}
+        self._last_defect = {}
+        self._stats = {c: _ClassStats() for c in PRIORITIES}
+        self._running = {c: 0 for c in PRIORITIES}
+        self._threads = []
+        self._stopping = False
+        self.max_batch = max(1, int(max_batch))
+        self.configure(auto_deadline_s, idle_factor, active_window_s, active_weight, max_wait_ms)
+        self.resize(workers, max_batch)
+
+    def configure(self, auto_deadline_s=None, idle_factor=None, active_window_s=None, active_weight=None, max_wait_ms=None):
+        with self._cond:
+            if auto_deadline_s is not None:
+                self.auto_deadline_s = max(0.0, float(auto_deadline_s))
+            if idle_factor is not None:
+                self.idle_factor = max(1.0, float(idle_factor))
+            if active_window_s is not None:
+                self.active_window_s = max(0.0, float(active_window_s))
+            if active_weight is not None:
+                self.active_weight = max(1.0, float(active_weight))
+            if max_wait_ms is not None:
+                self.max_wait_ms = max(0.0, float(max_wait_ms))
+            self._cond.notify_all()
+
+    def resize(self, workers: int, max_batch: int | None = None):
+        """Match worker threads to the replica pool (after a model reload)."""
+        workers = max(1, int(workers))
+        with self._cond:
+            if max_batch is not None:
+                self.max_batch = max(1, int(max_batch))
+            self._threads = [t for t in self._threads if t.is_alive()]
+            extra = len(self._threads) - workers
+            self._retire = max(0, extra)
+            for i in range(max(0, -extra)):
+                t = threading.Thread(target=self._loop, name=f"InferScheduler-{len(self._threads)}", daemon=True)
+                self._threads.append(t)
+                t.start()
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._stopping = True
+            pending = list(self._fifo["manual"]) + list(self._fifo["upload"]) + list(self._auto.values())
+            self._fifo["manual"].clear()
+            self._fifo["upload"].clear()
+            self._auto.clear()
+            self._cond.notify_all()
+        for job in pending:
+            _resolve(job.future, None)
+
+    # --- submission -------------------------------------------------------
+
+    def submit(self, cls: str, fn) -> Future:
+        """Run fn() (a manual trigger or upload job) at cls priority; the Future holds its return value."""
+        if cls not in self._fifo:
+            raise ValueError(f"unknown priority class: {cls}")
+        job = _Job(cls, fn=fn)
+        with self._cond:
+            self._stats[cls].submitted += 1
+            self._fifo[cls].append(job)
+            self._cond.notify()
+        return job.future
+
+    def submit_frame(self, slot: int, frame, imgsz=None) -> Future:
+        """Queue a real-time frame; the Future resolves to its Detections, or None if it was skipped."""
+        now = time.perf_counter()
+        job = _Job("auto", slot=slot, frame=frame, imgsz=imgsz, deadline=(now + self.auto_deadline_s) if self.auto_deadline_s else None)
+        with self._cond:
+            stats = self._stats["auto"]
+            stats.submitted += 1
+            old = self._auto.get(slot)
+            if old is not None:
+                stats.dropped += 1
+                _resolve(old.future, None)
+            if slot not in self._vtime:
+                # Newcomers start level with the least-served slot instead of owing it a backlog
+                self._vtime[slot] = min(self._vtime.values(), default=0.0)
+            self._auto[slot] = job
+            self._cond.notify()
+        return job.future
+
+    # --- activity-based rates ---------------------------------------------
+
+    def note_detections(self, slot: int, count: int, now: float | None = None):
+        """Record a slot's detection result; slots with recent defects are served more often."""
+        if count > 0:
+            with self._cond:
+                self._last_defect[slot] = time.perf_counter() if now is None else now
+
+    def _active(self, slot, now):
+        seen = self._last_defect.get(slot)
+        return seen is not None and now - seen <= self.active_window_s
+
+    def interval(self, slot: int, base_s: float, now: float | None = None) -> float:
+        """Real-time inference interval for slot: base_s while it is active, idle_factor x base_s otherwise."""
+        now = time.perf_counter() if now is None else now
+        with self._cond:
+            return base_s if self._active(slot, now) else base_s * self.idle_factor
+
+    # --- workers ------------------------------------------------------------
+
+    def _take_locked(self, now):
+        """Next unit of work: ("fn", job), ("batch", [jobs]) or ("wait", seconds); None when idle."""
+        for cls in ("manual", "upload"):
+            if self._fifo[cls]:
+                return "fn", self._fifo[cls].popleft()
+        if not self._auto:
+            return None
+        for slot, job in list(self._auto.items()):
+            if job.deadline is not None and now > job.deadline:
+                del self._auto[slot]
+                self._stats["auto"].dropped += 1
+                _resolve(job.future, None)
+        if not self._auto:
+            return None
+        # Gather window: hold a partial batch briefly while other known slots may still send a frame
+        expected = min(self.max_batch, len(self._vtime))
+        if len(self._auto) < expected and self.max_wait_ms > 0:
+            remaining = min(job.enqueued for job in self._auto.values()) + self.max_wait_ms / 1000.0 - now
+            if remaining > 0:
+                return "wait", remaining
+        slots = sorted(self._auto, key=lambda s: self._vtime.get(s, 0.0))[:self.max_batch]
+        batch = []
+        for slot in slots:
+            batch.append(self._auto.pop(slot))
+            weight = self.active_weight if self._active(slot, now) else 1.0
+            self._vtime[slot] = self._vtime.get(slot, 0.0) + 1.0 / weight
+        return "batch", batch
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopping:
+                        return
+                    if self._retire > 0:
+                        self._retire -= 1
+                        return
+                    work = self._take_locked(time.perf_counter())
+                    if work is None:
+                        self._cond.wait()
+                    elif work[0] == "wait":
+                        self._cond.wait(work[1])
+                    else:
+                        break
+                kind, item = work
+                jobs = [item] if kind == "fn" else item
+                cls = jobs[0].cls
+                start = time.perf_counter()
+                for job in jobs:
+                    self._stats[cls].started((start - job.enqueued) * 1000.0)
+                self._running[cls] += 1
+
+            ok = True
+            try:
+                if kind == "fn":
+                    _resolve(item.future, item.fn())
+                else:
+                    self._run_batch(item)
+            except Exception as e:
+                ok = False
+                for job in jobs:
+                    _resolve(job.future, error=e)
+            finally:
+                run_ms = (time.perf_counter() - start) * 1000.0
+                with self._cond:
+                    self._running[cls] -= 1
+                    for _ in jobs:
+                        self._stats[cls].finished(run_ms, ok)
+
+    def _run_batch(self, jobs):
+        detector = self.detector
+        cascade = self.cascade
+        if cascade is not None and cascade.active():
+            detector = cascade
+        elif detector.supports_async():
+            # OpenVINO async queue: submit every frame, then wait, so the requests overlap
+            pending = [(job, detector.submit(job.frame, job.imgsz)) for job in jobs]
+            for job, fut in pending:
+                _resolve(job.future, fut.result() if fut is not None else detector.predict(job.frame, job.imgsz))
+            return
+        groups = {}
+        for job in jobs:
+            groups.setdefault(job.imgsz, []).append(job)
+        for imgsz, group in groups.items():
+            outputs = detector.predict_batch([job.frame for job in group], imgsz)
+            for job, detections in zip(group, outputs):
+                _resolve(job.future, detections)
+
+    def stats(self):
+        with self._cond:
+            now = time.perf_counter()
+            depth = {"manual": len(self._fifo["manual"]), "upload": len(self._fifo["upload"]), "auto": len(self._auto)}
+            out = {
+                "workers": len([t for t in self._threads if t.is_alive()]),
+                "max_batch": self.max_batch,
+                "max_wait_ms": self.max_wait_ms,
+                "active_slots": sorted(s for s in self._last_defect if self._active(s, now)),
+                "classes": {},
+            }
+            for cls in PRIORITIES:
+                s = self._stats[cls]
+                waits = sorted(s.waits)
+                out["classes"][cls] = {
+                    "queued": depth[cls],
+                    "running": self._running[cls],
+                    "submitted": s.submitted,
+                    "completed": s.completed,
+                    "dropped": s.dropped,
+                    "failed": s.failed,
+                    "wait_ms": round(s.wait_ms_ema, 2),
+                    "wait_p95_ms": round(waits[max(0, math.ceil(0.95 * len(waits)) - 1)], 2) if waits else 0.0,
+                    "run_ms": round(s.run_ms_ema, 2),
+                }
+            return out
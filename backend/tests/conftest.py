@@ -0,0 +1,45 @@
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+@pytest.fixture
+def tiny_onnx(tmp_path):
+    """Writes a stand-in end2end YOLO export: a fixed (batch, channels, size, size) input and
+    a (batch, 300, 6) output with one box per image, so graphs build without Ultralytics.
+    size is a side length or (h, w)."""
+    torch = pytest.importorskip("torch")
+    onnx = pytest.importorskip("onnx")
+    pytest.importorskip("onnxruntime")
+
+    class _Head(torch.nn.Module):
+        def __init__(self, h, w):
+            super().__init__()
+            # One box over the input's top-left quarter, conf 0.9, class 0; the rest empty
+            rows = torch.zeros(1, 300, 6)
+            rows[0, 0] = torch.tensor([0.0, 0.0, w / 2, h / 2, 0.9, 0.0])
+            self.register_buffer("rows", rows)
+
+        def forward(self, x):
+            return self.rows + x.mean(dim=(1, 2, 3)).reshape(-1, 1, 1) * 0.0
+
+    def _write(name, batch=1, channels=3, size=64, folder=None):
+        h, w = (size, size) if isinstance(size, int) else size
+        path = os.path.join(str(folder or tmp_path), f"{name}.onnx")
+        torch.onnx.export(
+            _Head(h, w), torch.zeros(batch, channels, h, w), path,
+            input_names=["images"], output_names=["output0"], dynamo=False,
+        )
+        model = onnx.load(path)
+        for key, value in (("names", "{0: 'defect'}"), ("end2end", "True"), ("batch", str(batch))):
+            entry = model.metadata_props.add()
+            entry.key, entry.value = key, value
+        onnx.save(model, path)
+        return path
+
+    return _write
@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+
+from cascade import CascadeDetector, region_windows
+from detections import Detections
+
+
+class _FakeDetector:
+    """Returns the boxes respond(frame) gives, and records every input's shape."""
+
+    def __init__(self, path, respond, imgsz=64):
+        self.model_path = path
+        self.engine_name = "onnxruntime"
+        self.imgsz = imgsz
+        self.conf = None
+        self.respond = respond
+        self.calls = []
+
+    def is_loaded(self):
+        return True
+
+    def update_settings(self, conf=None, **_):
+        self.conf = conf
+
+    def predict_batch(self, frames, imgsz=None):
+        self.calls.append([f.shape[:2] for f in frames])
+        return [Detections(np.asarray(self.respond(f), dtype=np.float32).reshape(-1, 4), [0.9] * len(self.respond(f)), [0] * len(self.respond(f))) for f in frames]
+
+
+def _flag_bright(frame):
+    """Screen: one box per frame whose top-left pixel is bright."""
+    return [[100, 100, 120, 120]] if frame[0, 0, 0] else []
+
+
+def _frame(flagged):
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    frame[0, 0] = 255 if flagged else 0
+    return frame
+
+
+def test_region_window_min_size_and_clamped_to_frame():
+    assert region_windows([[100, 100, 120, 120]], (480, 640), 64) == [(78, 78, 142, 142)]
+    # Near the corner the window shifts inside the frame instead of shrinking
+    assert region_windows([[0, 0, 10, 10]], (480, 640), 64) == [(0, 0, 64, 64)]
+    # Large boxes get context on each side, capped by the frame
+    assert region_windows([[0, 0, 600, 400]], (480, 640), 64) == [(0, 0, 640, 480)]
+
+
+def test_region_windows_merge_overlaps_and_give_up_past_max():
+    merged = region_windows([[100, 100, 120, 120], [130, 100, 150, 120]], (480, 640), 64)
+    assert merged == [(78, 78, 172, 142)]
+    spread = [[x, 10, x + 10, 20] for x in range(0, 640, 128)]
+    assert len(region_windows(spread, (480, 640), 64, max_regions=5)) == 5
+    assert region_windows(spread, (480, 640), 64, max_regions=4) is None
+
+
+def test_frame_mode_confirms_only_flagged_frames_whole():
+    screen = _FakeDetector("n.onnx", _flag_bright)
+    confirm = _FakeDetector("s.onnx", lambda f: [[5, 5, 25, 25]])
+    cascade = CascadeDetector(confirm, enabled=True, screen_conf=0.05)
+    cascade.set_screen(screen)
+    assert screen.conf == 0.05
+    assert cascade.active()
+
+    out = cascade.predict_batch([_frame(False), _frame(True), _frame(False)])
+    assert [len(d) for d in out] == [0, 1, 0]
+    assert confirm.calls == [[(480, 640)]]
+    stats = cascade.stats()
+    assert (stats["frames"], stats["flagged"], stats["regions"]) == (3, 1, 0)
+    assert stats["pass_rate"] == pytest.approx(1 / 3, abs=1e-4)
+
+
+def test_region_mode_confirms_crops_in_frame_coordinates():
+    screen = _FakeDetector("n.onnx", _flag_bright)
+    confirm = _FakeDetector("s.onnx", lambda f: [[5, 5, 25, 25]])
+    cascade = CascadeDetector(confirm, enabled=True, mode="region")
+    cascade.set_screen(screen)
+
+    out = cascade.predict_batch([_frame(True)], imgsz=64)
+    assert confirm.calls == [[(64, 64)]]
+    assert out[0].xyxy.tolist() == [[83, 83, 103, 103]]
+    assert cascade.stats()["regions"] == 1
+
+
+def test_inactive_without_screen_or_when_screen_is_the_active_model():
+    confirm = _FakeDetector("s.onnx", lambda f: [])
+    cascade = CascadeDetector(confirm, enabled=True)
+    assert not cascade.active()
+    cascade.set_screen(_FakeDetector("s.onnx", lambda f: []))
+    assert not cascade.active()
+    cascade.configure(enabled=False)
+    cascade.set_screen(_FakeDetector("n.onnx", lambda f: []))
+    assert not cascade.active()
+
+
+def test_detached_screen_falls_back_to_confirm():
+    confirm = _FakeDetector("s.onnx", lambda f: [[5, 5, 25, 25]])
+    cascade = CascadeDetector(confirm, enabled=True)
+    out = cascade.predict_batch([_frame(False)])
+    assert [len(d) for d in out] == [1]
+
+
+def test_unknown_mode_ignored():
+    cascade = CascadeDetector(_FakeDetector("s.onnx", lambda f: []), mode="tiles")
+    assert cascade.mode == "frame"
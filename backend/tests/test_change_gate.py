@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from change_gate import ChangeGate
+
+
+def _frame(value=100, shape=(480, 640, 3)):
+    return np.full(shape, value, dtype=np.uint8)
+
+
+def test_first_frame_always_inferred():
+    gate = ChangeGate()
+    assert gate.should_infer(_frame(), now=0.0)
+
+
+def test_static_scene_skipped_until_refresh():
+    gate = ChangeGate(threshold=4.0, refresh_s=1.0)
+    assert gate.should_infer(_frame(), now=0.0)
+    assert not gate.should_infer(_frame(), now=0.5)
+    assert not gate.should_infer(_frame(101), now=0.9)
+    # Refresh due: inferred, and it becomes the new reference
+    assert gate.should_infer(_frame(), now=1.0)
+    assert not gate.should_infer(_frame(), now=1.5)
+    assert gate.stats()["skipped"] == 3
+    assert gate.stats()["saved_ratio"] == pytest.approx(3 / 5)
+
+
+def test_small_local_change_passes_block_threshold():
+    gate = ChangeGate(threshold=4.0, refresh_s=10.0)
+    gate.should_infer(_frame(), now=0.0)
+    changed = _frame()
+    # One 8x8 thumbnail block is 60x80 px of this frame; the whole-frame mean barely moves
+    changed[:60, :80] = 200
+    assert gate.should_infer(changed, now=0.1)
+    assert gate.stats()["last_diff"] > 4.0
+
+
+def test_threshold_boundary():
+    gate = ChangeGate(threshold=10.0, refresh_s=10.0)
+    gate.should_infer(_frame(100), now=0.0)
+    assert not gate.should_infer(_frame(109), now=0.1)
+    assert gate.should_infer(_frame(110), now=0.2)
+
+
+def test_disabled_gate_infers_every_frame():
+    gate = ChangeGate(enabled=False)
+    assert all(gate.should_infer(_frame(), now=0.1 * i) for i in range(5))
+    assert gate.stats()["skipped"] == 0
+
+
+def test_reset_forgets_reference():
+    gate = ChangeGate(refresh_s=10.0)
+    gate.should_infer(_frame(), now=0.0)
+    gate.reset()
+    assert gate.should_infer(_frame(), now=0.1)
+
+
+@pytest.mark.parametrize("shape", [(480, 640), (480, 640, 1), (3000, 4000, 3)])
+def test_thumbnail_handles_mono_and_large_frames(shape):
+    thumb = ChangeGate.thumbnail(np.zeros(shape, dtype=np.uint8))
+    assert thumb.shape == (64, 64) and thumb.dtype == np.int16
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from detections import Detections, box_iou, nms
+
+NAMES = {0: "defect", 1: "scratch"}
+
+
+def _dets(rows, ids=None):
+    rows = np.asarray(rows, dtype=np.float32)
+    return Detections(rows[:, :4], rows[:, 4], rows[:, 5], NAMES, ids)
+
+
+def test_empty_set_has_typed_columns():
+    empty = Detections()
+    assert len(empty) == 0
+    assert empty.xyxy.shape == (0, 4) and empty.xyxy.dtype == np.float32
+    assert empty.cls.dtype == np.int32
+    assert empty.to_list() == []
+
+
+def test_from_array_and_to_list_legacy_layout():
+    dets = Detections.from_array([[10, 20, 30, 60, 0.9, 1]], NAMES)
+    item = dets.to_list()[0]
+    assert item["class"] == 1 and item["label"] == "scratch"
+    assert item["xyxy"] == [[10, 20, 30, 60]]
+    assert item["bbox"] == [[20, 40, 20, 40]]
+    assert "track_id" not in item
+
+
+def test_track_ids_follow_selection_and_reach_to_list():
+    dets = _dets([[0, 0, 10, 10, 0.9, 0], [20, 20, 30, 30, 0.4, 0]], ids=[7, 8])
+    kept = dets.filter(min_conf=0.5)
+    assert kept.ids.tolist() == [7]
+    assert kept.to_list()[0]["track_id"] == 7
+
+
+def test_filter_by_conf_and_class_returns_self_when_all_kept():
+    dets = _dets([[0, 0, 10, 10, 0.9, 0], [0, 0, 10, 10, 0.3, 1]])
+    assert dets.filter(min_conf=0.1) is dets
+    assert dets.filter(classes=[1]).cls.tolist() == [1]
+    assert len(dets.filter(min_conf=0.5, classes=[1])) == 0
+
+
+def test_offset_and_scaled_share_names():
+    dets = _dets([[10, 10, 20, 20, 0.9, 0]])
+    assert dets.offset(0, 0) is dets and dets.scaled(1.0, 1.0) is dets
+    moved = dets.offset(5, -5).scaled(2.0, 0.5)
+    assert moved.xyxy.tolist() == [[30, 2.5, 50, 7.5]]
+    assert moved.names is dets.names
+
+
+def test_concat_skips_empty_and_drops_partial_ids():
+    a = _dets([[0, 0, 10, 10, 0.9, 0]], ids=[1])
+    b = _dets([[5, 5, 15, 15, 0.8, 1]])
+    assert len(Detections.concat([])) == 0
+    assert Detections.concat([a, Detections()]).ids.tolist() == [1]
+    both = Detections.concat([a, b])
+    assert len(both) == 2 and both.ids is None
+
+
+def test_box_iou():
+    a = np.array([[0, 0, 10, 10]], dtype=np.float32)
+    b = np.array([[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]], dtype=np.float32)
+    np.testing.assert_allclose(box_iou(a, b), [[1.0, 1 / 3, 0.0]], atol=1e-6)
+
+
+def test_nms_keeps_highest_score_first():
+    boxes = np.array([[0, 0, 10, 10], [1, 1, 11, 11], [50, 50, 60, 60]], dtype=np.float32)
+    scores = np.array([0.5, 0.9, 0.7], dtype=np.float32)
+    assert nms(boxes, scores, 0.5).tolist() == [1, 2]
+
+
+def test_nms_is_class_aware():
+    dets = _dets([[0, 0, 10, 10, 0.9, 0], [0, 0, 10, 10, 0.8, 1], [0, 0, 10, 10, 0.7, 0]])
+    kept = dets.nms(0.5)
+    assert sorted(kept.conf.tolist()) == pytest.approx([0.8, 0.9])
@@ -0,0 +1,129 @@
+import os
+
+import numpy as np
+import pytest
+
+from autotune import tune_candidates
+from detector import DefectDetector
+from model_registry import write_manifest
+
+
+def test_predict_pads_single_frame_to_fixed_batch(tiny_onnx):
+    path = tiny_onnx("yolo26n", batch=4)
+    det = DefectDetector(path, engine="native")
+    assert det.max_batch == 4
+
+    frame = np.zeros((64, 64, 3), dtype=np.uint8)
+    dets = det.predict(frame, imgsz=64)
+    assert len(dets) == 1
+    assert [len(d) for d in det.predict_batch([frame] * 5, imgsz=64)] == [1] * 5
+
+
+def test_predict_pads_to_acquired_replica_batch(tiny_onnx):
+    det = DefectDetector(tiny_onnx("yolo26n", batch=4), engine="native")
+    # As if a background swap to a batch-1 export had landed after the replica was acquired
+    det.max_batch = 1
+    frame = np.zeros((64, 64, 3), dtype=np.uint8)
+    assert len(det.predict(frame, imgsz=64)) == 1
+    assert [len(d) for d in det.predict_batch([frame] * 3, imgsz=64)] == [1] * 3
+
+
+def _models_dir_detector(models_dir, path):
+    det = DefectDetector(path, engine="native", autoload=False)
+    det._models_dir_candidates = [str(models_dir)]
+    return det
+
+
+def test_reload_skips_rect_variant(tiny_onnx, tmp_path):
+    base = tiny_onnx("yolo26n")
+    rect = tiny_onnx("yolo26n_64x48", size=(48, 64))
+    write_manifest(rect, {"name": "yolo26n", "input_hw": [48, 64], "channels": 3, "precision": "fp32", "variant": "rect"})
+    # The variant is the newer export, as it is right after export_model.py --imgsz WxH
+    os.utime(base, (1, 1))
+
+    det = _models_dir_detector(tmp_path, rect)
+    ok, _ = det.reload_model("onnx", "yolo26n")
+    assert ok
+    assert det.model_path == os.path.abspath(base)
+    assert det.model_name == "yolo26n"
+
+
+def test_autotune_skips_mono_and_rect_variants(tiny_onnx, tmp_path):
+    base = tiny_onnx("yolo26n")
+    mono = tiny_onnx("yolo26n_mono", channels=1)
+    rect = tiny_onnx("yolo26n_64x48", size=(48, 64))
+    write_manifest(mono, {"name": "yolo26n", "input_hw": [64, 64], "channels": 1, "precision": "fp32", "variant": "mono"})
+    write_manifest(rect, {"name": "yolo26n", "input_hw": [48, 64], "channels": 3, "precision": "fp32", "variant": "rect"})
+
+    assert [e["path"] for e in tune_candidates(str(tmp_path), "yolo26n")] == [os.path.abspath(base)]
+    assert tune_candidates(str(tmp_path), "yolo26n", formats=("pt", "openvino")) == []
+
+    # A result saved before the filter still must not make the mono export the primary model
+    det = _models_dir_detector(tmp_path, base)
+    det.set_autotune({"model_name": "yolo26n", "file": os.path.basename(mono)})
+    ok, _ = det.reload_model("auto", "yolo26n", force=True)
+    assert ok
+    assert det.model_path == os.path.abspath(base)
+
+
+@pytest.mark.parametrize("variant", ["mono", None])  # None: manifest from before "variant" was recorded
+def test_reload_keeps_rgb_model_after_mono_export(tiny_onnx, tmp_path, variant):
+    base = tiny_onnx("yolo26n")
+    mono = tiny_onnx("yolo26n_mono", channels=1)
+    write_manifest(base, {"name": "yolo26n", "input_hw": [64, 64], "channels": 3, "precision": "fp32"})
+    info = {"name": "yolo26n", "input_hw": [64, 64], "channels": 1, "precision": "fp32"}
+    if variant:
+        info["variant"] = variant
+    write_manifest(mono, info)
+    os.utime(base, (1, 1))
+
+    det = _models_dir_detector(tmp_path, base)
+    ok, _ = det.reload_model("onnx", "yolo26n")
+    assert ok
+    assert det.model_path == os.path.abspath(base)
+    assert det.model_name == "yolo26n"
+    # The mono export still serves Mono8 frames next to the RGB one
+    assert det.input_channels_for(mono=True) == 1
+    assert det.input_channels_for(mono=False) == 3
+
+
+def test_reload_skips_calibrated_int8_install(tiny_onnx, tmp_path):
+    base = tiny_onnx("yolo26n")
+    int8 = tiny_onnx("yolo26n_int8")
+    write_manifest(int8, {"name": "yolo26n", "format": "onnx", "imgsz": 64, "batch": 1, "dynamic": False, "precision": "int8", "variant": "int8"})
+    os.utime(base, (1, 1))
+
+    det = _models_dir_detector(tmp_path, int8)
+    ok, _ = det.reload_model("onnx", "yolo26n")
+    assert ok
+    assert det.model_path == os.path.abspath(base)
+
+
+def test_openvino_dir_named_after_weights(tiny_onnx, tmp_path):
+    ov = pytest.importorskip("openvino")
+    # Ultralytics writes yolo26n_openvino_model/yolo26n.xml, not best.xml
+    export_dir = tmp_path / "yolo26n_openvino_model"
+    ov.save_model(ov.convert_model(tiny_onnx("yolo26n")), str(export_dir / "yolo26n.xml"))
+
+    det = DefectDetector(str(export_dir), engine="native")
+    assert det.current_model_type == "openvino"
+    assert det.engine_name == "openvino"
+    assert os.path.abspath(det.model_path) == os.path.abspath(export_dir)
+
+
+def test_model_cache_ignores_imgsz_and_drops_replaced_sets(tiny_onnx, tmp_path):
+    nano = tiny_onnx("yolo26n")
+    tiny_onnx("yolo26s")
+    det = _models_dir_detector(tmp_path, nano)
+    assert det.reload_model("onnx", "yolo26n")[0]
+    assert det.reload_model("onnx", "yolo26s")[0]
+
+    det.update_settings(imgsz=320)
+    ok, msg = det.reload_model("onnx", "yolo26n")
+    assert ok and msg.startswith("cached:")
+    assert len(det.cache_stats()["models"]) == 2
+
+    # A pool change forces a rebuild: nothing built with the old settings stays cached
+    assert det.configure_pool(intra_op_threads=1)
+    assert det.reload_model("onnx", "yolo26n", force=True)[0]
+    assert [(m["file"], m["active"]) for m in det.cache_stats()["models"]] == [("yolo26n.onnx", True)]
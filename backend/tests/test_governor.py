@@ -0,0 +1,122 @@
+from governor import LADDER, LatencyGovernor
+
+T0 = 100.0  # perf_counter-like clock; 0 means "never measured" to the governor
+
+
+def _rung(gov):
+    return LADDER[gov.level]["name"]
+
+
+def _feed(gov, now, infer=None, loop=None, encode=None):
+    for kind, ms in (("infer", infer), ("loop", loop), ("encode", encode)):
+        if ms is not None:
+            gov.observe(kind, ms, now=now)
+
+
+def _hold(gov, start, seconds, **ms):
+    """Report the same latencies every 0.5 s for seconds, evaluating after each tick."""
+    changed = False
+    t = start
+    while t <= start + seconds:
+        _feed(gov, t, **ms)
+        changed = gov.evaluate(now=t) or changed
+        t += 0.5
+    return changed, t
+
+
+def test_steps_down_only_after_down_after_s():
+    gov = LatencyGovernor(target_ms=100.0, down_after_s=2.0)
+    _feed(gov, T0 + 0.0, infer=200.0, loop=5.0)
+    assert not gov.evaluate(now=T0 + 0.0)
+    _feed(gov, T0 + 1.5, infer=200.0, loop=5.0)
+    assert not gov.evaluate(now=T0 + 1.5)
+    _feed(gov, T0 + 2.0, infer=200.0, loop=5.0)
+    assert gov.evaluate(now=T0 + 2.0)
+    assert _rung(gov) == "infer_5hz"
+    assert gov.stats()["trigger"]["infer_ms"] == 200.0
+
+
+def test_one_rung_per_window_and_measurements_restart():
+    gov = LatencyGovernor(target_ms=100.0, down_after_s=1.0)
+    _hold(gov, T0 + 0.0, 1.0, infer=200.0, loop=5.0)
+    assert gov.level == 1
+    # The EMA restarted: the next step needs its own full window
+    _feed(gov, T0 + 1.5, infer=200.0, loop=5.0)
+    assert not gov.evaluate(now=T0 + 1.5)
+    _hold(gov, T0 + 2.0, 1.0, infer=200.0, loop=5.0)
+    assert gov.level == 2
+
+
+def test_hysteresis_band_holds_level():
+    gov = LatencyGovernor(target_ms=100.0, down_after_s=0.0, up_after_s=1.0)
+    _hold(gov, T0 + 0.0, 0.0, infer=200.0, loop=5.0)
+    assert gov.level == 1
+    # Between 60 % and 100 % of the target: neither over nor under
+    changed, t = _hold(gov, T0 + 1.0, 5.0, infer=80.0, loop=5.0)
+    assert not changed and gov.level == 1
+    # The EMA needs a few samples to fall below 60 %, then up_after_s more
+    changed, _ = _hold(gov, t, 3.0, infer=40.0, loop=5.0)
+    assert changed and gov.level == 0
+
+
+def test_stale_measurements_keep_level():
+    gov = LatencyGovernor(target_ms=100.0, down_after_s=0.0, up_after_s=0.0)
+    _hold(gov, T0 + 0.0, 0.0, infer=200.0, loop=5.0)
+    assert gov.level == 1
+    # Nothing streaming for longer than the staleness window
+    assert not gov.evaluate(now=T0 + 10.0)
+    assert gov.level == 1
+
+
+def test_fixed_input_size_skips_imgsz_rung():
+    gov = LatencyGovernor(target_ms=100.0, down_after_s=0.0, up_after_s=0.0)
+    gov.configure(imgsz_fixed=True)
+    names = []
+    t = T0
+    while gov.level < len(LADDER) - 1:
+        _feed(gov, t, infer=500.0, loop=5.0)
+        assert gov.evaluate(now=t)
+        names.append(_rung(gov))
+        t += 0.5
+    assert "small_imgsz" not in names
+    assert names == ["infer_5hz", "infer_2.5hz", "stream_15fps", "stream_10fps"]
+    assert gov.profile(640)["imgsz"] is None
+
+    # On the way back up, small_imgsz stands in for infer_2.5hz (same profile) and is left in one step
+    expected = ["stream_15fps", "small_imgsz", "infer_5hz"]
+    for name in expected:
+        _feed(gov, t, infer=10.0, loop=1.0)
+        assert gov.evaluate(now=t)
+        assert _rung(gov) == name
+        t += 0.5
+
+
+def test_profile_scales_imgsz_on_small_imgsz_rung():
+    gov = LatencyGovernor()
+    assert gov.profile(640)["imgsz"] is None
+    gov.level = [r["name"] for r in LADDER].index("small_imgsz")
+    assert gov.profile(640)["imgsz"] == 480
+    assert gov.profile(128)["imgsz"] == 160
+
+
+def test_encode_bound_loop_steps_to_stream_rung():
+    gov = LatencyGovernor(target_ms=100.0, down_after_s=0.0)
+    # 30 fps budget is 33 ms; the pass overruns it, mostly in JPEG encode
+    _hold(gov, T0 + 0.0, 0.0, infer=20.0, loop=50.0, encode=40.0)
+    assert _rung(gov) == "stream_15fps"
+    assert gov.stats()["trigger"]["encode_ms"] == 40.0
+
+
+def test_loop_overrun_without_encode_steps_one_rung():
+    gov = LatencyGovernor(target_ms=100.0, down_after_s=0.0)
+    _hold(gov, T0 + 0.0, 0.0, infer=20.0, loop=50.0, encode=5.0)
+    assert _rung(gov) == "infer_5hz"
+
+
+def test_disabled_returns_to_normal():
+    gov = LatencyGovernor(target_ms=100.0, down_after_s=0.0)
+    _hold(gov, T0 + 0.0, 0.0, infer=200.0, loop=5.0)
+    gov.configure(enabled=False)
+    assert gov.evaluate(now=T0 + 1.0)
+    assert gov.level == 0
+    assert not gov.evaluate(now=T0 + 2.0)
@@ -0,0 +1,101 @@
+import cv2
+import numpy as np
+import pytest
+
+from detections import Detections
+from roi import SlotRoi, _merge_boxes, build_slot_rois
+
+H, W = 400, 600
+
+
+def _rect(x0, y0, x1, y1):
+    """Normalised rect region from pixel corners of the H x W test frame."""
+    return {"type": "rect", "points": [[x0 / W, y0 / H], [x1 / W, y1 / H]]}
+
+
+def _frame_with_squares(*squares):
+    frame = np.zeros((H, W, 3), dtype=np.uint8)
+    for x0, y0, x1, y1 in squares:
+        frame[y0:y1, x0:x1] = 255
+    return frame
+
+
+def _white_boxes(image):
+    """xyxy of each bright blob in image (what a detector would box)."""
+    mask = (image.min(axis=-1) > 127).astype(np.uint8)
+    count, _, stats, _ = cv2.connectedComponentsWithStats(mask)
+    x, y, w, h = stats[1:count, :4].T
+    return np.stack([x, y, x + w, y + h], axis=1).astype(np.float32)
+
+
+def _roundtrip(plan, frame, input_hw=None):
+    if input_hw is None:
+        image, scale = plan.prepare(frame), 1.0
+    else:
+        image, scale = plan.prepare_scaled(frame, input_hw)
+    found = _white_boxes(image)
+    dets = Detections(found, [0.9] * len(found), [0] * len(found), {0: "defect"})
+    return plan.restore(dets, scale).xyxy
+
+
+def test_merge_boxes_unions_overlaps():
+    assert sorted(_merge_boxes([(0, 0, 10, 10), (5, 5, 20, 20), (30, 30, 40, 40)])) == [(0, 0, 20, 20), (30, 30, 40, 40)]
+
+
+def test_bbox_crop_is_a_view_and_round_trips():
+    plan = SlotRoi({"regions": [_rect(100, 50, 300, 250)]}).plan((H, W))
+    frame = _frame_with_squares((150, 100, 180, 130))
+    image = plan.prepare(frame)
+    # Region corners are inclusive pixels
+    assert image.shape[:2] == (201, 201)
+    assert np.shares_memory(image, frame)
+    assert _roundtrip(plan, frame).tolist() == [[150, 100, 180, 130]]
+
+
+def test_bbox_union_masks_pixels_between_regions():
+    plan = SlotRoi({"regions": [_rect(0, 0, 100, 100), _rect(300, 200, 400, 300)]}).plan((H, W))
+    assert plan.crops == [(0, 0, 401, 301)]
+    frame = _frame_with_squares((150, 150, 170, 170))
+    # Outside both regions: greyed out before inference
+    assert not (plan.prepare(frame) == 255).any()
+
+
+def test_packed_round_trip():
+    plan = SlotRoi({"mode": "packed", "regions": [_rect(0, 0, 100, 100), _rect(400, 250, 560, 380)]}).plan((H, W))
+    assert len(plan.crops) == 2
+    assert plan.area_ratio < 0.5
+    squares = [(20, 30, 50, 60), (450, 300, 490, 340)]
+    restored = _roundtrip(plan, _frame_with_squares(*squares))
+    assert sorted(restored.tolist()) == [list(map(float, s)) for s in squares]
+
+
+def test_packed_scaled_round_trip():
+    plan = SlotRoi({"mode": "packed", "regions": [_rect(0, 0, 200, 200), _rect(300, 100, 600, 400)]}).plan((H, W))
+    squares = [(40, 40, 100, 100), (400, 200, 480, 280)]
+    restored = _roundtrip(plan, _frame_with_squares(*squares), input_hw=(128, 128))
+    np.testing.assert_allclose(sorted(restored.tolist()), squares, atol=4)
+
+
+def test_restore_drops_detections_outside_roi():
+    plan = SlotRoi({"regions": [{"type": "polygon", "points": [[0, 0], [0.5, 0], [0, 0.5]]}]}).plan((H, W))
+    x1, y1 = plan.crops[0][2:]
+    # Centre in the crop's bounding box but outside the triangle
+    dets = Detections([[x1 - 30, y1 - 30, x1 - 10, y1 - 10], [5, 5, 25, 25]], [0.9, 0.8], [0, 0])
+    out = plan.restore(dets)
+    assert out.conf.tolist() == pytest.approx([0.8])
+
+
+def test_plans_cached_per_shape():
+    roi = SlotRoi({"regions": [_rect(100, 50, 300, 250)]})
+    assert roi.plan((H, W)) is roi.plan((H, W, 3))
+    assert roi.plan((H // 2, W // 2)).crops == [(50, 25, 151, 126)]
+
+
+def test_build_slot_rois_skips_disabled_and_empty():
+    rois = build_slot_rois({
+        "0": {"enabled": True, "regions": [_rect(0, 0, 10, 10)]},
+        "1": {"enabled": False, "regions": [_rect(0, 0, 10, 10)]},
+        "2": {"enabled": True, "regions": []},
+        "x": {"enabled": True, "regions": [_rect(0, 0, 10, 10)]},
+    })
+    assert list(rois) == [0]
@@ -0,0 +1,151 @@
+import time
+
+import pytest
+
+from scheduler import InferenceScheduler
+
+
+class _FakeDetector:
+    def __init__(self):
+        self.batches = []
+
+    def supports_async(self):
+        return False
+
+    def predict_batch(self, frames, imgsz=None):
+        self.batches.append(list(frames))
+        return [f"det-{frame}" for frame in frames]
+
+
+@pytest.fixture
+def idle_scheduler():
+    """A scheduler whose workers have exited, so tests drive _take_locked by hand."""
+    created = []
+
+    def make(**kwargs):
+        sched = InferenceScheduler(_FakeDetector(), **kwargs)
+        sched.close()
+        for t in sched._threads:
+            t.join(timeout=2)
+        sched._stopping = False
+        created.append(sched)
+        return sched
+
+    yield make
+    for sched in created:
+        sched.close()
+
+
+def test_manual_before_upload_before_auto(idle_scheduler):
+    sched = idle_scheduler(max_wait_ms=0)
+    sched.submit_frame(0, "frame")
+    sched.submit("upload", lambda: "upload")
+    sched.submit("manual", lambda: "manual")
+
+    now = time.perf_counter()
+    kind, job = sched._take_locked(now)
+    assert (kind, job.cls) == ("fn", "manual")
+    kind, job = sched._take_locked(now)
+    assert (kind, job.cls) == ("fn", "upload")
+    kind, jobs = sched._take_locked(now)
+    assert kind == "batch" and [j.slot for j in jobs] == [0]
+    assert sched._take_locked(now) is None
+
+
+def test_unknown_priority_class_rejected(idle_scheduler):
+    with pytest.raises(ValueError):
+        idle_scheduler().submit("bulk", lambda: None)
+
+
+def test_newer_frame_replaces_queued_one(idle_scheduler):
+    sched = idle_scheduler()
+    first = sched.submit_frame(0, "old")
+    sched.submit_frame(0, "new")
+    assert first.result(timeout=0) is None
+    assert [j.frame for j in sched._auto.values()] == ["new"]
+    assert sched.stats()["classes"]["auto"]["dropped"] == 1
+
+
+def test_frames_past_deadline_are_dropped(idle_scheduler):
+    sched = idle_scheduler(auto_deadline_s=0.5, max_wait_ms=0)
+    fut = sched.submit_frame(0, "frame")
+    job = sched._auto[0]
+
+    assert sched._take_locked(job.enqueued + 1.0) is None
+    assert fut.result(timeout=0) is None
+    assert sched.stats()["classes"]["auto"]["dropped"] == 1
+
+
+def test_active_slot_gets_weighted_share(idle_scheduler):
+    sched = idle_scheduler(max_batch=1, max_wait_ms=0, active_weight=2.0, active_window_s=60.0)
+    sched.note_detections(0, 3)
+    served = {0: 0, 1: 0}
+    for _ in range(30):
+        sched.submit_frame(0, "a")
+        sched.submit_frame(1, "b")
+        kind, jobs = sched._take_locked(time.perf_counter())
+        assert kind == "batch" and len(jobs) == 1
+        served[jobs[0].slot] += 1
+    assert served == {0: 20, 1: 10}
+
+
+def test_newcomer_starts_level_with_least_served_slot(idle_scheduler):
+    sched = idle_scheduler(max_batch=1, max_wait_ms=0)
+    for _ in range(5):
+        sched.submit_frame(0, "a")
+        sched._take_locked(time.perf_counter())
+    sched.submit_frame(1, "b")
+    assert sched._vtime[1] == sched._vtime[0]
+
+
+def test_partial_batch_waits_for_other_slots(idle_scheduler):
+    sched = idle_scheduler(max_batch=4, max_wait_ms=5.0)
+    for slot in (0, 1):
+        sched.submit_frame(slot, "warm")
+    sched._take_locked(time.perf_counter())
+
+    sched.submit_frame(0, "a")
+    job = sched._auto[0]
+    kind, remaining = sched._take_locked(job.enqueued + 0.001)
+    assert kind == "wait" and remaining == pytest.approx(0.004)
+
+    sched.submit_frame(1, "b")
+    kind, jobs = sched._take_locked(job.enqueued + 0.002)
+    assert kind == "batch" and sorted(j.slot for j in jobs) == [0, 1]
+
+
+def test_gather_window_expires(idle_scheduler):
+    sched = idle_scheduler(max_batch=4, max_wait_ms=5.0)
+    for slot in (0, 1):
+        sched.submit_frame(slot, "warm")
+    sched._take_locked(time.perf_counter())
+
+    sched.submit_frame(0, "a")
+    job = sched._auto[0]
+    kind, jobs = sched._take_locked(job.enqueued + 0.006)
+    assert kind == "batch" and [j.slot for j in jobs] == [0]
+
+
+def test_manual_trigger_skips_gather_window(idle_scheduler):
+    sched = idle_scheduler(max_batch=4, max_wait_ms=50.0)
+    for slot in (0, 1):
+        sched.submit_frame(slot, "warm")
+    sched._take_locked(time.perf_counter())
+
+    sched.submit_frame(0, "a")
+    sched.submit("manual", lambda: None)
+    kind, job = sched._take_locked(time.perf_counter())
+    assert (kind, job.cls) == ("fn", "manual")
+
+
+def test_workers_batch_frames_across_slots():
+    detector = _FakeDetector()
+    sched = InferenceScheduler(detector, workers=1, max_batch=4, max_wait_ms=50.0)
+    try:
+        sched._vtime.update({0: 0.0, 1: 0.0})
+        futures = [sched.submit_frame(slot, f"f{slot}") for slot in (0, 1)]
+        assert [f.result(timeout=2) for f in futures] == ["det-f0", "det-f1"]
+        assert detector.batches == [["f0", "f1"]]
+        assert sched.submit("manual", lambda: 42).result(timeout=2) == 42
+    finally:
+        sched.close()
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from detections import Detections, nms
+from detector import _TILE_MERGE_IOS, tile_grid
+
+
+def _covered(tiles, height, width):
+    mask = np.zeros((height, width), dtype=np.int32)
+    for x0, y0, x1, y1 in tiles:
+        mask[y0:y1, x0:x1] += 1
+    return mask
+
+
+@pytest.mark.parametrize("height,width", [(2048, 2448), (3000, 4000), (700, 641), (1080, 1920)])
+def test_tiles_cover_frame_at_full_size(height, width):
+    tiles = tile_grid(height, width, tile_size=640, overlap=0.2)
+    assert _covered(tiles, height, width).min() >= 1
+    for x0, y0, x1, y1 in tiles:
+        # Never padded: every tile is a full tile inside the frame
+        assert (x1 - x0, y1 - y0) == (640, 640)
+        assert 0 <= x0 and x1 <= width and 0 <= y0 and y1 <= height
+
+
+def test_neighbours_share_the_overlap():
+    tiles = tile_grid(640, 2000, tile_size=640, overlap=0.25)
+    starts = [x0 for x0, _, _, _ in tiles]
+    assert starts[:3] == [0, 480, 960]
+    assert starts[-1] == 2000 - 640
+
+
+def test_small_frame_is_one_clamped_tile():
+    assert tile_grid(300, 500, tile_size=640) == [(0, 0, 500, 300)]
+
+
+def test_overlap_and_tile_size_are_clamped():
+    assert len(tile_grid(64, 640, tile_size=8, overlap=5.0)) == len(tile_grid(64, 640, tile_size=32, overlap=0.9))
+
+
+def test_ios_merges_box_cut_at_tile_edge():
+    # The whole defect from one tile, and its cut-off half from the neighbour
+    boxes = np.array([[600, 100, 700, 140], [600, 100, 640, 140]], dtype=np.float32)
+    scores = np.array([0.9, 0.8], dtype=np.float32)
+    assert nms(boxes, scores, 0.5, metric="iou").tolist() == [0, 1]
+    assert nms(boxes, scores, _TILE_MERGE_IOS, metric="ios").tolist() == [0]
+
+
+def test_ios_keeps_separate_defects_across_tiles():
+    whole = Detections([[100, 100, 140, 140]], [0.9], [0])
+    other = Detections([[130, 100, 200, 140]], [0.8], [0])
+    merged = Detections.concat([whole, other]).nms(_TILE_MERGE_IOS, metric="ios")
+    assert len(merged) == 2
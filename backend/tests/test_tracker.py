@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+
+from detections import Detections
+from tracker import SlotTracker, _greedy_match
+
+
+def _dets(*boxes, conf=0.9, cls=0):
+    return Detections(np.asarray(boxes, dtype=np.float32).reshape(-1, 4), [conf] * len(boxes), [cls] * len(boxes), {0: "defect", 1: "scratch"})
+
+
+def _box(x, y=100.0, size=40.0):
+    return [x, y, x + size, y + size]
+
+
+def test_greedy_match_takes_best_pairs_once():
+    iou = np.array([[0.9, 0.8], [0.85, 0.1]])
+    assert _greedy_match(iou, 0.3) == [(0, 0)]
+    assert _greedy_match(np.array([[0.2]]), 0.3) == []
+    assert _greedy_match(np.zeros((0, 2)), 0.3) == []
+
+
+def test_track_confirmed_after_min_hits_keeps_id():
+    tracker = SlotTracker(min_hits=2)
+    out, new_ids = tracker.update(_dets(_box(100)), now=0.0)
+    assert len(out) == 0 and new_ids == []
+
+    out, new_ids = tracker.update(_dets(_box(104)), now=0.1)
+    assert new_ids == [1]
+    assert out.ids.tolist() == [1]
+
+    out, new_ids = tracker.update(_dets(_box(108)), now=0.2)
+    assert new_ids == []
+    assert out.ids.tolist() == [1]
+
+
+def test_min_hits_one_reports_new_track_immediately():
+    tracker = SlotTracker(min_hits=1)
+    out, new_ids = tracker.update(_dets(_box(100), _box(300)), now=0.0)
+    assert sorted(new_ids) == [1, 2]
+    assert sorted(out.ids.tolist()) == [1, 2]
+
+
+def test_tentative_track_dies_on_first_miss():
+    tracker = SlotTracker(min_hits=2)
+    tracker.update(_dets(_box(100)), now=0.0)
+    tracker.update(_dets(), now=0.1)
+    assert tracker.stats()["tentative"] == 0
+    # A detection at the same place starts over with a new ID
+    tracker.update(_dets(_box(100)), now=0.2)
+    _, new_ids = tracker.update(_dets(_box(100)), now=0.3)
+    assert new_ids == [2]
+
+
+def test_confirmed_track_survives_max_misses():
+    tracker = SlotTracker(min_hits=1, max_misses=2)
+    tracker.update(_dets(_box(100)), now=0.0)
+    for i in range(2):
+        out, _ = tracker.update(_dets(), now=0.1 * (i + 1))
+        # Coasting tracks are kept but not drawn
+        assert len(out) == 0
+        assert tracker.stats()["tracks"] == 1
+    out, new_ids = tracker.update(_dets(_box(100)), now=0.3)
+    assert out.ids.tolist() == [1] and new_ids == []
+
+    for i in range(3):
+        tracker.update(_dets(), now=0.4 + 0.1 * i)
+    assert tracker.stats()["tracks"] == 0
+
+
+def test_kalman_velocity_extrapolates_between_runs():
+    tracker = SlotTracker(min_hits=1)
+    for i in range(6):
+        tracker.update(_dets(_box(100 + 10 * i)), now=0.1 * i)
+    # Moving 100 px/s: 50 ms after the last run the box is about 5 px further on
+    ahead = tracker.predict(now=0.55).xyxy[0, 0]
+    assert ahead == pytest.approx(155.0, abs=2.0)
+    # Coasting is capped, state is unchanged
+    assert tracker.predict(now=5.0).xyxy[0, 0] == pytest.approx(150.0 + 100 * 0.5, abs=10.0)
+    assert tracker.predict(now=0.55).xyxy[0, 0] == pytest.approx(ahead)
+
+
+def test_association_is_per_class():
+    tracker = SlotTracker(min_hits=1)
+    tracker.update(_dets(_box(100), cls=0), now=0.0)
+    out, new_ids = tracker.update(_dets(_box(100), cls=1), now=0.1)
+    assert new_ids == [2]
+    assert out.ids.tolist() == [2]
+
+
+def test_weak_detection_extends_track_but_does_not_steal_it():
+    tracker = SlotTracker(min_hits=1, high_conf=0.5)
+    tracker.update(_dets(_box(100)), now=0.0)
+    out, new_ids = tracker.update(_dets(_box(102), conf=0.2), now=0.1)
+    assert out.ids.tolist() == [1] and new_ids == []
+    assert out.conf.tolist() == pytest.approx([0.2])
+
+
+def test_reset_drops_tracks_but_ids_keep_counting():
+    tracker = SlotTracker(min_hits=1)
+    tracker.update(_dets(_box(100)), now=0.0)
+    tracker.reset()
+    assert len(tracker.predict(now=0.1)) == 0
+    _, new_ids = tracker.update(_dets(_box(100)), now=0.2)
+    assert new_ids == [2]
+    assert tracker.stats()["last_id"] == 2
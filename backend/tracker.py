@@ -0,0 +1,234 @@
+import threading
+import time
+
+import numpy as np
+
+from detections import Detections
+
+# Kalman noise as a fraction of box size per nominal detector step (ByteTrack's defaults at 10 Hz)
+_STEP_S = 0.1
+_STD_POS = 1.0 / 20
+_STD_VEL = 1.0 / 160
+_MAX_COAST_S = 0.5  # extrapolate at most this far past the last detector run
+# Buffered IoU (C-BIoU): boxes grow by this fraction of their size per nominal step since the
+# track was last matched, so slow detector rates and fresh tracks without a velocity still overlap
+_BUFFER_PER_STEP = 0.15
+_MAX_BUFFER = 1.0
+
+
+def _to_xywh(xyxy):
+    xyxy = np.asarray(xyxy, dtype=np.float64)
+    return np.concatenate([(xyxy[:, :2] + xyxy[:, 2:]) / 2, xyxy[:, 2:] - xyxy[:, :2]], axis=1)
+
+
+def _to_xyxy(xywh):
+    half = np.maximum(xywh[:, 2:4], 1.0) / 2
+    return np.concatenate([xywh[:, :2] - half, xywh[:, :2] + half], axis=1).astype(np.float32)
+
+
+def _buffered_iou(track_xywh, det_xywh, buffer):
+    """(n, m) IoU of track and detection boxes, each pair grown by the track's buffer (n,)."""
+    grow = (1.0 + 2.0 * buffer)[:, None, None]
+    t_half = (track_xywh[:, None, 2:4] / 2) * grow
+    d_half = (det_xywh[None, :, 2:4] / 2) * grow
+    t_ctr, d_ctr = track_xywh[:, None, :2], det_xywh[None, :, :2]
+    overlap = (np.minimum(t_ctr + t_half, d_ctr + d_half) - np.maximum(t_ctr - t_half, d_ctr - d_half)).clip(0)
+    inter = overlap.prod(axis=2)
+    union = (4 * t_half.prod(axis=2)) + (4 * d_half.prod(axis=2)) - inter
+    return inter / (union + 1e-9)
+
+
+def _greedy_match(iou, threshold):
+    """(row, col) pairs by descending IoU, each row / col used once, IoU >= threshold."""
+    if not iou.size:
+        return []
+    rows, cols = np.unravel_index(np.argsort(-iou, axis=None), iou.shape)
+    used_r, used_c, pairs = set(), set(), []
+    for r, c in zip(rows.tolist(), cols.tolist()):
+        if iou[r, c] < threshold:
+            break
+        if r in used_r or c in used_c:
+            continue
+        used_r.add(r)
+        used_c.add(c)
+        pairs.append((r, c))
+    return pairs
+
+
+class SlotTracker:
+    """Carries one slot's real-time detections forward between detector runs with stable IDs.
+
+    Each track is a constant-velocity Kalman filter over [cx, cy, w, h] (velocities per
+    second); all tracks of the slot live in stacked arrays, so predict and update are
+    single vectorized steps. Association is two-stage as in ByteTrack: detections at or
+    above high_conf are matched to every live track by same-class IoU first (buffered by
+    the time since the track's last match, as in C-BIoU), weaker ones
+    only to tracks still unmatched, so a defect that briefly scores low keeps its ID
+    instead of starting a new track; detections left over start tracks. A track is confirmed (drawn, alerted) after
+    min_hits matches and dropped after max_misses detector runs without one.
+    """
+
+    def __init__(self, enabled: bool = True, detect_every: int = 3, high_conf: float = 0.5, match_iou: float = 0.3, min_hits: int = 2, max_misses: int = 3):
+        self._lock = threading.Lock()
+        self.configure(enabled, detect_every, high_conf, match_iou, min_hits, max_misses)
+        self._next_id = 1
+        self.reset()
+
+    def configure(self, enabled=None, detect_every=None, high_conf=None, match_iou=None, min_hits=None, max_misses=None):
+        with self._lock:
+            if enabled is not None:
+                self.enabled = bool(enabled)
+            if detect_every is not None:
+                self.detect_every = max(1, int(detect_every))
+            if high_conf is not None:
+                self.high_conf = min(1.0, max(0.0, float(high_conf)))
+            if match_iou is not None:
+                self.match_iou = min(1.0, max(0.01, float(match_iou)))
+            if min_hits is not None:
+                self.min_hits = max(1, int(min_hits))
+            if max_misses is not None:
+                self.max_misses = max(0, int(max_misses))
+
+    def reset(self):
+        """Drop all tracks (camera reconnect, ROI change). IDs keep counting up."""
+        with self._lock:
+            self._mean = np.zeros((0, 8))
+            self._cov = np.zeros((0, 8, 8))
+            self._ids = np.zeros(0, dtype=np.int64)
+            self._cls = np.zeros(0, dtype=np.int32)
+            self._conf = np.zeros(0, dtype=np.float32)
+            self._hits = np.zeros(0, dtype=np.int32)
+            self._misses = np.zeros(0, dtype=np.int32)
+            self._seen = np.zeros(0)
+            self._names = {}
+            self._t = None
+
+    @staticmethod
+    def _size_std(wh, pos, vel):
+        """Per-track std of [cx, cy, w, h, vx, vy, vw, vh], proportional to the box size."""
+        wh = np.maximum(wh, 1.0)
+        return np.concatenate([pos * wh, pos * wh, vel * wh / _STEP_S, vel * wh / _STEP_S], axis=1)
+
+    def _predict(self, dt):
+        """Advance every track by dt seconds in place."""
+        if not len(self._ids) or dt <= 0:
+            return
+        F = np.eye(8)
+        F[:4, 4:] = np.eye(4) * dt
+        std = self._size_std(self._mean[:, 2:4], _STD_POS, _STD_VEL)
+        Q = std ** 2 * (dt / _STEP_S)
+        self._mean = self._mean @ F.T
+        self._cov = F @ self._cov @ F.T + Q[:, :, None] * np.eye(8)
+
+    def _correct(self, rows, z):
+        """Kalman update of tracks rows with measured xywh boxes z."""
+        mean, cov = self._mean[rows], self._cov[rows]
+        r = self._size_std(mean[:, 2:4], _STD_POS, 0.0)[:, :4] ** 2
+        S = cov[:, :4, :4] + r[:, :, None] * np.eye(4)
+        K = cov[:, :, :4] @ np.linalg.inv(S)
+        innovation = z - mean[:, :4]
+        self._mean[rows] = mean + (K @ innovation[:, :, None])[:, :, 0]
+        self._cov[rows] = cov - K @ S @ np.transpose(K, (0, 2, 1))
+
+    def _spawn(self, dets: Detections, now: float):
+        n = len(dets)
+        z = _to_xywh(dets.xyxy)
+        mean = np.concatenate([z, np.zeros((n, 4))], axis=1)
+        std = self._size_std(z[:, 2:4], 2 * _STD_POS, 10 * _STD_VEL)
+        ids = np.arange(self._next_id, self._next_id + n, dtype=np.int64)
+        self._next_id += n
+        self._mean = np.concatenate([self._mean, mean])
+        self._cov = np.concatenate([self._cov, (std ** 2)[:, :, None] * np.eye(8)])
+        self._ids = np.concatenate([self._ids, ids])
+        self._cls = np.concatenate([self._cls, dets.cls])
+        self._conf = np.concatenate([self._conf, dets.conf])
+        self._hits = np.concatenate([self._hits, np.ones(n, dtype=np.int32)])
+        self._misses = np.concatenate([self._misses, np.zeros(n, dtype=np.int32)])
+        self._seen = np.concatenate([self._seen, np.full(n, now)])
+
+    def _associate(self, dets: Detections, candidates, iou_thres, now):
+        """Match dets to the track rows in candidates; returns (track_rows, det_rows)."""
+        if not len(dets) or not len(candidates):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        buffer = np.minimum(_MAX_BUFFER, _BUFFER_PER_STEP * (now - self._seen[candidates]) / _STEP_S)
+        iou = _buffered_iou(self._mean[candidates, :4], _to_xywh(dets.xyxy), buffer)
+        iou[self._cls[candidates][:, None] != dets.cls[None, :]] = 0.0
+        pairs = _greedy_match(iou, iou_thres)
+        if not pairs:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        t, d = np.asarray(pairs, dtype=np.int64).T
+        return candidates[t], d
+
+    def _visible(self, mean):
+        """Confirmed tracks matched on the last detector run, as Detections at mean."""
+        show = (self._hits >= self.min_hits) & (self._misses == 0)
+        return Detections(_to_xyxy(mean[show]), self._conf[show], self._cls[show], self._names, self._ids[show])
+
+    def update(self, dets: Detections, now: float | None = None):
+        """Fold one detector run (frame captured at now) into the tracks.
+
+        Returns (tracked Detections for that frame, IDs of tracks confirmed by this run).
+        """
+        now = time.perf_counter() if now is None else now
+        with self._lock:
+            self._names = dets.names or self._names
+            if self._t is not None:
+                self._predict(now - self._t)
+            self._t = now
+
+            live = np.arange(len(self._ids))
+            high = dets.conf >= self.high_conf
+            high_idx, low_idx = np.flatnonzero(high), np.flatnonzero(~high)
+            t1, d1 = self._associate(dets[high_idx], live, self.match_iou, now)
+            rest = np.setdiff1d(live, t1)
+            # Second stage: weak detections only extend tracks the strong ones left over
+            t2, d2 = self._associate(dets[low_idx], rest, self.match_iou, now)
+            rows = np.concatenate([t1, t2])
+            det_rows = np.concatenate([high_idx[d1], low_idx[d2]])
+
+            was_confirmed = self._hits >= self.min_hits
+            if len(rows):
+                self._correct(rows, _to_xywh(dets.xyxy[det_rows]))
+                self._conf[rows] = dets.conf[det_rows]
+                self._hits[rows] += 1
+                self._seen[rows] = now
+            missed = np.ones(len(self._ids), dtype=bool)
+            missed[rows] = False
+            self._misses[missed] += 1
+            self._misses[rows] = 0
+            new_ids = self._ids[(self._hits >= self.min_hits) & ~was_confirmed].tolist()
+
+            # Tentative tracks die on their first miss; confirmed ones after max_misses
+            keep = np.where(self._hits >= self.min_hits, self._misses <= self.max_misses, self._misses == 0)
+            if not keep.all():
+                for name in ("_mean", "_cov", "_ids", "_cls", "_conf", "_hits", "_misses", "_seen"):
+                    setattr(self, name, getattr(self, name)[keep])
+
+            # Any detection left over starts a track: the detector's conf already filtered them
+            unmatched = np.setdiff1d(np.arange(len(dets)), det_rows)
+            if len(unmatched):
+                self._spawn(dets[unmatched], now)
+                if self.min_hits <= 1:
+                    new_ids += self._ids[-len(unmatched):].tolist()
+            return self._visible(self._mean), new_ids
+
+    def predict(self, now: float | None = None) -> Detections:
+        """Tracked boxes extrapolated to now (a frame between detector runs); state is unchanged."""
+        now = time.perf_counter() if now is None else now
+        with self._lock:
+            if not len(self._ids) or self._t is None:
+                return Detections(names=self._names)
+            dt = min(_MAX_COAST_S, max(0.0, now - self._t))
+            mean = self._mean.copy()
+            mean[:, :4] += self._mean[:, 4:] * dt
+            return self._visible(mean)
+
+    def stats(self):
+        with self._lock:
+            confirmed = self._hits >= self.min_hits
+            return {
+                "enabled": self.enabled,
+                "tracks": int(confirmed.sum()),
+                "tentative": int((~confirmed).sum()),
+                "last_id": self._next_id - 1,
+            }